@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Facility, Floor, ParkingSpot, Device
+from . import services
 
 
 class FloorInline(admin.TabularInline):
@@ -22,7 +23,7 @@ class FacilityAdmin(admin.ModelAdmin):
     """Admin interface for Facility model."""
     list_display = [
         'name', 'type', 'onboarding_type', 
-        'confidence_score', 'latitute', 'longitude', 'created_at'
+        'confidence_score', 'available_count', 'latitute', 'longitude', 'created_at'
     ]
     list_filter = ['type', 'onboarding_type']
     search_fields = ['name', 'address']
@@ -53,7 +54,7 @@ class FloorAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     
     def spots_count(self, obj):
-        return obj.spots.count()
+        return obj.total_spots
     spots_count.short_description = 'Total Spots'
 
 
@@ -87,15 +88,15 @@ class ParkingSpotAdmin(admin.ModelAdmin):
     actions = ['mark_available', 'mark_occupied', 'mark_verified']
     
     def mark_available(self, request, queryset):
-        queryset.update(status='available')
+        services.bulk_update_spots(queryset, status='available')
     mark_available.short_description = "Mark selected spots as Available"
     
     def mark_occupied(self, request, queryset):
-        queryset.update(status='occupied')
+        services.bulk_update_spots(queryset, status='occupied')
     mark_occupied.short_description = "Mark selected spots as Occupied"
     
     def mark_verified(self, request, queryset):
-        queryset.update(verified=True)
+        services.bulk_update_spots(queryset, verified=True)
     mark_verified.short_description = "Mark selected spots as Verified"
 
 
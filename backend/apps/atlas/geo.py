@@ -0,0 +1,132 @@
+"""
+In-process geospatial index over facilities.
+
+Facilities with coordinates are held as NumPy columns sorted by latitude.
+A radius query binary-searches the latitude band, filters longitude,
+computes haversine distances vectorized, and ranks the survivors, so it
+scales to 100k+ facilities without touching the database.
+
+The index is rebuilt lazily: Facility saves/deletes bump a version in
+the cache (see signals), and each process rebuilds on its next query
+when the version moved or GEO_INDEX_MAX_AGE passed.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Facility
+
+EARTH_RADIUS_M = 6_371_000.0
+GEO_INDEX_VERSION_KEY = 'atlas:geo-index-version'
+# Upper bound on staleness when processes do not share a cache backend
+GEO_INDEX_MAX_AGE = 300
+
+
+class FacilityGeoIndex:
+    """
+    Facility coordinates plus the static scoring columns (effective hourly
+    price, confidence score), sorted by latitude.
+    """
+    
+    def __init__(self, ids, lat, lon, price, confidence, version=None):
+        order = np.argsort(lat, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.lat = np.asarray(lat, dtype=np.float64)[order]
+        self.lon = np.asarray(lon, dtype=np.float64)[order]
+        self.price = np.asarray(price, dtype=np.float64)[order]
+        self.confidence = np.asarray(confidence, dtype=np.float64)[order]
+        self.lat_rad = np.radians(self.lat)
+        self.lon_rad = np.radians(self.lon)
+        self.cos_lat = np.cos(self.lat_rad)
+        self.version = version
+        self.built_at = time.monotonic()
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    @classmethod
+    def build(cls, version=None):
+        """Load every facility with coordinates from the database."""
+        facilities = Facility.objects.filter(
+            latitute__isnull=False, longitude__isnull=False
+        ).order_by().only('id', 'type', 'latitute', 'longitude', 'hourly_rate', 'confidence_score')
+        
+        ids, lat, lon, price, confidence = [], [], [], [], []
+        for facility in facilities.iterator(chunk_size=5000):
+            ids.append(facility.id)
+            lat.append(float(facility.latitute))
+            lon.append(float(facility.longitude))
+            price.append(facility.effective_hourly_rate)
+            confidence.append(facility.confidence_score)
+        return cls(ids, lat, lon, price, confidence, version=version)
+    
+    def query(self, lat, lon, radius_m, limit=None):
+        """
+        Facilities within radius_m of a point, nearest first.
+        
+        Args:
+            lat, lon: Point in degrees
+            radius_m: Search radius in meters
+            limit: Optional maximum number of results
+            
+        Returns:
+            (positions, distances_m) arrays; positions index the columns
+            of this index (ids, price, confidence, ...)
+        """
+        band = math.degrees(radius_m / EARTH_RADIUS_M)
+        start = np.searchsorted(self.lat, lat - band, side='left')
+        stop = np.searchsorted(self.lat, lat + band, side='right')
+        positions = np.arange(start, stop)
+        
+        # Longitude prefilter; skipped near the poles where the band wraps
+        cos_point = math.cos(math.radians(lat))
+        if positions.size and cos_point > 1e-3:
+            lon_band = band / cos_point
+            if lon_band < 180:
+                delta = np.abs((self.lon[positions] - lon + 180.0) % 360.0 - 180.0)
+                positions = positions[delta <= lon_band]
+        
+        if not positions.size:
+            return positions, np.empty(0)
+        
+        lat_rad = math.radians(lat)
+        dlat = self.lat_rad[positions] - lat_rad
+        dlon = self.lon_rad[positions] - math.radians(lon)
+        a = np.sin(dlat / 2) ** 2 + math.cos(lat_rad) * self.cos_lat[positions] * np.sin(dlon / 2) ** 2
+        distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        
+        within = distances <= radius_m
+        positions, distances = positions[within], distances[within]
+        
+        if limit is not None and positions.size > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            positions, distances = positions[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_geo_index():
+    """Current facility index, rebuilt if facilities changed."""
+    global _index
+    version = cache.get(GEO_INDEX_VERSION_KEY)
+    index = _index
+    if index is None or index.version != version or time.monotonic() - index.built_at > GEO_INDEX_MAX_AGE:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version or time.monotonic() - index.built_at > GEO_INDEX_MAX_AGE:
+                index = _index = FacilityGeoIndex.build(version)
+    return index
+
+
+def invalidate_geo_index():
+    try:
+        cache.incr(GEO_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(GEO_INDEX_VERSION_KEY, 1, None)
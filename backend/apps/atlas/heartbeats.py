@@ -0,0 +1,201 @@
+"""
+Buffered device heartbeats.
+
+Every sensor event or ping is a heartbeat, and writing Device.last_seen_at
+once per ping would turn read-mostly device rows into a write hotspot.
+Heartbeats are instead kept in a per-process buffer (latest timestamp per
+device) and flushed with chunked UPDATE ... CASE statements once the
+buffer holds HEARTBEAT_BUFFER_MAX devices or its oldest heartbeat has
+waited HEARTBEAT_MAX_DELAY seconds. That flush runs after the caller's
+transaction commits, so a rolled-back request cannot take the heartbeat
+writes with it, and a failed flush is logged rather than failing the
+request. The optional flusher thread (HEARTBEAT_FLUSH_INTERVAL) also
+writes out buffers that stop receiving heartbeats.
+
+Unflushed heartbeats are lost if the process dies, which at worst makes a
+sensor look stale until its next heartbeat.
+"""
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Device
+
+logger = logging.getLogger(__name__)
+
+# Devices written per UPDATE statement when flushing
+HEARTBEAT_FLUSH_CHUNK = 500
+
+
+class HeartbeatBuffer:
+    """Thread-safe map of device code -> latest heartbeat awaiting flush."""
+
+    def __init__(self, max_size=None, max_delay=None):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = {}
+        self._pending_since = None      # monotonic time the buffer became non-empty
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, device_code, seen_at=None):
+        """Buffer one heartbeat; flushes on commit when the buffer is due."""
+        self.record_many([(device_code, seen_at)])
+
+    def record_many(self, heartbeats):
+        """
+        Buffer (device_code, seen_at) pairs. seen_at defaults to now and is
+        capped at now, so a sensor with a fast clock cannot stay fresh.
+        """
+        if self._add(heartbeats):
+            transaction.on_commit(self._flush_logged)
+
+    def _add(self, heartbeats):
+        """Merge heartbeats into the buffer; returns True if a flush is due."""
+        now = timezone.now()
+        with self._lock:
+            pending = self._pending
+            for device_code, seen_at in heartbeats:
+                seen_at = now if seen_at is None else min(seen_at, now)
+                current = pending.get(device_code)
+                if current is None or seen_at > current:
+                    pending[device_code] = seen_at
+            if pending and self._pending_since is None:
+                self._pending_since = time.monotonic()
+            return bool(
+                (self.max_size is not None and len(pending) >= self.max_size) or
+                (self.max_delay is not None and pending and
+                 time.monotonic() - self._pending_since >= self.max_delay)
+            )
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Heartbeat flush failed")
+
+    def peek(self, device_codes):
+        """Unflushed heartbeats for the given device codes."""
+        with self._lock:
+            return {
+                code: self._pending[code]
+                for code in device_codes if code in self._pending
+            }
+
+    def flush(self):
+        """
+        Write buffered heartbeats to Device.last_seen_at.
+
+        last_seen_at only moves forward, so out-of-order flushes from
+        several processes are safe.
+
+        Returns:
+            Number of devices flushed
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_since = None
+            if not pending:
+                return 0
+
+            try:
+                codes = list(pending)
+                for i in range(0, len(codes), HEARTBEAT_FLUSH_CHUNK):
+                    chunk = codes[i:i + HEARTBEAT_FLUSH_CHUNK]
+                    seen_at = Case(
+                        *[When(device_code=code, then=Value(pending[code])) for code in chunk],
+                        output_field=DateTimeField()
+                    )
+                    Device.objects.filter(device_code__in=chunk).update(
+                        last_seen_at=Greatest(Coalesce(F('last_seen_at'), seen_at), seen_at)
+                    )
+            except Exception:
+                # Put the heartbeats back for the next flush, keeping newer
+                # ones; _add never flushes, so this cannot re-enter flush()
+                self._add(pending.items())
+                raise
+            return len(pending)
+
+
+_buffer = HeartbeatBuffer(
+    max_size=getattr(settings, 'HEARTBEAT_BUFFER_MAX', None),
+    max_delay=getattr(settings, 'HEARTBEAT_MAX_DELAY', None)
+)
+
+
+def get_heartbeat_buffer():
+    return _buffer
+
+
+def record_heartbeats(heartbeats):
+    """Buffer (device_code, seen_at) pairs; see HeartbeatBuffer.record_many."""
+    _buffer.record_many(heartbeats)
+
+
+def flush_heartbeats():
+    """Flush this process's buffered heartbeats; returns the device count."""
+    return _buffer.flush()
+
+
+class HeartbeatFlusher(threading.Thread):
+    """Daemon thread that flushes the heartbeat buffer on an interval."""
+
+    def __init__(self, interval):
+        super().__init__(name='heartbeat-flusher', daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            close_old_connections()
+            try:
+                flush_heartbeats()
+            except Exception:
+                logger.exception("Heartbeat flush failed")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start_heartbeat_flusher():
+    """
+    Start the flusher once per process if HEARTBEAT_FLUSH_INTERVAL is
+    configured, and flush what is left when the process exits.
+
+    Returns:
+        The running HeartbeatFlusher, or None when disabled
+    """
+    global _flusher
+
+    interval = getattr(settings, 'HEARTBEAT_FLUSH_INTERVAL', None)
+    if not interval:
+        return None
+
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = HeartbeatFlusher(interval)
+            _flusher.start()
+            atexit.register(_flush_at_exit)
+    return _flusher
+
+
+def _flush_at_exit():
+    try:
+        flush_heartbeats()
+    except Exception:
+        logger.exception("Final heartbeat flush failed")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.atlas import services
+
+
+class Command(BaseCommand):
+    help = "Recompute floor/facility spot counters from ParkingSpot rows and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report drift without writing any changes",
+        )
+
+    def handle(self, *args, **options):
+        result = services.reconcile_spot_counters(dry_run=options['dry_run'])
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} drift on {result['floors_repaired']} floor(s) "
+            f"and {result['facilities_repaired']} facility(ies)"
+        ))
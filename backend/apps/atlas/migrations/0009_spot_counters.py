@@ -0,0 +1,98 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:42
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+COUNTS = {
+    'available_count': Q(status='available'),
+    'reserved_count': Q(status='reserved'),
+    'occupied_count': Q(status='occupied'),
+    'blocked_count': Q(status='blocked'),
+    'verified_count': Q(verified=True),
+}
+
+
+def populate_counters(apps, schema_editor):
+    Facility = apps.get_model('atlas', 'Facility')
+    Floor = apps.get_model('atlas', 'Floor')
+    ParkingSpot = apps.get_model('atlas', 'ParkingSpot')
+
+    floor_totals = {}
+    facility_totals = {}
+    rows = ParkingSpot.objects.values('floor_id', 'floor__facility_id').annotate(
+        **{field: Count('id', filter=condition) for field, condition in COUNTS.items()}
+    ).order_by()
+    for row in rows:
+        floor_totals[row['floor_id']] = {field: row[field] for field in COUNTS}
+        facility = facility_totals.setdefault(
+            row['floor__facility_id'], dict.fromkeys(COUNTS, 0)
+        )
+        for field in COUNTS:
+            facility[field] += row[field]
+
+    for floor_id, counts in floor_totals.items():
+        Floor.objects.filter(id=floor_id).update(**counts)
+    for facility_id, counts in facility_totals.items():
+        Facility.objects.filter(id=facility_id).update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atlas', '0008_reapply_facility_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facility',
+            name='available_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='blocked_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='occupied_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='reserved_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='verified_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='floor',
+            name='available_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='floor',
+            name='blocked_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='floor',
+            name='occupied_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='floor',
+            name='reserved_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='floor',
+            name='verified_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
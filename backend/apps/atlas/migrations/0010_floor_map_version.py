@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atlas', '0009_spot_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floor',
+            name='geometry_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='map_version at which spots were last added, removed or moved'),
+        ),
+        migrations.AddField(
+            model_name='floor',
+            name='map_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Incremented on every spot change on this floor'),
+        ),
+        migrations.AddField(
+            model_name='parkingspot',
+            name='map_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Floor map_version at which this spot last changed'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingspot',
+            index=models.Index(fields=['floor', 'map_version'], name='atlas_parki_floor_i_823b63_idx'),
+        ),
+    ]
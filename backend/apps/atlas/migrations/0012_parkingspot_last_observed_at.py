@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atlas', '0011_device_last_seen_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkingspot',
+            name='last_observed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='observed_at of the latest sensor event applied to this spot', null=True),
+        ),
+    ]
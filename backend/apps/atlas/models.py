@@ -1,9 +1,108 @@
 from django.db import models
+from django.db.models import Count, F, Q
 from django.contrib.auth.models import User
 from common.models import TimeStampedModel
 
 
-class Facility(TimeStampedModel):
+SPOT_COUNT_FIELDS = (
+    'spots_total',
+    'spots_available',
+    'spots_reserved',
+    'spots_occupied',
+    'spots_verified',
+)
+
+# Denormalized counter column for each ParkingSpot.status value.
+STATUS_COUNTER_FIELDS = {
+    'available': 'available_count',
+    'occupied': 'occupied_count',
+    'reserved': 'reserved_count',
+    'blocked': 'blocked_count',
+}
+
+COUNTER_FIELDS = tuple(STATUS_COUNTER_FIELDS.values()) + ('verified_count',)
+
+# Hourly rate (INR) shown for facilities without their own hourly_rate
+DEFAULT_HOURLY_RATES = {
+    'mall': 50,
+    'office': 40,
+    'lot': 30,
+}
+DEFAULT_HOURLY_RATE = 40
+
+# Compact status encoding used by realtime deltas and packed map payloads
+SPOT_STATUS_CODES = {
+    'available': 0,
+    'occupied': 1,
+    'reserved': 2,
+    'blocked': 3,
+}
+
+
+class FacilityQuerySet(models.QuerySet):
+    """QuerySet helpers shared by every facility read path."""
+
+    def with_spot_counts(self):
+        """
+        Expose the denormalized spot counters under the spot count
+        annotation names, so reads stay O(1) per facility.
+        """
+        return self.annotate(
+            spots_total=(
+                F('available_count') + F('reserved_count') +
+                F('occupied_count') + F('blocked_count')
+            ),
+            spots_available=F('available_count'),
+            spots_reserved=F('reserved_count'),
+            spots_occupied=F('occupied_count'),
+            spots_verified=F('verified_count'),
+        )
+
+    def with_live_spot_counts(self):
+        """
+        Annotate total, available, reserved, occupied, blocked and verified
+        spot counts as conditional aggregates in a single SQL statement.
+        Authoritative but O(spots); used to reconcile the counters.
+        """
+        spots = 'floors__spots'
+        queryset = self.annotate(
+            spots_total=Count(spots),
+            spots_available=Count(spots, filter=Q(floors__spots__status='available')),
+            spots_reserved=Count(spots, filter=Q(floors__spots__status='reserved')),
+            spots_occupied=Count(spots, filter=Q(floors__spots__status='occupied')),
+            spots_blocked=Count(spots, filter=Q(floors__spots__status='blocked')),
+            spots_verified=Count(spots, filter=Q(floors__spots__verified=True)),
+        )
+        # Meta.ordering is not applied to GROUP BY queries, so keep the
+        # default ordering explicit for pagination.
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(*self.model._meta.ordering)
+        return queryset
+
+
+class SpotCounters(models.Model):
+    """
+    Abstract model with denormalized spot counters.
+    Kept in sync with F() expressions by atlas.services.apply_spot_counter_deltas.
+    """
+    available_count = models.IntegerField(default=0, editable=False)
+    reserved_count = models.IntegerField(default=0, editable=False)
+    occupied_count = models.IntegerField(default=0, editable=False)
+    blocked_count = models.IntegerField(default=0, editable=False)
+    verified_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def total_spots(self):
+        return (
+            self.available_count + self.reserved_count +
+            self.occupied_count + self.blocked_count
+        )
+
+
+class Facility(SpotCounters, TimeStampedModel):
     """
     Parking facility/location - source of truth for parking inventory.
     """
@@ -67,15 +166,37 @@ class Facility(TimeStampedModel):
         help_text="Longitude of the facility"
     )
     
+    objects = FacilityQuerySet.as_manager()
+    
     class Meta:
         verbose_name_plural = "Facilities"
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
+    
+    @property
+    def effective_hourly_rate(self):
+        """Actual hourly rate if set, otherwise the default for the facility type."""
+        if self.hourly_rate:
+            return float(self.hourly_rate)
+        return DEFAULT_HOURLY_RATES.get(self.type, DEFAULT_HOURLY_RATE)
+    
+    def ensure_spot_counts(self):
+        """
+        Populate the with_spot_counts() annotations on an instance that was
+        loaded without them (e.g. right after create/update).
+        """
+        if not all(hasattr(self, field) for field in SPOT_COUNT_FIELDS):
+            self.spots_total = self.total_spots
+            self.spots_available = self.available_count
+            self.spots_reserved = self.reserved_count
+            self.spots_occupied = self.occupied_count
+            self.spots_verified = self.verified_count
+        return self
 
 
-class Floor(TimeStampedModel):
+class Floor(SpotCounters, TimeStampedModel):
     """
     Floor within a parking facility with floorplan image.
     """
@@ -90,6 +211,16 @@ class Floor(TimeStampedModel):
         null=True,
         blank=True
     )
+    map_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented on every spot change on this floor"
+    )
+    geometry_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="map_version at which spots were last added, removed or moved"
+    )
     
     class Meta:
         ordering = ['label']
@@ -131,13 +262,50 @@ class ParkingSpot(TimeStampedModel):
         default=0,
         help_text="Distance from entry in meters (for closest spot logic)"
     )
+    map_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Floor map_version at which this spot last changed"
+    )
+    last_observed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="observed_at of the latest sensor event applied to this spot"
+    )
     
     class Meta:
         ordering = ['distance_from_entry', 'code']
         unique_together = ['floor', 'code']
+        indexes = [
+            models.Index(fields=['floor', 'map_version']),
+        ]
     
     def __str__(self):
         return f"{self.floor.facility.name} - {self.floor.label} - {self.code}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_state = instance.counter_state()
+        instance._geometry_state = instance.geometry_state()
+        return instance
+    
+    def counter_state(self):
+        """(floor_id, status, verified) as last reflected in the counters."""
+        return (
+            self.__dict__.get('floor_id'),
+            self.__dict__.get('status'),
+            self.__dict__.get('verified'),
+        )
+    
+    def geometry_state(self):
+        """(code, x, y) as last seen by floor map clients."""
+        return (
+            self.__dict__.get('code'),
+            self.__dict__.get('x'),
+            self.__dict__.get('y'),
+        )
 
 
 class Device(TimeStampedModel):
@@ -172,6 +340,9 @@ class Device(TimeStampedModel):
         blank=True,
         related_name='barriers'
     )
+    
+    # Written in bulk by the heartbeat buffer (apps.atlas.heartbeats)
+    last_seen_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         type_icon = "📡" if self.device_type == 'sensor' else "🚧"
@@ -0,0 +1,81 @@
+"""
+Realtime spot status deltas for ATLAS.
+
+Every path that changes ParkingSpot.status reports the change here; after
+the transaction commits, one compact delta per floor is published to the
+floor and facility topics of the configured broker:
+
+    {"type":"spots","floor":3,"facility":1,"version":88,"spots":[[412,1],[415,0]]}
+
+where each pair is (spot_id, SPOT_STATUS_CODES[status]) and version is
+the floor's map_version, usable as ?since= on the floor map endpoint.
+"""
+import json
+import logging
+from collections import defaultdict
+from django.db import transaction
+from common.broker import get_broker
+from .models import Floor, SPOT_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+
+def floor_topic(floor_id):
+    return f'floor:{floor_id}'
+
+
+def facility_topic(facility_id):
+    return f'facility:{facility_id}'
+
+
+def notify_spot_changes(changes):
+    """
+    Queue status deltas for publishing once the current transaction commits.
+    
+    Args:
+        changes: Iterable of (spot_id, floor_id, new_status)
+    """
+    changes = list(changes)
+    if changes:
+        transaction.on_commit(lambda: publish_spot_changes(changes), robust=True)
+
+
+def publish_spot_changes(changes):
+    """
+    Publish status deltas grouped by floor.
+    
+    Args:
+        changes: List of (spot_id, floor_id, new_status)
+    """
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+    
+    by_floor = defaultdict(dict)
+    for spot_id, floor_id, status in changes:
+        by_floor[floor_id][spot_id] = SPOT_STATUS_CODES[status]
+    
+    floors = {
+        floor_id: (facility_id, version)
+        for floor_id, facility_id, version in Floor.objects.filter(
+            id__in=by_floor.keys()
+        ).values_list('id', 'facility_id', 'map_version')
+    }
+    for floor_id, spots in by_floor.items():
+        facility_id, version = floors.get(floor_id, (None, None))
+        topics = [floor_topic(floor_id)]
+        if facility_id is not None:
+            topics.append(facility_topic(facility_id))
+        topics = [topic for topic in topics if broker.has_subscribers(topic)]
+        if not topics:
+            continue
+        
+        payload = json.dumps({
+            'type': 'spots',
+            'floor': floor_id,
+            'facility': facility_id,
+            'version': version,
+            'spots': [[spot_id, code] for spot_id, code in spots.items()],
+        }, separators=(',', ':'))
+        for topic in topics:
+            broker.publish(topic, payload)
@@ -1,5 +1,8 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
 from .models import Facility, Floor, ParkingSpot, Device
+from .services import MAX_SENSOR_BATCH, SENSOR_STATUSES
 
 
 class FacilitySerializer(serializers.ModelSerializer):
@@ -22,10 +25,7 @@ class FacilitySerializer(serializers.ModelSerializer):
     
     def get_available_spots_count(self, obj):
         """Count available spots across all floors."""
-        return ParkingSpot.objects.filter(
-            floor__facility=obj,
-            status='available'
-        ).count()
+        return obj.ensure_spot_counts().spots_available
     
     def get_owner_name(self, obj):
         """Get owner's full name if available."""
@@ -48,10 +48,7 @@ class FacilityListSerializer(serializers.ModelSerializer):
         ]
     
     def get_available_spots(self, obj):
-        return ParkingSpot.objects.filter(
-            floor__facility=obj,
-            status='available'
-        ).count()
+        return obj.ensure_spot_counts().spots_available
     
     def get_owner_name(self, obj):
         """Get owner's full name if available."""
@@ -91,7 +88,7 @@ class FloorSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_spots_count(self, obj):
-        return obj.spots.count()
+        return obj.total_spots
 
 
 class DeviceSerializer(serializers.ModelSerializer):
@@ -105,6 +102,53 @@ class DeviceSerializer(serializers.ModelSerializer):
             'id', 'device_code', 'device_type', 
             'bound_spot', 'spot_code',
             'bound_facility', 'facility_name',
-            'created_at', 'updated_at'
+            'last_seen_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['last_seen_at', 'created_at', 'updated_at']
+
+
+class SensorEventBatchSerializer(serializers.Serializer):
+    """
+    Batch of sensor events: {"events": [{"device_code", "status", "observed_at"}]}.
+    Events are checked with a flat loop rather than a nested serializer,
+    which is far too slow for thousands of rows per request.
+    """
+    events = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=MAX_SENSOR_BATCH
+    )
+    
+    def validate_events(self, events):
+        cleaned = []
+        for index, event in enumerate(events):
+            device_code = event.get('device_code')
+            event_status = event.get('status')
+            observed_at = event.get('observed_at')
+            if not isinstance(device_code, str) or not device_code:
+                raise serializers.ValidationError(f"events[{index}]: device_code is required")
+            if event_status not in SENSOR_STATUSES:
+                raise serializers.ValidationError(
+                    f"events[{index}]: status must be one of {', '.join(SENSOR_STATUSES)}"
+                )
+            try:
+                parsed = parse_datetime(observed_at) if isinstance(observed_at, str) else None
+            except ValueError:
+                parsed = None  # Well formed but out of range, e.g. month 13
+            if parsed is None:
+                raise serializers.ValidationError(
+                    f"events[{index}]: observed_at must be an ISO 8601 datetime"
+                )
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            cleaned.append({
+                'device_code': device_code,
+                'status': event_status,
+                'observed_at': parsed,
+            })
+        return cleaned
+
+
+class DeviceHeartbeatSerializer(serializers.Serializer):
+    """Batch of device pings: {"device_codes": ["S-001", ...]}."""
+    device_codes = serializers.ListField(
+        child=serializers.CharField(max_length=50), allow_empty=False, max_length=MAX_SENSOR_BATCH
+    )
@@ -2,9 +2,35 @@
 Business logic services for ATLAS app.
 Keeps domain logic separate from HTTP layer.
 """
+from collections import defaultdict
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Q
-from .models import Facility, Floor, ParkingSpot, Device
+from django.db.models import Case, CharField, Count, DateTimeField, F, Max, OuterRef, Q, Subquery, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import (
+    Facility, Floor, ParkingSpot, Device,
+    STATUS_COUNTER_FIELDS, COUNTER_FIELDS, SPOT_STATUS_CODES
+)
+from .realtime import notify_spot_changes
+from .geo import get_geo_index
+from .heartbeats import record_heartbeats
+
+
+SENSOR_MAP_CACHE_KEY = 'atlas:sensor-spot-map'
+SENSOR_MAP_CACHE_TIMEOUT = 300
+# Geometry is keyed by geometry_version, so entries never go stale
+FLOOR_GEOMETRY_CACHE_TIMEOUT = 24 * 60 * 60
+MAX_SENSOR_BATCH = 5000
+SPOT_UPDATE_CHUNK = 500
+# Sensors only report occupancy; reserved and blocked spots are owned by
+# the booking flow and admins, so sensor events never override them.
+SENSOR_STATUSES = ('available', 'occupied')
+
+# Sent with floor_ids whenever spot counters or floor geometry change. These
+# writes are queryset updates that send no model signals, so caches of
+# floor or facility reads should listen to this instead.
+floors_changed = Signal()
 
 
 def create_facility(data):
@@ -53,6 +79,413 @@ def create_spot(floor_id, data):
     return spot
 
 
+def spot_counter_deltas(status, verified, sign=1):
+    """
+    Counter deltas contributed by a single spot.
+    
+    Args:
+        status: Spot status
+        verified: Spot verified flag
+        sign: +1 to add the spot to the counters, -1 to remove it
+        
+    Returns:
+        Dictionary of counter field -> delta
+    """
+    deltas = {}
+    field = STATUS_COUNTER_FIELDS.get(status)
+    if field:
+        deltas[field] = sign
+    if verified:
+        deltas['verified_count'] = sign
+    return deltas
+
+
+def merge_counter_deltas(target, deltas):
+    """Accumulate counter deltas into target in place."""
+    for field, delta in deltas.items():
+        target[field] = target.get(field, 0) + delta
+    return target
+
+
+def apply_spot_counter_deltas(floor_id, deltas):
+    """
+    Atomically apply counter deltas to a floor and its facility.
+    
+    Args:
+        floor_id: ID of the floor the spots belong to
+        deltas: Dictionary of counter field -> delta
+    """
+    updates = {
+        field: F(field) + delta
+        for field, delta in deltas.items()
+        if delta and field in COUNTER_FIELDS
+    }
+    if not updates:
+        return
+    
+    # Counter changes are content changes for conditional GETs
+    updates['updated_at'] = timezone.now()
+    with transaction.atomic():
+        Floor.objects.filter(id=floor_id).update(**updates)
+        Facility.objects.filter(floors__id=floor_id).update(**updates)
+    floors_changed.send(sender=Floor, floor_ids=[floor_id])
+
+
+def record_spot_changes(changes):
+    """
+    Stamp changed spots with a new floor map version and queue their
+    realtime deltas. Called by every path that changes spot status.
+    
+    Args:
+        changes: Iterable of (spot_id, floor_id, new_status)
+    """
+    changes = list(changes)
+    by_floor = defaultdict(list)
+    for spot_id, floor_id, _ in changes:
+        by_floor[floor_id].append(spot_id)
+    
+    for floor_id, spot_ids in by_floor.items():
+        Floor.objects.filter(id=floor_id).update(map_version=F('map_version') + 1)
+        floor_version = Floor.objects.filter(id=OuterRef('floor_id')).values('map_version')[:1]
+        for i in range(0, len(spot_ids), SPOT_UPDATE_CHUNK):
+            ParkingSpot.objects.filter(id__in=spot_ids[i:i + SPOT_UPDATE_CHUNK]).update(
+                map_version=Subquery(floor_version)
+            )
+    
+    notify_spot_changes(changes)
+
+
+def record_geometry_change(*floor_ids):
+    """
+    Mark floor maps as changed in shape (spots added, removed or moved),
+    so delta clients fall back to a full map.
+    """
+    floor_ids = [floor_id for floor_id in floor_ids if floor_id]
+    Floor.objects.filter(id__in=floor_ids).update(
+        map_version=F('map_version') + 1,
+        geometry_version=F('map_version') + 1,
+        updated_at=timezone.now()
+    )
+    floors_changed.send(sender=Floor, floor_ids=floor_ids)
+
+
+def transition_spot_status(spot, from_status, to_status):
+    """
+    Compare-and-set a spot's status with a conditional UPDATE.
+    Safe under concurrency: only one caller can win a given transition.
+    
+    Args:
+        spot: ParkingSpot instance
+        from_status: Status the spot must currently have
+        to_status: New status value
+        
+    Returns:
+        True if this call performed the transition, False otherwise
+    """
+    updated = ParkingSpot.objects.filter(id=spot.id, status=from_status).update(
+        status=to_status,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        return False
+    
+    spot.status = to_status
+    deltas = merge_counter_deltas(
+        spot_counter_deltas(from_status, False, -1),
+        spot_counter_deltas(to_status, False)
+    )
+    apply_spot_counter_deltas(spot.floor_id, deltas)
+    spot._counted_state = spot.counter_state()
+    record_spot_changes([(spot.id, spot.floor_id, to_status)])
+    return True
+
+
+@transaction.atomic
+def bulk_update_spots(queryset, status=None, verified=None):
+    """
+    Update status and/or verified flag for many spots at once,
+    keeping floor and facility counters in sync.
+    
+    Args:
+        queryset: ParkingSpot QuerySet to update
+        status: Optional new status value
+        verified: Optional new verified flag
+        
+    Returns:
+        Number of spots changed
+    """
+    floor_deltas = defaultdict(dict)
+    changed_ids = []
+    status_changes = []
+    
+    rows = queryset.select_for_update().values_list('id', 'floor_id', 'status', 'verified')
+    for spot_id, floor_id, old_status, old_verified in rows:
+        new_status = old_status if status is None else status
+        new_verified = old_verified if verified is None else verified
+        if (new_status, new_verified) == (old_status, old_verified):
+            continue
+        
+        changed_ids.append(spot_id)
+        if new_status != old_status:
+            status_changes.append((spot_id, floor_id, new_status))
+        merge_counter_deltas(floor_deltas[floor_id], spot_counter_deltas(old_status, old_verified, -1))
+        merge_counter_deltas(floor_deltas[floor_id], spot_counter_deltas(new_status, new_verified))
+    
+    if not changed_ids:
+        return 0
+    
+    fields = {'updated_at': timezone.now()}
+    if status is not None:
+        fields['status'] = status
+    if verified is not None:
+        fields['verified'] = verified
+    ParkingSpot.objects.filter(id__in=changed_ids).update(**fields)
+    
+    for floor_id, deltas in floor_deltas.items():
+        apply_spot_counter_deltas(floor_id, deltas)
+    
+    record_spot_changes(status_changes)
+    return len(changed_ids)
+
+
+@transaction.atomic
+def bulk_create_spots(floor, spots):
+    """
+    Bulk-create spots on a floor (imports) and update its counters once.
+    
+    Args:
+        floor: Floor instance
+        spots: Iterable of unsaved ParkingSpot instances
+        
+    Returns:
+        List of created ParkingSpot instances
+    """
+    spots = list(spots)
+    deltas = {}
+    for spot in spots:
+        spot.floor = floor
+        merge_counter_deltas(deltas, spot_counter_deltas(spot.status, spot.verified))
+    
+    created = ParkingSpot.objects.bulk_create(spots)
+    for spot in created:
+        spot._counted_state = spot.counter_state()
+        spot._geometry_state = spot.geometry_state()
+    apply_spot_counter_deltas(floor.id, deltas)
+    record_geometry_change(floor.id)
+    return created
+
+
+@transaction.atomic
+def reconcile_spot_counters(dry_run=False):
+    """
+    Recompute floor and facility counters from ParkingSpot rows
+    and repair any drift.
+    
+    Args:
+        dry_run: If True, report drift without writing
+        
+    Returns:
+        Dictionary with the number of floors and facilities repaired
+    """
+    live_floors = Floor.objects.annotate(
+        live_available=Count('spots', filter=Q(spots__status='available')),
+        live_reserved=Count('spots', filter=Q(spots__status='reserved')),
+        live_occupied=Count('spots', filter=Q(spots__status='occupied')),
+        live_blocked=Count('spots', filter=Q(spots__status='blocked')),
+        live_verified=Count('spots', filter=Q(spots__verified=True)),
+    ).order_by('id')
+    live_facilities = Facility.objects.with_live_spot_counts().order_by('id')
+    
+    drifted_floors = []
+    for floor in live_floors:
+        if _repair_counters(floor, {
+            'available_count': floor.live_available,
+            'reserved_count': floor.live_reserved,
+            'occupied_count': floor.live_occupied,
+            'blocked_count': floor.live_blocked,
+            'verified_count': floor.live_verified,
+        }):
+            drifted_floors.append(floor)
+    
+    drifted_facilities = []
+    for facility in live_facilities:
+        if _repair_counters(facility, {
+            'available_count': facility.spots_available,
+            'reserved_count': facility.spots_reserved,
+            'occupied_count': facility.spots_occupied,
+            'blocked_count': facility.spots_blocked,
+            'verified_count': facility.spots_verified,
+        }):
+            drifted_facilities.append(facility)
+    
+    if not dry_run:
+        Floor.objects.bulk_update(drifted_floors, COUNTER_FIELDS, batch_size=500)
+        Facility.objects.bulk_update(drifted_facilities, COUNTER_FIELDS, batch_size=500)
+        if drifted_floors or drifted_facilities:
+            floors_changed.send(sender=Floor, floor_ids={floor.id for floor in drifted_floors} | set(
+                Floor.objects.filter(facility__in=drifted_facilities).values_list('id', flat=True)
+            ))
+    
+    return {
+        'floors_repaired': len(drifted_floors),
+        'facilities_repaired': len(drifted_facilities),
+    }
+
+
+def _repair_counters(obj, live_counts):
+    """Copy live counts onto obj; return True if anything drifted."""
+    drifted = False
+    for field, value in live_counts.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            drifted = True
+    return drifted
+
+
+def get_spot_changes_since(floor, since):
+    """
+    Spots on a floor whose status changed after a map version.
+    
+    Args:
+        floor: Floor instance (map_version and geometry_version loaded)
+        since: Map version the client last saw
+        
+    Returns:
+        List of {'id', 'status'} dicts, or None if the client needs the
+        full map (geometry changed since then, or unknown version)
+    """
+    if since > floor.map_version or since < floor.geometry_version:
+        return None
+    
+    return list(
+        ParkingSpot.objects.filter(floor_id=floor.id, map_version__gt=since)
+        .order_by()
+        .values('id', 'status')
+    )
+
+
+def facility_list_validators():
+    """
+    (version token, last modified) for facility listings: any facility
+    change, including its spot counters, moves updated_at.
+    """
+    state = Facility.objects.order_by().aggregate(
+        latest=Max('updated_at'), count=Count('id')
+    )
+    return f"{state['count']}:{state['latest']}", state['latest']
+
+
+def facility_validators(facility_id, include_floors=False):
+    """
+    (version token, last modified) for one facility, or None if it does
+    not exist. With include_floors, floor changes count as well.
+    """
+    queryset = Facility.objects.filter(id=facility_id).order_by()
+    if include_floors:
+        queryset = queryset.annotate(
+            floors_updated=Max('floors__updated_at'), floor_count=Count('floors')
+        )
+        row = queryset.values_list('updated_at', 'floors_updated', 'floor_count').first()
+    else:
+        row = queryset.values_list('updated_at').first()
+    if row is None:
+        return None
+    
+    last_modified = max(value for value in row[:2] if value is not None)
+    return ':'.join(str(value) for value in row), last_modified
+
+
+def floor_map_validators(floor_id):
+    """
+    (version token, last modified) for a floor map, or None if the floor
+    does not exist. map_version covers every spot change.
+    """
+    row = Floor.objects.filter(id=floor_id).values_list(
+        'updated_at', 'map_version', 'geometry_version', 'facility__name'
+    ).first()
+    if row is None:
+        return None
+    return ':'.join(str(value) for value in row), row[0]
+
+
+def get_floor_geometry(floor):
+    """
+    Spot geometry of a floor as parallel arrays, ordered by spot ID.
+    Cached per geometry_version.
+    
+    Args:
+        floor: Floor instance (geometry_version loaded)
+        
+    Returns:
+        Dictionary with geometry_version, ids, codes, x and y lists
+    """
+    key = f'atlas:floor-geometry:{floor.id}:{floor.geometry_version}'
+    geometry = cache.get(key)
+    if geometry is None:
+        rows = ParkingSpot.objects.filter(floor_id=floor.id).order_by('id').values_list(
+            'id', 'code', 'x', 'y'
+        )
+        ids, codes, xs, ys = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+        geometry = {
+            'geometry_version': floor.geometry_version,
+            'ids': ids,
+            'codes': codes,
+            'x': xs,
+            'y': ys,
+        }
+        cache.set(key, geometry, FLOOR_GEOMETRY_CACHE_TIMEOUT)
+    return geometry
+
+
+def pack_spot_statuses(statuses):
+    """Encode statuses as one byte each (see SPOT_STATUS_CODES)."""
+    return bytes(SPOT_STATUS_CODES[status] for status in statuses)
+
+
+def get_floor_statuses(floor_id):
+    """
+    Packed statuses of a floor's spots, in get_floor_geometry() order.
+    
+    Args:
+        floor_id: ID of the floor
+        
+    Returns:
+        bytes with one status code per spot
+    """
+    return pack_spot_statuses(
+        ParkingSpot.objects.filter(floor_id=floor_id).order_by('id').values_list('status', flat=True)
+    )
+
+
+def find_nearby_facilities(lat, lon, radius_m, limit=20):
+    """
+    Facilities within a radius of a point, nearest first, with spot counts.
+    
+    Args:
+        lat, lon: Point in degrees
+        radius_m: Search radius in meters
+        limit: Maximum number of facilities
+        
+    Returns:
+        List of Facility instances (with_spot_counts annotations) carrying
+        a distance_m attribute
+    """
+    index = get_geo_index()
+    positions, distances = index.query(lat, lon, radius_m, limit)
+    if not positions.size:
+        return []
+    
+    distance_by_id = dict(zip(index.ids[positions].tolist(), distances.tolist()))
+    facilities = Facility.objects.filter(id__in=distance_by_id).select_related('owner').with_spot_counts()
+    
+    results = []
+    for facility in facilities:
+        facility.distance_m = distance_by_id[facility.id]
+        results.append(facility)
+    results.sort(key=lambda facility: facility.distance_m)
+    return results
+
+
 def get_available_spots(facility_id, floor_id=None):
     """
     Get all available spots for a facility, optionally filtered by floor.
@@ -126,30 +559,152 @@ def get_facility_stats(facility_id):
     Returns:
         Dictionary with stats
     """
-    facility = Facility.objects.get(id=facility_id)
-    total_spots = ParkingSpot.objects.filter(floor__facility=facility).count()
-    available = ParkingSpot.objects.filter(
-        floor__facility=facility, 
-        status='available'
-    ).count()
-    occupied = ParkingSpot.objects.filter(
-        floor__facility=facility, 
-        status='occupied'
-    ).count()
-    reserved = ParkingSpot.objects.filter(
-        floor__facility=facility, 
-        status='reserved'
-    ).count()
-    verified = ParkingSpot.objects.filter(
-        floor__facility=facility, 
-        verified=True
-    ).count()
+    facility = Facility.objects.with_spot_counts().get(id=facility_id)
+    total_spots = facility.spots_total
+    verified = facility.spots_verified
     
     return {
         'total_spots': total_spots,
-        'available': available,
-        'occupied': occupied,
-        'reserved': reserved,
+        'available': facility.spots_available,
+        'occupied': facility.spots_occupied,
+        'reserved': facility.spots_reserved,
         'verified': verified,
         'verification_rate': (verified / total_spots * 100) if total_spots > 0 else 0
     }
+
+
+def get_sensor_spot_map():
+    """
+    Mapping of sensor device code -> bound spot ID, cached.
+    Invalidated by the Device signal handlers.
+    
+    Returns:
+        Dictionary of device_code -> spot_id
+    """
+    mapping = cache.get(SENSOR_MAP_CACHE_KEY)
+    if mapping is None:
+        mapping = dict(
+            Device.objects.filter(
+                device_type='sensor', bound_spot__isnull=False
+            ).values_list('device_code', 'bound_spot_id')
+        )
+        cache.set(SENSOR_MAP_CACHE_KEY, mapping, SENSOR_MAP_CACHE_TIMEOUT)
+    return mapping
+
+
+def invalidate_sensor_spot_map():
+    cache.delete(SENSOR_MAP_CACHE_KEY)
+
+
+@transaction.atomic
+def ingest_sensor_events(events):
+    """
+    Apply a batch of sensor occupancy events.
+    
+    Events are coalesced to the latest observation per spot, then dropped
+    if they are stale (observed no later than the last event applied to
+    the spot), duplicate (spot already has that status) or target a
+    reserved/blocked spot. Every non-stale observation advances the spot's
+    last_observed_at, so a late event cannot undo a newer duplicate one.
+    Transitions are written with chunked UPDATE ... CASE statements and the
+    floor/facility counters are adjusted once per floor.
+    Every event from a known sensor also counts as a buffered heartbeat.
+    
+    Args:
+        events: Iterable of dicts with device_code, status, observed_at
+        
+    Returns:
+        Dictionary with counts of received, applied and dropped events
+    """
+    spot_map = get_sensor_spot_map()
+    result = {
+        'received': 0,
+        'applied': 0,
+        'unknown_device': 0,
+        'coalesced': 0,
+        'stale': 0,
+        'duplicate': 0,
+        'protected': 0,
+    }
+    
+    latest = {}
+    for event in events:
+        result['received'] += 1
+        spot_id = spot_map.get(event['device_code'])
+        if spot_id is None:
+            result['unknown_device'] += 1
+            continue
+        current = latest.get(spot_id)
+        if current is not None:
+            result['coalesced'] += 1
+            if current['observed_at'] >= event['observed_at']:
+                continue
+        latest[spot_id] = event
+    
+    record_heartbeats(
+        (event['device_code'], event['observed_at']) for event in latest.values()
+    )
+    
+    if not latest:
+        return result
+    
+    rows = ParkingSpot.objects.filter(id__in=latest.keys()).select_for_update().values_list(
+        'id', 'floor_id', 'status', 'verified', 'last_observed_at'
+    )
+    transitions = {}
+    observed = []
+    floor_deltas = defaultdict(dict)
+    missing = set(latest)
+    for spot_id, floor_id, old_status, verified, last_observed_at in rows:
+        missing.discard(spot_id)
+        event = latest[spot_id]
+        if last_observed_at is not None and event['observed_at'] <= last_observed_at:
+            result['stale'] += 1
+            continue
+        observed.append(spot_id)
+        if event['status'] == old_status:
+            result['duplicate'] += 1
+        elif old_status not in SENSOR_STATUSES:
+            result['protected'] += 1
+        else:
+            transitions[spot_id] = (floor_id, event['status'])
+            merge_counter_deltas(floor_deltas[floor_id], spot_counter_deltas(old_status, False, -1))
+            merge_counter_deltas(floor_deltas[floor_id], spot_counter_deltas(event['status'], False))
+    
+    # Sensors still mapped to a spot that has since been deleted
+    result['unknown_device'] += len(missing)
+    
+    now = timezone.now()
+    for i in range(0, len(observed), SPOT_UPDATE_CHUNK):
+        chunk = observed[i:i + SPOT_UPDATE_CHUNK]
+        by_status = defaultdict(list)
+        for spot_id in chunk:
+            if spot_id in transitions:
+                by_status[transitions[spot_id][1]].append(spot_id)
+        changed = [spot_id for ids in by_status.values() for spot_id in ids]
+        ParkingSpot.objects.filter(id__in=chunk).update(
+            status=Case(
+                *[When(id__in=ids, then=Value(new_status)) for new_status, ids in by_status.items()],
+                default=F('status'),
+                output_field=CharField()
+            ),
+            updated_at=Case(
+                When(id__in=changed, then=Value(now)),
+                default=F('updated_at'),
+                output_field=DateTimeField()
+            ),
+            last_observed_at=Case(
+                *[When(id=spot_id, then=Value(latest[spot_id]['observed_at'])) for spot_id in chunk],
+                output_field=DateTimeField()
+            )
+        )
+    
+    for floor_id, deltas in floor_deltas.items():
+        apply_spot_counter_deltas(floor_id, deltas)
+    
+    record_spot_changes(
+        (spot_id, floor_id, new_status)
+        for spot_id, (floor_id, new_status) in transitions.items()
+    )
+    result['applied'] = len(transitions)
+    return result
@@ -0,0 +1,98 @@
+"""
+Signal handlers for ATLAS app.
+Keep the denormalized floor/facility spot counters and floor map
+versions in sync with every ParkingSpot save and delete (API, admin,
+services), the cached sensor -> spot map in sync with Device changes, and
+the facility geo index in sync with Facility changes.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Facility, ParkingSpot, Device
+from .geo import invalidate_geo_index
+from . import services
+
+
+def _record_map_change(instance, created):
+    """Advance the floor map version(s) a saved spot affects."""
+    previous = getattr(instance, '_counted_state', None)
+    old_geometry = getattr(instance, '_geometry_state', None)
+    floor_id, status, _ = instance.counter_state()
+    geometry = instance.geometry_state()
+    instance._geometry_state = geometry
+    
+    if created or previous is None or None in previous:
+        services.record_geometry_change(floor_id)
+        return
+    
+    old_floor_id, old_status, _ = previous
+    if old_floor_id != floor_id or old_geometry is None or None in old_geometry or old_geometry != geometry:
+        services.record_geometry_change(old_floor_id, floor_id)
+    elif old_status != status:
+        services.record_spot_changes([(instance.id, floor_id, status)])
+
+
+@receiver(post_save, sender=ParkingSpot)
+def update_counters_on_spot_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Apply the counter delta between the last counted and the saved state,
+    and advance the floor map version for delta-syncing clients.
+    """
+    if raw:
+        return
+    
+    _record_map_change(instance, created)
+    
+    previous = getattr(instance, '_counted_state', None)
+    current = instance.counter_state()
+    if created:
+        previous = None
+    elif previous == current:
+        return
+    elif previous is None or None in previous:
+        # State before this save is unknown (instance not loaded from the
+        # database, or loaded with deferred fields); reconcile_spot_counters
+        # repairs any resulting drift.
+        instance._counted_state = current
+        return
+    
+    floor_id, status, verified = current
+    if previous is None:
+        services.apply_spot_counter_deltas(
+            floor_id, services.spot_counter_deltas(status, verified)
+        )
+    else:
+        old_floor_id, old_status, old_verified = previous
+        removed = services.spot_counter_deltas(old_status, old_verified, -1)
+        added = services.spot_counter_deltas(status, verified)
+        if old_floor_id == floor_id:
+            services.apply_spot_counter_deltas(
+                floor_id, services.merge_counter_deltas(removed, added)
+            )
+        else:
+            services.apply_spot_counter_deltas(old_floor_id, removed)
+            services.apply_spot_counter_deltas(floor_id, added)
+    
+    instance._counted_state = current
+
+
+@receiver(post_delete, sender=ParkingSpot)
+def update_counters_on_spot_delete(sender, instance, **kwargs):
+    """Remove a deleted spot from its floor and facility counters."""
+    floor_id, status, verified = getattr(instance, '_counted_state', instance.counter_state())
+    services.apply_spot_counter_deltas(
+        floor_id, services.spot_counter_deltas(status, verified, -1)
+    )
+    services.record_geometry_change(floor_id)
+
+
+@receiver([post_save, post_delete], sender=Device)
+def refresh_sensor_spot_map(sender, instance, **kwargs):
+    """Rebuild the sensor map lazily after any binding change."""
+    transaction.on_commit(services.invalidate_sensor_spot_map)
+
+
+@receiver([post_save, post_delete], sender=Facility)
+def refresh_geo_index(sender, instance, **kwargs):
+    """Coordinates, rates or confidence may have changed; rebuild lazily."""
+    transaction.on_commit(invalidate_geo_index)
@@ -1,3 +1,246 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.atlas import geo
+from apps.atlas.heartbeats import HeartbeatBuffer
+from apps.atlas.models import Device, Facility, Floor, ParkingSpot
+from apps.atlas import services
 
-# Create your tests here.
+DEVICE_KEY = 'sensor-secret'
+
+
+class HeartbeatBufferTests(TestCase):
+    """Buffered heartbeats reach Device.last_seen_at after commit."""
+
+    def setUp(self):
+        for code in ('S-1', 'S-2'):
+            Device.objects.create(device_code=code, device_type='sensor')
+
+    def test_full_buffer_flushes_after_commit(self):
+        buffer = HeartbeatBuffer(max_size=2)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            buffer.record_many([('S-1', None), ('S-2', None)])
+            self.assertEqual(len(buffer), 2)
+            self.assertFalse(Device.objects.filter(last_seen_at__isnull=False).exists())
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Device.objects.filter(last_seen_at__isnull=False).count(), 2)
+
+    def test_rolled_back_request_keeps_heartbeats_buffered(self):
+        buffer = HeartbeatBuffer(max_size=1)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                buffer.record('S-1')
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(buffer), 1)
+
+    def test_failed_flush_raises_and_keeps_entries(self):
+        buffer = HeartbeatBuffer(max_size=2)
+        seen_at = timezone.now()
+        buffer._add([('S-1', seen_at), ('S-2', seen_at)])
+
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+
+        self.assertEqual(buffer.peek(['S-1', 'S-2']), {'S-1': seen_at, 'S-2': seen_at})
+        self.assertEqual(buffer.flush(), 2)
+
+    def test_failed_deferred_flush_is_logged(self):
+        buffer = HeartbeatBuffer(max_size=1)
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError('down')):
+            with self.assertLogs('apps.atlas.heartbeats', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    buffer.record('S-1')
+
+        self.assertEqual(len(buffer), 1)
+
+
+@override_settings(DEVICE_INGEST_KEY=DEVICE_KEY)
+class SensorEventIngestionTests(TestCase):
+    """POST /api/atlas/devices/events/ applies sensor readings in bulk."""
+
+    URL = '/api/atlas/devices/events/'
+    SPOTS = 6
+
+    def setUp(self):
+        cache.clear()
+        self.facility = Facility.objects.create(
+            name='Sensor Mall', type='mall', address='Pune', onboarding_type='enterprise'
+        )
+        self.floor = Floor.objects.create(facility=self.facility, label='L0')
+        self.spots = []
+        for i in range(self.SPOTS):
+            spot = ParkingSpot.objects.create(
+                floor=self.floor, code=f'S-{i:03d}', x=i, y=0, status='available'
+            )
+            Device.objects.create(device_code=f'SN-{i}', device_type='sensor', bound_spot=spot)
+            self.spots.append(spot)
+        self.now = timezone.now()
+
+    def event(self, index, event_status, seconds=0):
+        return {
+            'device_code': f'SN-{index}',
+            'status': event_status,
+            'observed_at': (self.now + timedelta(seconds=seconds)).isoformat(),
+        }
+
+    def post(self, events, **headers):
+        headers.setdefault('HTTP_X_DEVICE_KEY', DEVICE_KEY)
+        return self.client.post(self.URL, {'events': events}, content_type='application/json', **headers)
+
+    def statuses(self):
+        return list(
+            ParkingSpot.objects.filter(floor=self.floor).order_by('code').values_list('status', flat=True)
+        )
+
+    def test_latest_event_per_spot_wins(self):
+        response = self.post([
+            self.event(0, 'occupied', 1),
+            self.event(0, 'available', 3),
+            self.event(0, 'occupied', 2),
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['received'], 3)
+        self.assertEqual(result['coalesced'], 2)
+        self.assertEqual(result['duplicate'], 1)
+        self.assertEqual(result['applied'], 0)
+        self.assertEqual(self.statuses()[0], 'available')
+
+    def test_unknown_device_is_counted(self):
+        result = self.post([
+            {**self.event(0, 'occupied'), 'device_code': 'SN-404'},
+            self.event(1, 'occupied'),
+        ]).json()
+
+        self.assertEqual(result['unknown_device'], 1)
+        self.assertEqual(result['applied'], 1)
+
+    def test_out_of_order_event_is_ignored(self):
+        self.post([self.event(0, 'occupied', 10)])
+        # Newer reading with the same status, then a late one
+        self.post([self.event(0, 'occupied', 20)])
+        result = self.post([self.event(0, 'available', 15)]).json()
+
+        self.assertEqual(result['stale'], 1)
+        self.assertEqual(self.statuses()[0], 'occupied')
+
+    def test_counters_stay_in_sync_after_bulk_flip(self):
+        result = self.post([self.event(i, 'occupied') for i in range(self.SPOTS)]).json()
+        self.assertEqual(result['applied'], self.SPOTS)
+        self.post([self.event(i, 'available', 5) for i in range(0, self.SPOTS, 2)])
+
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.available_count, self.SPOTS // 2)
+        self.assertEqual(self.facility.occupied_count, self.SPOTS - self.SPOTS // 2)
+        self.assertEqual(
+            services.reconcile_spot_counters(dry_run=True),
+            {'floors_repaired': 0, 'facilities_repaired': 0}
+        )
+
+    def test_requires_device_key(self):
+        response = self.post([self.event(0, 'occupied')], HTTP_X_DEVICE_KEY='wrong')
+        self.assertIn(response.status_code, (401, 403))
+        self.assertEqual(self.statuses()[0], 'available')
+
+    @override_settings(DEVICE_INGEST_KEY='')
+    def test_unconfigured_key_fails_closed(self):
+        response = self.post([self.event(0, 'occupied')])
+        self.assertIn(response.status_code, (401, 403))
+        self.assertEqual(self.statuses()[0], 'available')
+
+    def test_invalid_observed_at_is_a_validation_error(self):
+        for value in ('yesterday', '2024-13-45T10:00:00', '2024-02-30T10:00:00Z', 5):
+            with self.subTest(observed_at=value):
+                response = self.post([
+                    self.event(0, 'occupied'),
+                    {**self.event(1, 'occupied'), 'observed_at': value},
+                ])
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('events[1]', str(response.json()))
+
+
+class FacilityGeoIndexTests(TestCase):
+    """Radius queries over the in-process facility index."""
+
+    def index(self, points):
+        ids = list(range(1, len(points) + 1))
+        lat, lon = zip(*points)
+        zeros = [0.0] * len(points)
+        return geo.FacilityGeoIndex(ids, lat, lon, zeros, zeros)
+
+    def query_ids(self, index, *args):
+        positions, distances = index.query(*args)
+        self.assertEqual(list(distances), sorted(distances))
+        return index.ids[positions].tolist()
+
+    def test_radius_and_limit(self):
+        # Roughly 1.1 km per 0.01 degree of latitude
+        index = self.index([(18.53, 73.8), (18.50, 73.8), (18.51, 73.8), (18.70, 73.8)])
+
+        self.assertEqual(self.query_ids(index, 18.5, 73.8, 5000), [2, 3, 1])
+        self.assertEqual(self.query_ids(index, 18.5, 73.8, 5000, 2), [2, 3])
+        self.assertEqual(self.query_ids(index, 18.5, 73.8, 500), [2])
+        self.assertEqual(self.query_ids(index, 0.0, 0.0, 5000), [])
+
+    def test_longitude_wraps_at_the_antimeridian(self):
+        index = self.index([(0.0, 179.995), (0.0, -179.995), (0.0, 179.0)])
+
+        positions, distances = index.query(0.0, -179.999, 5000)
+        self.assertEqual(index.ids[positions].tolist(), [2, 1])
+        self.assertLess(distances[-1], 2000)
+
+
+class NearbyFacilitiesTests(TestCase):
+    """find_nearby_facilities and the lazily rebuilt process index."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(geo, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.near = self.create_facility('Near', 18.501)
+        self.far = self.create_facility('Far', 18.52)
+        self.create_facility('Elsewhere', 19.5)
+
+    def create_facility(self, name, lat):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Facility.objects.create(
+                name=name, type='mall', address='Pune', onboarding_type='enterprise',
+                latitute=lat, longitude=73.8
+            )
+
+    def test_nearest_first_with_distances(self):
+        results = services.find_nearby_facilities(18.5, 73.8, 5000)
+
+        self.assertEqual([facility.id for facility in results], [self.near.id, self.far.id])
+        self.assertAlmostEqual(results[0].distance_m, 111, delta=2)
+        self.assertEqual(
+            [facility.id for facility in services.find_nearby_facilities(18.5, 73.8, 5000, limit=1)],
+            [self.near.id]
+        )
+
+    def test_index_is_reused_until_facilities_change(self):
+        index = geo.get_geo_index()
+        with self.assertNumQueries(0):
+            self.assertIs(geo.get_geo_index(), index)
+
+        added = self.create_facility('Added', 18.5)
+
+        rebuilt = geo.get_geo_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(services.find_nearby_facilities(18.5, 73.8, 5000)[0].id, added.id)
+
+    def test_index_is_rebuilt_after_max_age(self):
+        index = geo.get_geo_index()
+        with mock.patch.object(geo, 'GEO_INDEX_MAX_AGE', -1):
+            self.assertIsNot(geo.get_geo_index(), index)
@@ -2,18 +2,21 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from common.permissions import IsAdminOrReadOnly
+from common.conditional import conditional_get
+from common.permissions import IsAdminOrReadOnly, IsDeviceOrAdmin
 from .models import Facility, Floor, ParkingSpot, Device
 from .serializers import (
     FacilitySerializer, FacilityListSerializer,
-    FloorSerializer, ParkingSpotSerializer, DeviceSerializer
+    FloorSerializer, ParkingSpotSerializer, DeviceSerializer,
+    SensorEventBatchSerializer, DeviceHeartbeatSerializer
 )
 from . import services
+from .heartbeats import record_heartbeats
 
 
 class FacilityViewSet(viewsets.ModelViewSet):
     """ViewSet for Facility CRUD operations."""
-    queryset = Facility.objects.all()
+    queryset = Facility.objects.select_related('owner').with_spot_counts()
     permission_classes = [IsAdminOrReadOnly]
     
     def get_serializer_class(self):
@@ -21,7 +24,20 @@ class FacilityViewSet(viewsets.ModelViewSet):
             return FacilityListSerializer
         return FacilitySerializer
     
+    @conditional_get(lambda view, request: services.facility_list_validators())
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_get(lambda view, request, pk=None: (
+        services.facility_validators(pk) if str(pk).isdigit() else None
+    ))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
+    @conditional_get(lambda view, request, pk=None: (
+        services.facility_validators(pk) if str(pk).isdigit() else None
+    ))
     def stats(self, request, pk=None):
         """Get statistics for a facility."""
         facility = self.get_object()
@@ -31,7 +47,9 @@ class FacilityViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_listings(self, request):
         """Get facilities owned by the current user (for hosts)."""
-        facilities = Facility.objects.filter(owner=request.user)
+        facilities = Facility.objects.filter(owner=request.user).select_related(
+            'owner'
+        ).with_spot_counts()
         serializer = FacilityListSerializer(facilities, many=True)
         return Response(serializer.data)
     
@@ -72,6 +90,15 @@ class FloorViewSet(viewsets.ModelViewSet):
         if facility_id:
             queryset = queryset.filter(facility_id=facility_id)
         return queryset
+    
+    @action(detail=True, methods=['get'])
+    def confidence(self, request, pk=None):
+        """Confidence level of every spot on the floor (verification + sensor freshness)."""
+        from apps.confidence import services as confidence_services
+        
+        floor = self.get_object()
+        levels = confidence_services.get_floor_spot_confidence(floor.id)
+        return Response({'floor': floor.id, 'spots': levels})
 
 
 class ParkingSpotViewSet(viewsets.ModelViewSet):
@@ -127,3 +154,30 @@ class DeviceViewSet(viewsets.ModelViewSet):
         updated_device = services.bind_device_to_spot(device.device_code, spot_id)
         serializer = self.get_serializer(updated_device)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsDeviceOrAdmin])
+    def events(self, request):
+        """
+        Bulk-ingest sensor occupancy events.
+        Stale, duplicate and coalesced events are dropped; see the summary.
+        """
+        serializer = SensorEventBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = services.ingest_sensor_events(serializer.validated_data['events'])
+        return Response(result)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsDeviceOrAdmin])
+    def heartbeats(self, request):
+        """
+        Record that devices are alive. Buffered and written to
+        last_seen_at in bulk, so pings are cheap.
+        """
+        serializer = DeviceHeartbeatSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        device_codes = set(serializer.validated_data['device_codes'])
+        record_heartbeats((device_code, None) for device_code in device_codes)
+        return Response({'buffered': len(device_codes)}, status=status.HTTP_202_ACCEPTED)
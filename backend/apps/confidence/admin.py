@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import ConfidenceRun
 
-# Register your models here.
+
+@admin.register(ConfidenceRun)
+class ConfidenceRunAdmin(admin.ModelAdmin):
+    """Admin interface for bulk confidence recomputation runs."""
+    list_display = ['started_at', 'incremental', 'facilities_checked', 'facilities_updated']
+    list_filter = ['incremental']
+    readonly_fields = ['created_at', 'updated_at']
+    date_hierarchy = 'started_at'
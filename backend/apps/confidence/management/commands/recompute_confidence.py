@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.confidence import services
+
+
+class Command(BaseCommand):
+    help = "Recompute facility confidence scores in bulk from spot verification rates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help="Only recompute facilities whose spots changed since the last run",
+        )
+
+    def handle(self, *args, **options):
+        run = services.recompute_all_confidence(incremental=options['incremental'])
+        mode = "incremental" if run.incremental else "full"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {run.facilities_checked} facility(ies) ({mode}), "
+            f"updated {run.facilities_updated}"
+        ))
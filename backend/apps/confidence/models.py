@@ -1,3 +1,21 @@
 from django.db import models
+from common.models import TimeStampedModel
 
-# Create your models here.
+
+class ConfidenceRun(TimeStampedModel):
+    """
+    Bulk confidence recomputation; the latest run's started_at is the
+    cutoff for the next incremental run.
+    """
+    started_at = models.DateTimeField()
+    incremental = models.BooleanField(default=False)
+    facilities_checked = models.PositiveIntegerField(default=0)
+    facilities_updated = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-started_at']
+        get_latest_by = 'started_at'
+    
+    def __str__(self):
+        mode = "incremental" if self.incremental else "full"
+        return f"{mode} run @ {self.started_at:%Y-%m-%d %H:%M} ({self.facilities_updated} updated)"
@@ -1,7 +1,25 @@
 """
 Confidence and status calculation services for CONFIDENCE app.
 """
-from apps.atlas.models import Facility, ParkingSpot
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from apps.atlas.geo import invalidate_geo_index
+from apps.atlas.heartbeats import get_heartbeat_buffer
+from apps.atlas.models import Device, Facility, ParkingSpot
+from common.response_cache import FACILITY_LIST_SCOPE, facility_scope, invalidate_scopes
+from .models import ConfidenceRun
+
+# Facilities written per bulk_update statement in bulk recomputation
+CONFIDENCE_UPDATE_CHUNK = 500
+
+# Facilities lose STALE_SENSOR_PENALTY points when fewer than this share of
+# their sensors sent a heartbeat within SENSOR_FRESHNESS_SECONDS
+MIN_LIVE_SENSOR_RATE = 0.5
+STALE_SENSOR_PENALTY = 10
 
 
 def compute_facility_confidence(facility):
@@ -15,63 +33,152 @@ def compute_facility_confidence(facility):
     Bonuses:
     - +5 for high verification rate (>80%)
     
+    Penalties:
+    - -10 when fewer than half of the facility's sensors are fresh
+    
     Args:
         facility: Facility instance
         
+    Returns:
+        Integer confidence score (0-100)
+    """
+    counts = ParkingSpot.objects.filter(floor__facility=facility).aggregate(
+        total=Count('id'),
+        verified=Count('id', filter=Q(verified=True)),
+        sensors=Count('device', filter=Q(device__device_type='sensor')),
+        live_sensors=Count('device', filter=Q(
+            device__device_type='sensor', device__last_seen_at__gte=sensor_freshness_cutoff()
+        )),
+    )
+    
+    return score_from_counts(
+        facility.onboarding_type, counts['total'], counts['verified'],
+        counts['sensors'], counts['live_sensors']
+    )
+
+
+def score_from_counts(onboarding_type, total_spots, verified_spots,
+                      sensor_spots=0, live_sensor_spots=0):
+    """
+    Confidence score from pre-aggregated spot counts; the rules of
+    compute_facility_confidence without any queries.
+    
+    Args:
+        onboarding_type: Facility onboarding type
+        total_spots: Number of spots in the facility
+        verified_spots: Number of verified spots
+        sensor_spots: Number of spots with a sensor bound
+        live_sensor_spots: Number of those sensors heard from recently
+        
     Returns:
         Integer confidence score (0-100)
     """
     # Base score by onboarding type
-    if facility.onboarding_type == 'enterprise':
+    if onboarding_type == 'enterprise':
         base_score = 95
     else:
         base_score = 80
     
-    # Calculate verification rate
-    total_spots = ParkingSpot.objects.filter(floor__facility=facility).count()
-    
     if total_spots == 0:
         return base_score
     
-    verified_spots = ParkingSpot.objects.filter(
-        floor__facility=facility,
-        verified=True
-    ).count()
-    
     verification_rate = (verified_spots / total_spots) * 100
     
     # Bonus for high verification
     if verification_rate > 80:
         base_score = min(100, base_score + 5)
     
+    # Penalty for a mostly silent sensor network
+    if sensor_spots and live_sensor_spots / sensor_spots < MIN_LIVE_SENSOR_RATE:
+        base_score = max(0, base_score - STALE_SENSOR_PENALTY)
+    
     return base_score
 
 
-def compute_spot_confidence(spot):
+def sensor_freshness_cutoff(now=None):
+    """Heartbeats older than this make a sensor stale."""
+    now = now or timezone.now()
+    return now - timedelta(seconds=settings.SENSOR_FRESHNESS_SECONDS)
+
+
+def spot_confidence_level(verified, has_sensor, last_seen_at, cutoff):
     """
-    Calculate confidence level for a parking spot.
+    Confidence level of one spot from pre-fetched values.
     
     Returns:
-    - 'high': Verified spot with device
-    - 'medium': Verified spot or has device
-    - 'low': Unverified, no device
+    - 'high': Verified spot with a fresh sensor
+    - 'medium': Verified spot or fresh sensor
+    - 'low': Unverified, no sensor or a stale one
     
     Args:
-        spot: ParkingSpot instance
+        verified: Whether the spot is verified
+        has_sensor: Whether a sensor is bound to the spot
+        last_seen_at: Sensor's last heartbeat, or None
+        cutoff: Oldest heartbeat that still counts as fresh
         
     Returns:
         String confidence level
     """
-    has_device = spot.devices.exists()
+    live_sensor = has_sensor and last_seen_at is not None and last_seen_at >= cutoff
     
-    if spot.verified and has_device:
+    if verified and live_sensor:
         return 'high'
-    elif spot.verified or has_device:
+    elif verified or live_sensor:
         return 'medium'
     else:
         return 'low'
 
 
+def compute_spot_confidence(spot):
+    """
+    Calculate confidence level for a parking spot.
+    See spot_confidence_level for the levels.
+    
+    Args:
+        spot: ParkingSpot instance
+        
+    Returns:
+        String confidence level
+    """
+    return get_floor_spot_confidence(spot.floor_id, spot_ids=[spot.id]).get(spot.id, 'low')
+
+
+def get_floor_spot_confidence(floor_id, spot_ids=None):
+    """
+    Confidence levels for every spot on a floor with one query, counting
+    heartbeats still waiting in this process's buffer as well.
+    
+    Args:
+        floor_id: ID of the floor
+        spot_ids: Optional subset of spot IDs
+        
+    Returns:
+        Dict of spot ID to confidence level
+    """
+    spots = ParkingSpot.objects.filter(floor_id=floor_id)
+    if spot_ids is not None:
+        spots = spots.filter(id__in=spot_ids)
+    rows = list(spots.order_by().values_list(
+        'id', 'verified', 'device__device_code', 'device__device_type', 'device__last_seen_at'
+    ))
+    
+    pending = get_heartbeat_buffer().peek(
+        device_code for _, _, device_code, device_type, _ in rows if device_type == 'sensor'
+    )
+    cutoff = sensor_freshness_cutoff()
+    levels = {}
+    for spot_id, verified, device_code, device_type, last_seen_at in rows:
+        if device_type != 'sensor':
+            device_code = last_seen_at = None
+        buffered = pending.get(device_code)
+        if buffered is not None and (last_seen_at is None or buffered > last_seen_at):
+            last_seen_at = buffered
+        levels[spot_id] = spot_confidence_level(
+            verified, device_code is not None, last_seen_at, cutoff
+        )
+    return levels
+
+
 def get_status_badges(facility):
     """
     Get status badges for a facility.
@@ -79,26 +186,72 @@ def get_status_badges(facility):
     Args:
         facility: Facility instance
         
+    Returns:
+        List of badge strings
+    """
+    # Denormalized counters, no COUNT queries
+    return badges_from_counts(
+        facility.confidence_score,
+        facility.onboarding_type,
+        facility.total_spots,
+        facility.verified_count,
+        facility.available_count,
+    )
+
+
+def get_status_badges_bulk(facilities):
+    """
+    Status badges for many facilities in one pass.
+    
+    Counts are read from the with_spot_counts() (or with_live_spot_counts())
+    annotations, falling back to the counters, so no facility triggers a
+    query of its own.
+    
+    Args:
+        facilities: Iterable of Facility instances
+        
+    Returns:
+        Dict of facility ID to list of badge strings
+    """
+    return {
+        facility.id: badges_from_counts(
+            facility.confidence_score,
+            facility.onboarding_type,
+            facility.spots_total,
+            facility.spots_verified,
+            facility.spots_available,
+        )
+        for facility in map(Facility.ensure_spot_counts, facilities)
+    }
+
+
+def badges_from_counts(confidence_score, onboarding_type, total_spots,
+                       verified_spots, available_spots):
+    """
+    Status badges from pre-aggregated facility numbers.
+    
+    Args:
+        confidence_score: Facility confidence score
+        onboarding_type: Facility onboarding type
+        total_spots: Number of spots in the facility
+        verified_spots: Number of verified spots
+        available_spots: Number of available spots
+        
     Returns:
         List of badge strings
     """
     badges = []
     
     # Confidence-based badges
-    if facility.confidence_score >= 95:
+    if confidence_score >= 95:
         badges.append('High Confidence')
     
     # Onboarding type badges
-    if facility.onboarding_type == 'enterprise':
+    if onboarding_type == 'enterprise':
         badges.append('Enterprise Verified')
     
     # Verification badges
-    total_spots = ParkingSpot.objects.filter(floor__facility=facility).count()
     if total_spots > 0:
-        verified_spots = ParkingSpot.objects.filter(
-            floor__facility=facility,
-            verified=True
-        ).count()
         verification_rate = (verified_spots / total_spots) * 100
         
         if verification_rate >= 90:
@@ -107,11 +260,6 @@ def get_status_badges(facility):
             badges.append('Partially Verified')
     
     # Availability badge
-    available_spots = ParkingSpot.objects.filter(
-        floor__facility=facility,
-        status='available'
-    ).count()
-    
     if available_spots > 0:
         badges.append('Available Now')
     
@@ -135,3 +283,84 @@ def update_facility_confidence(facility_id):
     facility.save(update_fields=['confidence_score', 'updated_at'])
     
     return facility
+
+
+def recompute_all_confidence(incremental=False):
+    """
+    Recalculate confidence scores for all facilities in bulk.
+    
+    Verification rates come from one grouped aggregate over the spots,
+    and only changed scores are written, with bulk_update in chunks.
+    Incremental runs only consider facilities that changed, or whose
+    spots changed, since the last run started (spot changes also bump
+    the facility through its counters), plus facilities with sensors
+    whose freshness may have flipped since then.
+    
+    Args:
+        incremental: If True, skip facilities untouched since the last run
+        
+    Returns:
+        ConfidenceRun recording the run
+    """
+    started_at = timezone.now()
+    cutoff = sensor_freshness_cutoff(started_at)
+    facilities = Facility.objects.all()
+    
+    last_run = ConfidenceRun.objects.order_by('-started_at').first() if incremental else None
+    if last_run is not None:
+        since = last_run.started_at
+        facilities = facilities.filter(
+            Q(updated_at__gte=since) |
+            Exists(ParkingSpot.objects.filter(
+                floor__facility=OuterRef('pk'), updated_at__gte=since
+            )) |
+            # Sensors heard from since the last run, or gone stale since then
+            Exists(Device.objects.filter(
+                bound_spot__floor__facility=OuterRef('pk'),
+                device_type='sensor',
+                last_seen_at__gte=sensor_freshness_cutoff(since)
+            ))
+        )
+    
+    sensors = 'floors__spots__device'
+    is_sensor = Q(floors__spots__device__device_type='sensor')
+    rows = facilities.with_live_spot_counts().annotate(
+        sensor_spots=Count(sensors, filter=is_sensor),
+        live_sensor_spots=Count(sensors, filter=is_sensor & Q(floors__spots__device__last_seen_at__gte=cutoff)),
+    ).order_by().values_list(
+        'id', 'onboarding_type', 'confidence_score', 'spots_total', 'spots_verified',
+        'sensor_spots', 'live_sensor_spots'
+    )
+    
+    checked = 0
+    changed = []
+    for facility_id, onboarding_type, current_score, *counts in rows.iterator():
+        checked += 1
+        new_score = score_from_counts(onboarding_type, *counts)
+        if new_score != current_score:
+            changed.append(Facility(id=facility_id, confidence_score=new_score))
+    
+    # bulk_update skips auto_now, and updated_at feeds the conditional GET validators
+    now = timezone.now()
+    for start in range(0, len(changed), CONFIDENCE_UPDATE_CHUNK):
+        chunk = changed[start:start + CONFIDENCE_UPDATE_CHUNK]
+        for facility in chunk:
+            facility.updated_at = now
+        with transaction.atomic():
+            Facility.objects.bulk_update(chunk, ['confidence_score', 'updated_at'])
+    
+    if changed:
+        # bulk_update sends no post_save, so the geo index and cached
+        # responses would keep old scores
+        invalidate_geo_index()
+        transaction.on_commit(partial(
+            invalidate_scopes,
+            FACILITY_LIST_SCOPE, *(facility_scope(facility.id) for facility in changed)
+        ))
+    
+    return ConfidenceRun.objects.create(
+        started_at=started_at,
+        incremental=last_run is not None,
+        facilities_checked=checked,
+        facilities_updated=len(changed),
+    )
@@ -1,8 +1,18 @@
 from rest_framework import serializers
 from apps.atlas.models import Facility, Floor, ParkingSpot
+from apps.confidence import services as confidence_services
 from apps.orbit.models import Booking
 
 
+class BadgedFacilityListSerializer(serializers.ListSerializer):
+    """Computes the badges for a whole page of facilities in one pass."""
+    
+    def to_representation(self, data):
+        facilities = list(data.all() if hasattr(data, 'all') else data)
+        self.child.badges_by_id = confidence_services.get_status_badges_bulk(facilities)
+        return super().to_representation(facilities)
+
+
 class MobileFacilityListSerializer(serializers.ModelSerializer):
     """Lightweight facility list for mobile app."""
     available_spots = serializers.SerializerMethodField()
@@ -14,6 +24,7 @@ class MobileFacilityListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Facility
+        list_serializer_class = BadgedFacilityListSerializer
         fields = [
             'id', 'name', 'type', 'onboarding_type', 'confidence', 
             'available_spots', 'price', 'badges', 'owner_name', 'requires_approval',
@@ -21,25 +32,17 @@ class MobileFacilityListSerializer(serializers.ModelSerializer):
         ]
     
     def get_available_spots(self, obj):
-        return ParkingSpot.objects.filter(
-            floor__facility=obj,
-            status='available'
-        ).count()
+        return obj.ensure_spot_counts().spots_available
     
     def get_price(self, obj):
         """Return actual hourly rate if set, otherwise default."""
-        if obj.hourly_rate:
-            return float(obj.hourly_rate)
-        # Default pricing for MVP
-        price_map = {
-            'mall': 50,
-            'office': 40,
-            'lot': 30
-        }
-        return price_map.get(obj.type, 40)
+        return obj.effective_hourly_rate
     
     def get_badges(self, obj):
-        from apps.confidence import services as confidence_services
+        # Filled per page by BadgedFacilityListSerializer
+        badges_by_id = getattr(self, 'badges_by_id', None)
+        if badges_by_id is not None and obj.id in badges_by_id:
+            return badges_by_id[obj.id]
         return confidence_services.get_status_badges(obj)
     
     def get_owner_name(self, obj):
@@ -75,33 +78,23 @@ class MobileFacilityDetailSerializer(serializers.ModelSerializer):
         ]
     
     def get_available_spots(self, obj):
-        return ParkingSpot.objects.filter(
-            floor__facility=obj,
-            status='available'
-        ).count()
+        return obj.ensure_spot_counts().spots_available
     
     def get_price(self, obj):
         """Return actual hourly rate if set, otherwise default."""
-        if obj.hourly_rate:
-            return float(obj.hourly_rate)
-        price_map = {
-            'mall': 50,
-            'office': 40,
-            'lot': 30
-        }
-        return price_map.get(obj.type, 40)
+        return obj.effective_hourly_rate
     
     def get_floors(self, obj):
+        # Denormalized floor counters; pair with prefetch_related('floors')
         floors = obj.floors.all()
         return [{
             'id': floor.id,
             'label': floor.label,
-            'spots_count': floor.spots.count(),
-            'available_count': floor.spots.filter(status='available').count()
+            'spots_count': floor.total_spots,
+            'available_count': floor.available_count
         } for floor in floors]
     
     def get_badges(self, obj):
-        from apps.confidence import services as confidence_services
         return confidence_services.get_status_badges(obj)
     
     def get_owner_name(self, obj):
@@ -115,6 +108,61 @@ class MobileFacilityDetailSerializer(serializers.ModelSerializer):
         return obj.onboarding_type == 'p2p'
 
 
+class NearbyQuerySerializer(serializers.Serializer):
+    """Query parameters for nearby facility search."""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=1, max_value=50000, default=5000)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class MobileNearbyFacilitySerializer(MobileFacilityListSerializer):
+    """Facility list entry with its distance from the search point."""
+    distance_m = serializers.SerializerMethodField()
+    
+    class Meta(MobileFacilityListSerializer.Meta):
+        fields = MobileFacilityListSerializer.Meta.fields + ['distance_m']
+    
+    def get_distance_m(self, obj):
+        return round(obj.distance_m, 1)
+
+
+class RecommendQuerySerializer(NearbyQuerySerializer):
+    """Query parameters for facility recommendations."""
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=5)
+    duration_hours = serializers.FloatField(min_value=0.5, max_value=24, default=1.0)
+    w_distance = serializers.FloatField(min_value=0, required=False)
+    w_availability = serializers.FloatField(min_value=0, required=False)
+    w_price = serializers.FloatField(min_value=0, required=False)
+    w_confidence = serializers.FloatField(min_value=0, required=False)
+    
+    def get_weights(self):
+        """Weight overrides given in the request, keyed by component."""
+        return {
+            key[2:]: value for key, value in self.validated_data.items()
+            if key.startswith('w_')
+        }
+
+
+class MobileRecommendationSerializer(serializers.Serializer):
+    """Recommended facility with its score and the spot it would assign."""
+    facility = MobileNearbyFacilitySerializer()
+    score = serializers.FloatField()
+    components = serializers.DictField(child=serializers.FloatField())
+    spot = serializers.SerializerMethodField()
+    
+    def get_spot(self, obj):
+        spot = obj['spot']
+        if spot is None:
+            return None
+        return {
+            'id': spot.id,
+            'code': spot.code,
+            'floor_id': spot.floor_id,
+            'floor': spot.floor.label,
+        }
+
+
 class MobileSpotSerializer(serializers.ModelSerializer):
     """Spot data for floor map overlay."""
     class Meta:
@@ -126,10 +174,11 @@ class MobileFloorMapSerializer(serializers.ModelSerializer):
     """Floor map with spot overlay data."""
     spots = MobileSpotSerializer(many=True, read_only=True)
     facility_name = serializers.CharField(source='facility.name', read_only=True)
+    version = serializers.IntegerField(source='map_version', read_only=True)
     
     class Meta:
         model = Floor
-        fields = ['id', 'label', 'facility_name', 'floorplan_image', 'spots']
+        fields = ['id', 'label', 'facility_name', 'floorplan_image', 'version', 'spots']
 
 
 class MobileBookingSerializer(serializers.ModelSerializer):
@@ -0,0 +1,213 @@
+"""
+Aggregation services for the mobile API.
+Combine inventory (ATLAS) and booking (ORBIT) data for app-level features.
+"""
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from apps.atlas.geo import get_geo_index
+from apps.atlas.models import Facility
+from apps.orbit import services as orbit_services
+
+# Relative weights of the recommendation score components; overridable via
+# settings.RECOMMENDATION_WEIGHTS and per request. Normalized to sum to 1.
+DEFAULT_RECOMMENDATION_WEIGHTS = {
+    'distance': 0.4,
+    'availability': 0.25,
+    'price': 0.2,
+    'confidence': 0.15,
+}
+
+# Nearest facilities scored per request; bounds the work for dense areas
+MAX_RECOMMENDATION_CANDIDATES = 500
+
+# Spillover booking: alternative facilities tried after a miss, and how far
+# away they may be
+MAX_SPILLOVER_CANDIDATES = 5
+DEFAULT_SPILLOVER_RADIUS_M = 3000
+MAX_SPILLOVER_RADIUS_M = 20000
+# Facility ids per capacity lookup; keeps the IN clause under SQLite's
+# bound-parameter limit however many facilities the radius covers
+SPILLOVER_LOOKUP_CHUNK = 500
+
+
+def get_recommendation_weights(overrides=None):
+    """
+    Effective score weights, normalized to sum to 1.
+    
+    Args:
+        overrides: Optional dict of component -> weight
+        
+    Returns:
+        Dictionary of component -> weight
+    """
+    weights = dict(DEFAULT_RECOMMENDATION_WEIGHTS)
+    weights.update(getattr(settings, 'RECOMMENDATION_WEIGHTS', {}))
+    weights.update({key: value for key, value in (overrides or {}).items() if key in weights})
+    
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("At least one recommendation weight must be positive")
+    return {key: value / total for key, value in weights.items()}
+
+
+def score_facilities(distances, radius_m, available, total, price, confidence, weights):
+    """
+    Vectorized facility scores in [0, 1], higher is better.
+    
+    Args:
+        distances: Distances from the search point in meters
+        radius_m: Search radius (distance score reaches 0 at the edge)
+        available, total: Available and total spot counts
+        price: Effective hourly prices
+        confidence: Confidence scores (0-100)
+        weights: Normalized component weights
+        
+    Returns:
+        (scores, components) where components maps name -> score array
+    """
+    price_range = price.max() - price.min() if price.size else 0
+    components = {
+        'distance': 1 - np.clip(distances / radius_m, 0, 1),
+        'availability': np.divide(
+            available, total, out=np.zeros_like(available, dtype=np.float64), where=total > 0
+        ),
+        'price': (price.max() - price) / price_range if price_range else np.ones_like(price),
+        'confidence': np.clip(confidence / 100.0, 0, 1),
+    }
+    scores = sum(weights[name] * values for name, values in components.items())
+    return scores, components
+
+
+def recommend_facilities(lat, lon, radius_m, limit=5, duration_hours=1.0, weights=None):
+    """
+    Rank facilities near a point by a weighted score of distance,
+    availability, price and confidence, and pick the spot each would assign.
+    The suggested spots are looked up for all ranked facilities at once, so
+    the query count does not grow with limit.
+    
+    Args:
+        lat, lon: Search point in degrees
+        radius_m: Search radius in meters
+        limit: Number of recommendations
+        duration_hours: Booking length used to pick the spot
+        weights: Optional weight overrides
+        
+    Returns:
+        List of dicts with facility, score, components and spot (or None),
+        best first
+    """
+    weights = get_recommendation_weights(weights)
+    index = get_geo_index()
+    positions, distances = index.query(lat, lon, radius_m, MAX_RECOMMENDATION_CANDIDATES)
+    if not positions.size:
+        return []
+    
+    ids = index.ids[positions]
+    counts = {
+        facility_id: (available, total)
+        for facility_id, available, total in Facility.objects.filter(id__in=ids.tolist())
+        .with_spot_counts().order_by().values_list('id', 'spots_available', 'spots_total')
+    }
+    available, total = np.array(
+        [counts.get(facility_id, (0, 0)) for facility_id in ids.tolist()], dtype=np.float64
+    ).reshape(-1, 2).T
+    
+    # Full facilities cannot be booked; drop them before ranking
+    bookable = available > 0
+    ids, distances, available, total = ids[bookable], distances[bookable], available[bookable], total[bookable]
+    positions = positions[bookable]
+    if not ids.size:
+        return []
+    
+    scores, components = score_facilities(
+        distances, radius_m, available, total,
+        index.price[positions], index.confidence[positions], weights
+    )
+    top = np.argsort(-scores, kind='stable')[:limit]
+    
+    top_ids = ids[top].tolist()
+    facilities = Facility.objects.select_related('owner').with_spot_counts().in_bulk(top_ids)
+    start_time = timezone.now()
+    end_time = start_time + timedelta(hours=duration_hours)
+    spots = orbit_services.find_best_available_spots(top_ids, start_time, end_time)
+    
+    recommendations = []
+    for rank, facility_id in zip(top.tolist(), top_ids):
+        facility = facilities.get(facility_id)
+        if facility is None:
+            continue
+        facility.distance_m = float(distances[rank])
+        recommendations.append({
+            'facility': facility,
+            'score': float(scores[rank]),
+            'components': {name: float(values[rank]) for name, values in components.items()},
+            'spot': spots.get(facility_id),
+        })
+    return recommendations
+
+
+def create_booking_with_spillover(user, facility_id, duration_hours,
+                                  radius_m=DEFAULT_SPILLOVER_RADIUS_M,
+                                  max_candidates=MAX_SPILLOVER_CANDIDATES):
+    """
+    Book at the requested facility, or at the nearest facility with
+    capacity if it is full.
+    
+    Alternatives are the facilities the geo index finds within radius_m,
+    checked nearest first in chunks of SPILLOVER_LOOKUP_CHUNK against
+    their available-spot counters until max_candidates with capacity are
+    found. Facilities needing host approval (P2P) are never used as
+    alternatives.
+    
+    Args:
+        user: User instance
+        facility_id: Requested facility ID
+        duration_hours: Booking duration in hours
+        radius_m: Maximum distance of alternatives in meters
+        max_candidates: Maximum alternatives tried
+        
+    Returns:
+        (booking, distance_m) tuple; distance_m is None when the
+        requested facility was booked
+        
+    Raises:
+        NoAvailableSpots: If neither the facility nor any alternative has a spot
+    """
+    try:
+        return orbit_services.create_booking(user, facility_id, duration_hours), None
+    except orbit_services.NoAvailableSpots as miss:
+        no_spots = miss
+    
+    origin = Facility.objects.filter(id=facility_id).values_list('latitute', 'longitude').first()
+    if origin is None or None in origin:
+        raise no_spots
+    
+    index = get_geo_index()
+    # Uncapped: the nearest facilities are often the full ones
+    positions, distances = index.query(float(origin[0]), float(origin[1]), radius_m)
+    distance_by_id = {
+        facility_id_: distance
+        for facility_id_, distance in zip(index.ids[positions].tolist(), distances.tolist())
+        if facility_id_ != facility_id
+    }
+    nearest_ids = list(distance_by_id)
+    candidates = []
+    for offset in range(0, len(nearest_ids), SPILLOVER_LOOKUP_CHUNK):
+        chunk = nearest_ids[offset:offset + SPILLOVER_LOOKUP_CHUNK]
+        with_capacity = set(Facility.objects.filter(
+            id__in=chunk, available_count__gt=0
+        ).exclude(onboarding_type='p2p').values_list('id', flat=True))
+        candidates.extend(id_ for id_ in chunk if id_ in with_capacity)
+        if len(candidates) >= max_candidates:
+            break
+    
+    for candidate_id in candidates[:max_candidates]:
+        try:
+            booking = orbit_services.create_booking(user, candidate_id, duration_hours)
+        except orbit_services.NoAvailableSpots:
+            continue
+        return booking, distance_by_id[candidate_id]
+    
+    raise no_spots
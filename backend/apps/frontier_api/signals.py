@@ -0,0 +1,63 @@
+"""
+Signal handlers for FRONTIER_API.
+Invalidate cached mobile responses (common.response_cache) when the data
+behind them changes: Facility and Floor saves and deletes, and spot
+counter or geometry changes reported by atlas through floors_changed.
+ParkingSpot saves and the booking flow's spot transitions reach the cache
+through floors_changed, since ATLAS maintains the counters for both.
+Versions are bumped after commit.
+"""
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.atlas.models import Facility, Floor
+from apps.atlas.services import floors_changed
+from common.response_cache import (
+    FACILITY_LIST_SCOPE, facility_scope, floor_scope, invalidate_scopes
+)
+
+
+def _invalidate_floors(floor_ids):
+    """Floors' maps, their facilities' details and the facility list."""
+    facility_ids = set(
+        Floor.objects.filter(id__in=floor_ids).values_list('facility_id', flat=True)
+    )
+    invalidate_scopes(
+        FACILITY_LIST_SCOPE,
+        *map(facility_scope, facility_ids),
+        *map(floor_scope, floor_ids),
+    )
+
+
+@receiver(floors_changed)
+def invalidate_on_floors_changed(sender, floor_ids, **kwargs):
+    """Spot statuses, verification or geometry changed on these floors."""
+    if floor_ids:
+        transaction.on_commit(partial(_invalidate_floors, list(floor_ids)))
+
+
+def _invalidate_facility(facility_id):
+    """A facility's list entry, its detail and its floor maps."""
+    floor_ids = Floor.objects.filter(facility_id=facility_id).values_list('id', flat=True)
+    invalidate_scopes(
+        FACILITY_LIST_SCOPE, facility_scope(facility_id), *map(floor_scope, floor_ids)
+    )
+
+
+@receiver([post_save, post_delete], sender=Facility)
+def invalidate_on_facility_change(sender, instance, **kwargs):
+    """Facility fields show in the list, its detail and its floor maps."""
+    transaction.on_commit(partial(_invalidate_facility, instance.id))
+
+
+@receiver([post_save, post_delete], sender=Floor)
+def invalidate_on_floor_change(sender, instance, **kwargs):
+    """
+    Floor labels show in the facility detail and the floor map; deleting
+    a floor also changes the facility's counts in the list.
+    """
+    transaction.on_commit(partial(
+        invalidate_scopes,
+        FACILITY_LIST_SCOPE, facility_scope(instance.facility_id), floor_scope(instance.id)
+    ))
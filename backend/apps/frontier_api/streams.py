@@ -0,0 +1,92 @@
+"""
+Realtime spot status streams for the mobile app.
+
+- SSE:       GET /api/mobile/floors/{id}/stream/, /api/mobile/facilities/{id}/stream/
+- WebSocket: ws://<host>/ws/spots/?floor=3&facility=1 (ASGI only, see parkhero/asgi.py)
+
+Both deliver the deltas published by apps.atlas.realtime. Subscribe first,
+then fetch the floor map, so no change falls between the two; a
+{"type":"resync"} message means deltas were dropped and the map should be
+re-fetched.
+"""
+import asyncio
+from urllib.parse import parse_qs
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from common.broker import get_broker
+from apps.atlas.realtime import floor_topic, facility_topic
+
+SSE_KEEPALIVE_SECONDS = 15
+MAX_WEBSOCKET_TOPICS = 20
+
+
+async def _sse_events(topic):
+    subscription = get_broker().subscribe([topic])
+    try:
+        yield 'event: ready\ndata: {}\n\n'
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f'data: {payload}\n\n'
+    finally:
+        subscription.close()
+
+
+def _sse_response(topic):
+    response = StreamingHttpResponse(_sse_events(topic), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def floor_stream(request, floor_id):
+    """Server-sent events with spot status deltas for one floor."""
+    return _sse_response(floor_topic(floor_id))
+
+
+@require_GET
+async def facility_stream(request, facility_id):
+    """Server-sent events with spot status deltas for every floor of a facility."""
+    return _sse_response(facility_topic(facility_id))
+
+
+def _websocket_topics(query_string):
+    params = parse_qs(query_string.decode())
+    topics = []
+    for key, topic in (('floor', floor_topic), ('facility', facility_topic)):
+        for value in params.get(key, []):
+            if value.isdigit():
+                topics.append(topic(int(value)))
+    return topics
+
+
+async def websocket_application(scope, receive, send):
+    """Raw ASGI websocket endpoint pushing spot deltas for the requested topics."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    
+    topics = _websocket_topics(scope.get('query_string', b''))
+    if not topics or len(topics) > MAX_WEBSOCKET_TOPICS:
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+    
+    await send({'type': 'websocket.accept'})
+    subscription = get_broker().subscribe(topics)
+    
+    async def pump():
+        while True:
+            await send({'type': 'websocket.send', 'text': await subscription.get()})
+    
+    pump_task = asyncio.create_task(pump())
+    try:
+        # Client messages are ignored; we only wait for the disconnect
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+    finally:
+        pump_task.cancel()
+        subscription.close()
@@ -1,3 +1,360 @@
+import unittest
+from base64 import b64decode
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+from apps.atlas import geo
+from apps.atlas.models import SPOT_STATUS_CODES, Facility, Floor, ParkingSpot
+from apps.orbit.models import Booking
+from apps.orbit import services as orbit_services, slots
+from apps.frontier_api import services
+from apps.frontier_api.views import MobileFloorViewSet
+from common.renderers import ColumnarJSONRenderer, msgpack
 
-# Create your tests here.
+
+def create_facility(floors, spots_per_floor=4):
+    facility = Facility.objects.create(
+        name='Budget Mall', type='mall', address='Pune',
+        onboarding_type='enterprise'
+    )
+    for i in range(floors):
+        floor = Floor.objects.create(facility=facility, label=f'L{i}')
+        for j in range(spots_per_floor):
+            ParkingSpot.objects.create(
+                floor=floor, code=f'S-{j:03d}', x=j, y=0, distance_from_entry=j,
+                status='available' if j % 2 == 0 else 'occupied'
+            )
+    return facility
+
+
+class FacilityDetailQueryBudgetTests(TestCase):
+    """The facility detail endpoint runs a fixed number of queries."""
+
+    # Conditional GET validators, facility with owner, floors (cache miss)
+    QUERY_BUDGET = 3
+
+    def setUp(self):
+        cache.clear()
+
+    def get_detail(self, facility):
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(f'/api/mobile/facilities/{facility.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_floors(self):
+        for floors in (1, 8):
+            with self.subTest(floors=floors):
+                data = self.get_detail(create_facility(floors))
+                self.assertEqual(len(data['floors']), floors)
+
+    def test_floor_counts_match_facility_totals(self):
+        data = self.get_detail(create_facility(3))
+
+        self.assertEqual(
+            [(floor['spots_count'], floor['available_count']) for floor in data['floors']],
+            [(4, 2)] * 3
+        )
+        self.assertEqual(data['available_spots'], 6)
+        self.assertIn('Available Now', data['badges'])
+
+
+class MobileResponseCacheTests(TestCase):
+    """Mobile reads are served from the response cache until data changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.facility = create_facility(2)
+        self.floor = self.facility.floors.first()
+
+    def test_repeat_reads_hit_the_cache(self):
+        for url in (
+            '/api/mobile/facilities/',
+            f'/api/mobile/facilities/{self.facility.id}/',
+            f'/api/mobile/floors/{self.floor.id}/map/',
+        ):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(first['X-Cache'], 'miss')
+                self.assertEqual(second['X-Cache'], 'hit')
+                self.assertEqual(first.json(), second.json())
+
+                with self.assertNumQueries(0):
+                    revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(revalidated.status_code, 304)
+
+    def test_spot_change_invalidates_dependent_responses(self):
+        detail_url = f'/api/mobile/facilities/{self.facility.id}/'
+        other = create_facility(1)
+        other_url = f'/api/mobile/facilities/{other.id}/'
+        for url in (detail_url, other_url, '/api/mobile/facilities/'):
+            self.client.get(url)
+
+        spot = ParkingSpot.objects.filter(floor=self.floor, status='available').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            spot.status = 'occupied'
+            spot.save()
+
+        detail = self.client.get(detail_url)
+        self.assertEqual(detail['X-Cache'], 'miss')
+        self.assertEqual(detail.json()['available_spots'], 3)
+        self.assertEqual(self.client.get('/api/mobile/facilities/')['X-Cache'], 'miss')
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'hit')
+
+
+class AvailabilityTimelineTests(TestCase):
+    """Free capacity per 15-minute slot, cached until bookings change."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('driver', password='x')
+        # Four spots: one blocked and one occupied leave a capacity of two
+        self.facility = create_facility(1)
+        spots = list(ParkingSpot.objects.filter(floor__facility=self.facility).order_by('code'))
+        for spot, spot_status in zip(spots, ('blocked', 'occupied', 'available', 'available')):
+            spot.status = spot_status
+            spot.save()
+        self.spots = spots
+        self.day = timezone.now().date() + timedelta(days=1)
+        self.midnight = slots.day_start(self.day)
+        self.url = f'/api/mobile/facilities/{self.facility.id}/availability/'
+
+    def at(self, hours, minutes=0):
+        return self.midnight + timedelta(hours=hours, minutes=minutes)
+
+    def book(self, start, end, booking_status='reserved'):
+        return Booking.objects.create(
+            user=self.user, spot=self.spots[2], start_time=start, end_time=end,
+            status=booking_status, access_code=f'T{Booking.objects.count():07d}'
+        )
+
+    def available(self, timeline, hours, minutes=0):
+        return timeline['slots'][hours * 4 + minutes // 15]['available']
+
+    def get_timeline(self):
+        response = self.client.get(self.url, {'date': self.day.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_capacity_per_slot(self):
+        self.book(self.at(10), self.at(11))
+        self.book(self.at(10, 30), self.at(10, 40))
+        self.book(self.at(10), self.at(12), 'cancelled')
+
+        timeline = self.get_timeline()
+
+        self.assertEqual(timeline['capacity'], 2)
+        self.assertEqual(len(timeline['slots']), slots.SLOTS_PER_DAY)
+        self.assertEqual(self.available(timeline, 9, 45), 2)
+        self.assertEqual(self.available(timeline, 10), 1)
+        # The short booking only covers part of the slot but still counts
+        self.assertEqual(self.available(timeline, 10, 30), 0)
+        self.assertEqual(self.available(timeline, 10, 45), 1)
+        # Windows are half-open: a booking ending at 11:00 frees that slot
+        self.assertEqual(self.available(timeline, 11), 2)
+
+    def test_booking_invalidates_cached_timeline(self):
+        self.assertEqual(self.available(self.get_timeline(), 10), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            orbit_services.create_booking(
+                self.user, self.facility.id, 1, start_time=self.at(10)
+            )
+
+        self.assertEqual(self.available(self.get_timeline(), 10), 1)
+
+    def test_invalid_dates_are_rejected(self):
+        for value in ('tomorrow', '2024-13-45', '2024-02-30'):
+            with self.subTest(date=value):
+                response = self.client.get(self.url, {'date': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'date must be in YYYY-MM-DD format'})
+
+    def test_unknown_facility_is_not_found(self):
+        for pk in (self.facility.id + 100, 'abc'):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/mobile/facilities/{pk}/availability/')
+                self.assertEqual(response.status_code, 404)
+
+
+class ColumnarFloorMapTests(TestCase):
+    """Columnar (and MessagePack) floor maps carry the same spots as JSON."""
+
+    STATUS_NAMES = {code: name for name, code in SPOT_STATUS_CODES.items()}
+
+    def setUp(self):
+        cache.clear()
+        self.floor = create_facility(1, spots_per_floor=6).floors.get()
+        blocked = self.floor.spots.order_by('id')[2]
+        blocked.status = 'blocked'
+        blocked.save()
+        self.url = f'/api/mobile/floors/{self.floor.id}/map/'
+
+    def json_spots(self):
+        spots = self.client.get(self.url).json()['spots']
+        return sorted(
+            (spot['id'], spot['code'], spot['x'], spot['y'], spot['status']) for spot in spots
+        )
+
+    def decode(self, payload, statuses):
+        geometry = self.client.get(
+            f'/api/mobile/floors/{self.floor.id}/geometry/', {'v': payload['geometry_version']}
+        ).json()
+        return sorted(zip(
+            geometry['ids'], geometry['codes'], geometry['x'], geometry['y'],
+            (self.STATUS_NAMES[code] for code in statuses)
+        ))
+
+    def test_columnar_round_trips_to_json_spots(self):
+        payload = self.client.get(self.url, {'format': 'columnar'}).json()
+
+        self.assertEqual(payload['id'], self.floor.id)
+        self.assertEqual(self.decode(payload, b64decode(payload['statuses'])), self.json_spots())
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_round_trips_to_json_spots(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/x-msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/x-msgpack')
+        payload = msgpack.unpackb(response.content, raw=False)
+        self.assertIsInstance(payload['statuses'], bytes)
+        self.assertEqual(self.decode(payload, payload['statuses']), self.json_spots())
+
+    def test_without_msgpack_accept_is_refused_or_falls_back(self):
+        # The renderers the map action gets when msgpack is not installed
+        view = MobileFloorViewSet.as_view(
+            {'get': 'map'},
+            renderer_classes=list(api_settings.DEFAULT_RENDERER_CLASSES) + [ColumnarJSONRenderer]
+        )
+        factory = APIRequestFactory()
+
+        refused = view(factory.get(self.url, HTTP_ACCEPT='application/x-msgpack'), pk=self.floor.id)
+        self.assertEqual(refused.status_code, 406)
+
+        fallback = view(
+            factory.get(self.url, HTTP_ACCEPT='application/x-msgpack, application/json;q=0.5'),
+            pk=self.floor.id
+        )
+        fallback.render()
+        self.assertEqual(fallback.status_code, 200)
+        self.assertEqual(fallback['Content-Type'], 'application/json')
+        self.assertIn('spots', fallback.data)
+
+
+class SpilloverBookingTests(TestCase):
+    """A full facility spills bookings over to the nearest one with capacity."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(geo, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('driver', password='x')
+        self.primary = self.create_facility('Primary', 18.5, 'occupied')
+        self.full = self.create_facility('Full', 18.501, 'occupied')
+        self.p2p = self.create_facility('Driveway', 18.502, 'available', onboarding_type='p2p')
+        self.near = self.create_facility('Near', 18.505, 'available')
+        self.far = self.create_facility('Far', 18.52, 'available')
+
+    def create_facility(self, name, lat, spot_status, onboarding_type='enterprise'):
+        with self.captureOnCommitCallbacks(execute=True):
+            facility = Facility.objects.create(
+                name=name, type='mall', address='Pune', onboarding_type=onboarding_type,
+                latitute=lat, longitude=73.8
+            )
+            floor = Floor.objects.create(facility=facility, label='L0')
+            for j in range(2):
+                ParkingSpot.objects.create(floor=floor, code=f'S-{j:03d}', x=j, y=0, status=spot_status)
+        return facility
+
+    def book(self, **kwargs):
+        return services.create_booking_with_spillover(self.user, self.primary.id, 2, **kwargs)
+
+    def test_full_facility_spills_over_to_the_closest_with_capacity(self):
+        booking, distance = self.book()
+
+        self.assertEqual(booking.spot.floor.facility_id, self.near.id)
+        self.assertAlmostEqual(distance, 556, delta=5)
+
+    def test_lookup_is_chunked_in_distance_order(self):
+        with mock.patch.object(services, 'SPILLOVER_LOOKUP_CHUNK', 1):
+            booking, _ = self.book(max_candidates=1)
+
+        self.assertEqual(booking.spot.floor.facility_id, self.near.id)
+
+    def test_no_capacity_within_radius(self):
+        with self.assertRaises(orbit_services.NoAvailableSpots):
+            self.book(radius_m=400)
+        self.assertFalse(Booking.objects.exists())
+
+
+class RecommendationTests(TestCase):
+    """recommend_facilities ranks nearby facilities and suggests a spot each."""
+
+    # Spot counts, facilities, slot bitmaps, overlap check, best spots
+    QUERY_BUDGET = 5
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(geo, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('driver', password='x')
+        self.facilities = [
+            self.create_facility(f'Lot {i}', 18.5 + 0.01 * i) for i in range(4)
+        ]
+        self.create_facility('Full', 18.5005, spot_status='occupied')
+        # Take the closest spot of the nearest facility for the next two hours
+        orbit_services.create_booking(self.user, self.facilities[0].id, 2)
+
+    def create_facility(self, name, lat, spot_status='available'):
+        with self.captureOnCommitCallbacks(execute=True):
+            facility = Facility.objects.create(
+                name=name, type='mall', address='Pune', onboarding_type='enterprise',
+                latitute=lat, longitude=73.8
+            )
+            floor = Floor.objects.create(facility=facility, label='L0')
+            for j in range(4):
+                ParkingSpot.objects.create(
+                    floor=floor, code=f'S-{j:03d}', x=j, y=0, distance_from_entry=j,
+                    status=spot_status
+                )
+        return facility
+
+    def recommend(self, limit):
+        return services.recommend_facilities(18.5, 73.8, 5000, limit=limit)
+
+    def test_ranking_and_suggested_spots(self):
+        recommendations = self.recommend(limit=3)
+
+        self.assertEqual(
+            [item['facility'].id for item in recommendations],
+            [facility.id for facility in self.facilities[:3]]
+        )
+        scores = [item['score'] for item in recommendations]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # The booked spot is skipped at the nearest facility
+        self.assertEqual(
+            [item['spot'].code for item in recommendations], ['S-001', 'S-000', 'S-000']
+        )
+        for item in recommendations:
+            self.assertEqual(
+                item['spot'],
+                orbit_services.find_best_available_spot(
+                    item['facility'].id, timezone.now(), timezone.now() + timedelta(hours=1)
+                )
+            )
+
+    def test_query_count_does_not_grow_with_limit(self):
+        geo.get_geo_index()
+        for limit in (1, 4):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(self.QUERY_BUDGET):
+                    self.assertEqual(len(self.recommend(limit)), limit)
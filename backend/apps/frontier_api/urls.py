@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, streams
 
 router = DefaultRouter()
 router.register(r'facilities', views.MobileFacilityViewSet, basename='mobile-facility')
@@ -8,6 +8,8 @@ router.register(r'floors', views.MobileFloorViewSet, basename='mobile-floor')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('floors/<int:floor_id>/stream/', streams.floor_stream, name='mobile-floor-stream'),
+    path('facilities/<int:facility_id>/stream/', streams.facility_stream, name='mobile-facility-stream'),
     path('bookings/', views.create_mobile_booking, name='mobile-create-booking'),
     path('bookings/me/', views.my_mobile_bookings, name='mobile-my-bookings'),
     path('access/validate/', views.validate_mobile_access, name='mobile-validate-access'),
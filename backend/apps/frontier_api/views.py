@@ -1,13 +1,28 @@
+from base64 import b64encode
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from apps.atlas.models import Facility, Floor
+from apps.atlas import services as atlas_services
 from apps.orbit import services as orbit_services
 from apps.lockbox import services as lockbox_services
+from common.conditional import conditional_get
+from common.response_cache import (
+    FACILITY_LIST_SCOPE, cached_response, facility_scope, floor_scope
+)
+from . import services
+from common.renderers import COMPACT_RENDERER_CLASSES, COLUMNAR_FORMATS
 from .serializers import (
     MobileFacilityListSerializer,
     MobileFacilityDetailSerializer,
+    MobileNearbyFacilitySerializer,
+    MobileRecommendationSerializer,
+    NearbyQuerySerializer,
+    RecommendQuerySerializer,
     MobileFloorMapSerializer,
     MobileBookingSerializer,
     AccessValidationSerializer
@@ -20,12 +35,15 @@ class MobileFacilityViewSet(viewsets.ReadOnlyModelViewSet):
     
     GET /api/mobile/facilities/ - List all facilities
     GET /api/mobile/facilities/{id}/ - Get facility details
+    GET /api/mobile/facilities/{id}/availability/?date= - Free capacity per time slot
+    GET /api/mobile/facilities/nearby/?lat=&lon=&radius=&limit= - Nearest facilities
+    GET /api/mobile/facilities/recommend/?lat=&lon=&radius=&limit=&w_*= - Best facilities to book
     
     Query params:
     - type: Filter by onboarding type (p2p, small, enterprise)
     - facility_type: Filter by facility type (mall, lot, office)
     """
-    queryset = Facility.objects.all()
+    queryset = Facility.objects.select_related('owner').with_spot_counts()
     permission_classes = [AllowAny]
     
     def get_serializer_class(self):
@@ -46,7 +64,91 @@ class MobileFacilityViewSet(viewsets.ReadOnlyModelViewSet):
         if facility_type:
             queryset = queryset.filter(type=facility_type)
         
+        if self.action == 'retrieve':
+            # Floor counts come from the floor counters, one query for all floors
+            queryset = queryset.prefetch_related('floors')
+        
         return queryset
+    
+    @cached_response(lambda view, request: [FACILITY_LIST_SCOPE])
+    @conditional_get(lambda view, request: atlas_services.facility_list_validators())
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cached_response(lambda view, request, pk=None: (
+        [facility_scope(pk)] if str(pk).isdigit() else None
+    ))
+    @conditional_get(lambda view, request, pk=None: (
+        atlas_services.facility_validators(pk, include_floors=True) if str(pk).isdigit() else None
+    ))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Facilities within radius meters of (lat, lon), nearest first."""
+        query = NearbyQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        params = query.validated_data
+        facilities = atlas_services.find_nearby_facilities(
+            params['lat'], params['lon'], params['radius'], params['limit']
+        )
+        serializer = MobileNearbyFacilitySerializer(facilities, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def recommend(self, request):
+        """
+        Facilities near (lat, lon) ranked by a weighted score of distance,
+        availability, price and confidence, each with the spot a booking
+        would get. Weights can be overridden with w_distance,
+        w_availability, w_price and w_confidence.
+        """
+        query = RecommendQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        params = query.validated_data
+        try:
+            recommendations = services.recommend_facilities(
+                params['lat'], params['lon'], params['radius'],
+                limit=params['limit'],
+                duration_hours=params['duration_hours'],
+                weights=query.get_weights()
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = MobileRecommendationSerializer(recommendations, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """Get free capacity per 15-minute slot for a day (UTC)."""
+        date_param = request.query_params.get('date')
+        try:
+            day = parse_date(date_param) if date_param else timezone.now().date()
+        except ValueError:
+            day = None  # Well formed but not a real date, e.g. 2024-13-45
+        if day is None:
+            return Response(
+                {'error': 'date must be in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not str(pk).isdigit() or not Facility.objects.filter(pk=pk).exists():
+            return Response(
+                {'error': 'Facility not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        timeline = orbit_services.get_availability_timeline(int(pk), day)
+        return Response(timeline)
 
 
 class MobileFloorViewSet(viewsets.ReadOnlyModelViewSet):
@@ -54,17 +156,108 @@ class MobileFloorViewSet(viewsets.ReadOnlyModelViewSet):
     Mobile API for floor maps.
     
     GET /api/mobile/floors/{id}/map/ - Get floor map with spots
+    GET /api/mobile/floors/{id}/map/?since=<version> - Only spots changed since version
+    GET /api/mobile/floors/{id}/map/?format=columnar - Packed statuses; geometry fetched separately
+    GET /api/mobile/floors/{id}/geometry/?v=<geometry_version> - Spot geometry, cacheable forever
+    
+    Columnar responses are also available as MessagePack (Accept: application/x-msgpack).
     """
     queryset = Floor.objects.select_related('facility').prefetch_related('spots').all()
     serializer_class = MobileFloorMapSerializer
     permission_classes = [AllowAny]
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], renderer_classes=COMPACT_RENDERER_CLASSES)
+    @cached_response(lambda view, request, pk=None: (
+        [floor_scope(pk)] if str(pk).isdigit() else None
+    ))
+    @conditional_get(lambda view, request, pk=None: (
+        atlas_services.floor_map_validators(pk) if str(pk).isdigit() else None
+    ))
     def map(self, request, pk=None):
-        """Get floor map with spot overlay data."""
-        floor = self.get_object()
-        serializer = self.get_serializer(floor)
-        return Response(serializer.data)
+        """
+        Get floor map with spot overlay data.
+        With ?since=<version>, return only the spots whose status changed
+        after that version; falls back to the full map (full=true) when the
+        floor's geometry changed or the version is unknown.
+        """
+        columnar = request.accepted_renderer.format in COLUMNAR_FORMATS
+        since = request.query_params.get('since')
+        if since is not None:
+            if not since.isdigit():
+                return Response(
+                    {'error': 'since must be a non-negative integer version'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            floor = get_object_or_404(
+                Floor.objects.only('id', 'map_version', 'geometry_version'), pk=pk
+            )
+            changes = atlas_services.get_spot_changes_since(floor, int(since))
+            if changes is not None:
+                data = {'id': floor.id, 'version': floor.map_version, 'full': False}
+                if columnar:
+                    data['ids'] = [spot['id'] for spot in changes]
+                    data['statuses'] = self._packed(request, atlas_services.pack_spot_statuses(
+                        spot['status'] for spot in changes
+                    ))
+                else:
+                    data['spots'] = changes
+                return Response(data)
+        
+        if columnar:
+            data = self._columnar_map(request, pk)
+        else:
+            floor = self.get_object()
+            serializer = self.get_serializer(floor)
+            data = serializer.data
+        if since is not None:
+            data['full'] = True
+        return Response(data)
+    
+    @action(detail=True, methods=['get'], renderer_classes=COMPACT_RENDERER_CLASSES)
+    def geometry(self, request, pk=None):
+        """
+        Spot geometry as parallel arrays (ids, codes, x, y), in the order of
+        the columnar map's packed statuses. Immutable for a given ?v=.
+        """
+        floor = get_object_or_404(Floor.objects.only('id', 'geometry_version'), pk=pk)
+        response = Response(atlas_services.get_floor_geometry(floor))
+        if request.query_params.get('v') == str(floor.geometry_version):
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'no-cache'
+        return response
+    
+    def _columnar_map(self, request, pk):
+        floor = get_object_or_404(
+            Floor.objects.select_related('facility').only(
+                'id', 'label', 'floorplan_image', 'map_version', 'geometry_version',
+                'facility__name'
+            ),
+            pk=pk
+        )
+        statuses = atlas_services.get_floor_statuses(floor.id)
+        return {
+            'id': floor.id,
+            'label': floor.label,
+            'facility_name': floor.facility.name,
+            'floorplan_image': (
+                request.build_absolute_uri(floor.floorplan_image.url)
+                if floor.floorplan_image else None
+            ),
+            'version': floor.map_version,
+            'geometry_version': floor.geometry_version,
+            'geometry_url': request.build_absolute_uri(
+                f'/api/mobile/floors/{floor.id}/geometry/?v={floor.geometry_version}'
+            ),
+            'statuses': self._packed(request, statuses),
+        }
+    
+    def _packed(self, request, packed):
+        """Raw bytes for MessagePack, base64 text for JSON."""
+        if request.accepted_renderer.format == 'msgpack':
+            return packed
+        return b64encode(packed).decode()
 
 
 @api_view(['POST'])
@@ -76,7 +269,9 @@ def create_mobile_booking(request):
     POST /api/mobile/bookings/
     Body: {
         "facility_id": 1,
-        "duration_hours": 2.0
+        "duration_hours": 2.0,
+        "spillover": false,          // optional: book the nearest facility
+        "spillover_radius": 3000     // with capacity if this one is full
     }
     """
     facility_id = request.data.get('facility_id')
@@ -110,15 +305,43 @@ def create_mobile_booking(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    spillover = request.data.get('spillover') in (True, 'true', '1', 1)
+    if spillover:
+        spillover_radius = request.data.get('spillover_radius', services.DEFAULT_SPILLOVER_RADIUS_M)
+        try:
+            spillover_radius = float(spillover_radius)
+        except (TypeError, ValueError):
+            spillover_radius = None
+        if spillover_radius is None or not 0 < spillover_radius <= services.MAX_SPILLOVER_RADIUS_M:
+            return Response(
+                {'error': f'spillover_radius must be between 0 and {services.MAX_SPILLOVER_RADIUS_M} meters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
     try:
-        booking = orbit_services.create_booking(
-            user=request.user,
-            facility_id=facility_id,
-            duration_hours=duration_hours
-        )
+        if spillover:
+            booking, distance_m = services.create_booking_with_spillover(
+                user=request.user,
+                facility_id=facility_id,
+                duration_hours=duration_hours,
+                radius_m=spillover_radius
+            )
+        else:
+            booking = orbit_services.create_booking(
+                user=request.user,
+                facility_id=facility_id,
+                duration_hours=duration_hours
+            )
         
         serializer = MobileBookingSerializer(booking)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        data = serializer.data
+        if spillover:
+            data['spillover'] = None if distance_m is None else {
+                'requested_facility_id': facility_id,
+                'facility_id': booking.spot.floor.facility_id,
+                'distance_m': round(distance_m, 1),
+            }
+        return Response(data, status=status.HTTP_201_CREATED)
         
     except ValueError as e:
         return Response(
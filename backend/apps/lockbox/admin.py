@@ -1,3 +1,12 @@
 from django.contrib import admin
+from .models import BarrierEntry
 
-# Register your models here.
+
+@admin.register(BarrierEntry)
+class BarrierEntryAdmin(admin.ModelAdmin):
+    """Admin interface for uploaded barrier entry logs."""
+    list_display = ['device', 'booking', 'scanned_at', 'granted', 'created_at']
+    list_filter = ['granted', 'device__bound_facility']
+    search_fields = ['device__device_code']
+    readonly_fields = ['created_at', 'updated_at']
+    date_hierarchy = 'scanned_at'
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('atlas', '0009_spot_counters'),
+        ('orbit', '0005_access_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarrierEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('scanned_at', models.DateTimeField()),
+                ('granted', models.BooleanField(default=False)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='barrier_entries', to='orbit.booking')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='atlas.device')),
+            ],
+            options={
+                'verbose_name_plural': 'Barrier entries',
+                'ordering': ['-scanned_at'],
+                'indexes': [models.Index(fields=['device', 'scanned_at'], name='lockbox_bar_device__044e37_idx')],
+            },
+        ),
+    ]
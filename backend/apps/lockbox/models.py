@@ -1,3 +1,36 @@
 from django.db import models
+from common.models import TimeStampedModel
+from apps.atlas.models import Device
+from apps.orbit.models import Booking
 
-# Create your models here.
+
+class BarrierEntry(TimeStampedModel):
+    """
+    Scan recorded by a barrier validating offline against its manifest,
+    uploaded in batches.
+    """
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='entries'
+    )
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='barrier_entries'
+    )
+    scanned_at = models.DateTimeField()
+    granted = models.BooleanField(default=False)
+    
+    class Meta:
+        ordering = ['-scanned_at']
+        verbose_name_plural = "Barrier entries"
+        indexes = [
+            models.Index(fields=['device', 'scanned_at']),
+        ]
+    
+    def __str__(self):
+        result = "granted" if self.granted else "denied"
+        return f"{self.device.device_code} @ {self.scanned_at:%Y-%m-%d %H:%M} ({result})"
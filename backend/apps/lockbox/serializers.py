@@ -0,0 +1,22 @@
+from rest_framework import serializers
+from .services import MAX_ENTRY_BATCH
+
+
+class BarrierEntrySerializer(serializers.Serializer):
+    """Single scan in a barrier entry log upload."""
+    booking_id = serializers.IntegerField(required=False, allow_null=True)
+    scanned_at = serializers.DateTimeField()
+    granted = serializers.BooleanField(default=False)
+
+
+class BarrierEntryBatchSerializer(serializers.Serializer):
+    """Batch of scans uploaded by a barrier validating offline."""
+    device_code = serializers.CharField()
+    entries = BarrierEntrySerializer(many=True)
+    
+    def validate_entries(self, value):
+        if len(value) > MAX_ENTRY_BATCH:
+            raise serializers.ValidationError(
+                f"At most {MAX_ENTRY_BATCH} entries per upload"
+            )
+        return value
@@ -1,10 +1,39 @@
 """
 Access verification and validation services for LOCKBOX app.
 """
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db.models import Q
 from django.utils import timezone
-from django.db import models
 from apps.orbit.models import Booking
 from common.utils import generate_qr_code
+from . import tokens
+
+
+# Cache lifetimes for the in-memory barrier validation path (seconds)
+BARRIER_DEVICE_CACHE_TIMEOUT = 300
+REVOCATION_CACHE_TIMEOUT = 60
+SPOTS_AVAILABLE_CACHE_TIMEOUT = 5
+
+REVOKED_CACHE_KEY = 'lockbox:revoked-bookings'
+
+# Bookings whose signed tokens must not open a barrier
+REVOKED_STATUSES = ['pending_approval', 'cancelled', 'rejected']
+
+# Barrier manifests
+MANIFEST_DEFAULT_HOURS = 6
+MANIFEST_MAX_HOURS = 48
+MANIFEST_FIELDS = ['booking_id', 'start', 'end', 'token_digest']
+# Delta syncs re-send changes this far behind the client's version, so a
+# transaction committing with an older updated_at is never missed
+MANIFEST_VERSION_OVERLAP = timedelta(seconds=5)
+# Deltas older than this get a full manifest instead; backstop for
+# deletions the reset marker below missed (e.g. evicted from the cache)
+MANIFEST_FULL_SYNC_AGE = timedelta(hours=1)
+# Version of the last booking deletion; deltas from before it are answered
+# with a full manifest, since deleted bookings cannot be listed in `removed`
+MANIFEST_RESET_CACHE_KEY = 'lockbox:manifest-reset'
+MAX_ENTRY_BATCH = 1000
 
 
 def validate_access_code(code):
@@ -47,9 +76,29 @@ def validate_access_code(code):
         }
 
 
+def get_booking_token(booking):
+    """
+    Signed QR token for a booking. Deterministic for a given booking window,
+    so it doubles as the key for cached QR renders.
+    
+    Args:
+        booking: Booking instance with spot__floor loaded
+        
+    Returns:
+        Token string
+    """
+    return tokens.sign_booking_token(
+        booking.id,
+        booking.spot.floor.facility_id,
+        booking.start_time,
+        booking.end_time
+    )
+
+
 def get_access_payload(booking):
     """
     Generate QR code payload for a booking.
+    The payload is a signed token the barrier can verify offline.
     
     Args:
         booking: Booking instance
@@ -57,7 +106,7 @@ def get_access_payload(booking):
     Returns:
         Dictionary with QR code data
     """
-    payload_data = f"PARKHERO-{booking.access_code}-{booking.id}"
+    payload_data = get_booking_token(booking)
     qr_code_base64 = generate_qr_code(payload_data)
     
     return {
@@ -68,7 +117,118 @@ def get_access_payload(booking):
     }
 
 
+def get_barrier_facility(device_code):
+    """
+    Facility bound to a barrier device, cached per device code.
+    
+    Args:
+        device_code: Barrier device code
+        
+    Returns:
+        (facility_id, facility_name) tuple, or None for unknown devices
+    """
+    from apps.atlas.models import Device
+    
+    key = f'lockbox:barrier:{device_code}'
+    cached = cache.get(key)
+    if cached is not None:
+        return cached or None
+    
+    barrier = Device.objects.filter(
+        device_code=device_code,
+        device_type='barrier',
+        bound_facility__isnull=False
+    ).values_list('bound_facility_id', 'bound_facility__name').first()
+    
+    # Cache misses too, as an empty tuple
+    cache.set(key, barrier or (), BARRIER_DEVICE_CACHE_TIMEOUT)
+    return barrier
+
+
+def get_revoked_booking_ids():
+    """
+    IDs of unexpired bookings whose tokens must be refused
+    (pending approval, cancelled or rejected). Cached; invalidated by
+    lockbox.signals whenever a booking changes status.
+    
+    Returns:
+        frozenset of booking IDs
+    """
+    revoked = cache.get(REVOKED_CACHE_KEY)
+    if revoked is None:
+        revoked = frozenset(Booking.objects.filter(
+            status__in=REVOKED_STATUSES,
+            end_time__gt=timezone.now()
+        ).values_list('id', flat=True))
+        cache.set(REVOKED_CACHE_KEY, revoked, REVOCATION_CACHE_TIMEOUT)
+    return revoked
+
+
+def invalidate_revoked_bookings():
+    """Drop the cached revocation set."""
+    cache.delete(REVOKED_CACHE_KEY)
+
+
+def _spots_available(facility_id):
+    """Facility availability counter, briefly cached for gate bursts."""
+    from apps.atlas.models import Facility
+    
+    return cache.get_or_set(
+        f'lockbox:spots-available:{facility_id}',
+        lambda: Facility.objects.filter(id=facility_id).values_list(
+            'available_count', flat=True
+        ).first(),
+        SPOTS_AVAILABLE_CACHE_TIMEOUT
+    )
+
 
+def validate_barrier_token(token, device_code):
+    """
+    Validate a signed QR token at a barrier without a booking lookup.
+    Only the cached revocation set (and cached device binding) is read.
+    
+    Args:
+        token: Signed token string scanned from the QR code
+        device_code: ID of the barrier device
+        
+    Returns:
+        Dict with validation result and action
+    """
+    barrier = get_barrier_facility(device_code)
+    if barrier is None:
+        return {'valid': False, 'error': 'Invalid barrier device'}
+    facility_id, facility_name = barrier
+    
+    try:
+        claims = tokens.verify_token(token)
+    except tokens.InvalidToken as e:
+        return {'valid': False, 'error': str(e)}
+    
+    if claims['facility_id'] != facility_id:
+        return {
+            'valid': False,
+            'error': 'Ticket not valid for this facility'
+        }
+    
+    now = timezone.now()
+    if not (claims['start_time'] <= now <= claims['end_time']):
+        return {
+            'valid': False,
+            'error': 'Booking not active (Check time)'
+        }
+    
+    if claims['booking_id'] in get_revoked_booking_ids():
+        return {'valid': False, 'error': 'Booking is not confirmed or was cancelled'}
+    
+    duration = claims['end_time'] - claims['start_time']
+    return {
+        'valid': True,
+        'action': 'open_barrier',
+        'booking_id': claims['booking_id'],
+        'facility': facility_name,
+        'duration': f"{duration.total_seconds() / 3600:.1f} hours",
+        'spots_available': _spots_available(facility_id)
+    }
 
 
 def validate_barrier_access(qr_payload, device_code):
@@ -76,7 +236,8 @@ def validate_barrier_access(qr_payload, device_code):
     Validate access at a barrier (QR scan).
     
     Args:
-        qr_payload: QR string scanned (format: PARKHERO:CODE:ID)
+        qr_payload: QR string scanned (signed token, or legacy
+            PARKHERO-CODE-ID format)
         device_code: ID of the barrier device
         
     Returns:
@@ -84,6 +245,9 @@ def validate_barrier_access(qr_payload, device_code):
     """
     from apps.atlas.models import Device
     
+    if tokens.is_token(qr_payload):
+        return validate_barrier_token(qr_payload, device_code)
+    
     # 1. Validate Barrier Device
     try:
         barrier = Device.objects.select_related('bound_facility').get(
@@ -133,10 +297,154 @@ def validate_barrier_access(qr_payload, device_code):
             'booking_id': booking.id,
             'facility': booking_facility.name,
             'duration': f"{(booking.end_time - booking.start_time).total_seconds() / 3600:.1f} hours",
-            'spots_available': booking_facility.floors.aggregate(
-                avail=models.Count('spots', filter=models.Q(spots__status='available'))
-            )['avail']
+            'spots_available': booking_facility.available_count
         }
         
     except Booking.DoesNotExist:
         return {'valid': False, 'error': 'Booking not found'}
+
+
+def _to_version(moment):
+    """Manifest version: generation time in epoch microseconds."""
+    return int(moment.timestamp() * 1_000_000)
+
+
+def _from_version(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=dt_timezone.utc)
+
+
+def mark_manifest_reset():
+    """Make every earlier manifest version resync in full."""
+    cache.set(
+        MANIFEST_RESET_CACHE_KEY,
+        _to_version(timezone.now()),
+        MANIFEST_FULL_SYNC_AGE.total_seconds()
+    )
+
+
+def get_barrier_manifest(device_code, hours=MANIFEST_DEFAULT_HOURS, since=None):
+    """
+    Compact, versioned list of bookings a barrier may admit over the
+    next `hours`, for offline validation.
+    
+    Entries are [booking_id, start, end, token_digest] (epoch seconds);
+    the barrier matches the digest of a scanned token against them.
+    With `since`, only changes after that version are returned: bookings
+    updated since then, plus bookings whose start entered the look-ahead
+    window since then (assuming the same `hours`), as upserts when still
+    valid and under `removed` otherwise. Versions older than
+    MANIFEST_FULL_SYNC_AGE or than the last booking deletion get a full
+    manifest (full=true) instead.
+    
+    Args:
+        device_code: Barrier device code
+        hours: Look-ahead window in hours
+        since: Optional manifest version from a previous sync
+        
+    Returns:
+        Manifest dictionary, or None for unknown devices
+    """
+    barrier = get_barrier_facility(device_code)
+    if barrier is None:
+        return None
+    facility_id, facility_name = barrier
+    
+    # Taken before querying: anything committed later is re-sent next time
+    now = timezone.now()
+    version = _to_version(now)
+    valid_until = now + timedelta(hours=hours)
+    bookings = Booking.objects.filter(spot__floor__facility_id=facility_id)
+    
+    if since is not None:
+        reset = cache.get(MANIFEST_RESET_CACHE_KEY, 0)
+        if since <= reset or _from_version(since) < now - MANIFEST_FULL_SYNC_AGE:
+            since = None
+    
+    if since is None:
+        bookings = bookings.filter(
+            status__in=['reserved', 'active'],
+            start_time__lt=valid_until,
+            end_time__gt=now
+        )
+    else:
+        synced_at = _from_version(since) - MANIFEST_VERSION_OVERLAP
+        bookings = bookings.filter(
+            Q(updated_at__gt=synced_at) |
+            # Unchanged bookings that were beyond the previous window's end
+            Q(
+                status__in=['reserved', 'active'],
+                start_time__gte=synced_at + timedelta(hours=hours),
+                start_time__lt=valid_until
+            )
+        )
+    
+    entries, removed = [], []
+    rows = bookings.values_list('id', 'status', 'start_time', 'end_time')
+    for booking_id, booking_status, start_time, end_time in rows:
+        admissible = (
+            booking_status in ['reserved', 'active'] and
+            start_time < valid_until and
+            end_time > now
+        )
+        if admissible:
+            token = tokens.sign_booking_token(booking_id, facility_id, start_time, end_time)
+            entries.append([
+                booking_id,
+                int(start_time.timestamp()),
+                int(end_time.timestamp()),
+                tokens.token_digest(token)
+            ])
+        else:
+            removed.append(booking_id)
+    
+    return {
+        'facility_id': facility_id,
+        'facility': facility_name,
+        'version': version,
+        'full': since is None,
+        'generated_at': now,
+        'valid_until': valid_until,
+        'fields': MANIFEST_FIELDS,
+        'bookings': entries,
+        'removed': removed,
+    }
+
+
+def record_barrier_entries(device_code, entries):
+    """
+    Store a batch of scans uploaded by a barrier.
+    
+    Args:
+        device_code: Barrier device code
+        entries: List of dicts with booking_id, scanned_at and granted
+        
+    Returns:
+        Number of entries stored, or None for unknown devices
+    """
+    from apps.atlas.models import Device
+    from .models import BarrierEntry
+    
+    device = Device.objects.filter(
+        device_code=device_code, device_type='barrier'
+    ).only('id').first()
+    if device is None:
+        return None
+    
+    booking_ids = {entry.get('booking_id') for entry in entries} - {None}
+    known_ids = set(
+        Booking.objects.filter(id__in=booking_ids).values_list('id', flat=True)
+    )
+    
+    created = BarrierEntry.objects.bulk_create(
+        [
+            BarrierEntry(
+                device=device,
+                booking_id=entry.get('booking_id') if entry.get('booking_id') in known_ids else None,
+                scanned_at=entry['scanned_at'],
+                granted=entry.get('granted', False)
+            )
+            for entry in entries
+        ],
+        batch_size=500
+    )
+    return len(created)
@@ -0,0 +1,36 @@
+"""
+Signal handlers for LOCKBOX app.
+Keep the cached barrier state (revocations, device bindings, manifest
+resets) fresh.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
+from apps.atlas.models import Device
+from apps.orbit.models import Booking
+from . import services
+
+
+@receiver(post_save, sender=Booking)
+def refresh_revocations_on_booking_save(sender, instance, created, **kwargs):
+    """Any status change may add or remove a booking from the revoked set."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if created and instance.status not in services.REVOKED_STATUSES:
+        return
+    transaction.on_commit(services.invalidate_revoked_bookings)
+
+
+@receiver(post_delete, sender=Booking)
+def reset_manifests_on_booking_delete(sender, instance, **kwargs):
+    """Deleted bookings cannot appear in delta manifests; force full syncs."""
+    transaction.on_commit(services.mark_manifest_reset)
+
+
+@receiver([post_save, post_delete], sender=Device)
+def refresh_barrier_binding(sender, instance, **kwargs):
+    """Drop the cached facility binding of a changed barrier."""
+    key = f'lockbox:barrier:{instance.device_code}'
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,3 +1,218 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.atlas.models import Device, Facility, Floor, ParkingSpot
+from apps.orbit.models import Booking
+from apps.lockbox.models import BarrierEntry
+from apps.lockbox import services, tokens
 
-# Create your tests here.
+DEVICE_KEY = 'barrier-secret'
+
+
+@override_settings(DEVICE_INGEST_KEY=DEVICE_KEY)
+class BarrierManifestTests(TestCase):
+    """Offline barrier sync: device auth, full manifests and deltas."""
+
+    MANIFEST_URL = '/api/lockbox/barrier/manifest/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('driver', password='x')
+        self.facility = Facility.objects.create(
+            name='Gate Mall', type='mall', address='Pune', onboarding_type='enterprise'
+        )
+        floor = Floor.objects.create(facility=self.facility, label='L0')
+        self.spot = ParkingSpot.objects.create(floor=floor, code='S-001', x=0, y=0)
+        Device.objects.create(
+            device_code='GATE-1', device_type='barrier', bound_facility=self.facility
+        )
+        self.now = timezone.now()
+        self.current = self.book(self.now - timedelta(hours=1), self.now + timedelta(hours=1))
+        self.later = self.book(self.now + timedelta(hours=2), self.now + timedelta(hours=3))
+
+    def book(self, start, end, booking_status='reserved'):
+        return Booking.objects.create(
+            user=self.user, spot=self.spot, start_time=start, end_time=end,
+            status=booking_status, access_code=f'C{Booking.objects.count():07d}'
+        )
+
+    def get_manifest(self, **params):
+        return self.client.get(
+            self.MANIFEST_URL, {'device_code': 'GATE-1', **params}, HTTP_X_DEVICE_KEY=DEVICE_KEY
+        )
+
+    def backdate_bookings(self, minutes=30):
+        Booking.objects.update(updated_at=self.now - timedelta(minutes=minutes))
+
+    def booking_ids(self, manifest):
+        return sorted(entry[0] for entry in manifest['bookings'])
+
+    def test_requires_device_key(self):
+        for headers in ({}, {'HTTP_X_DEVICE_KEY': 'wrong'}):
+            with self.subTest(headers=headers):
+                manifest = self.client.get(self.MANIFEST_URL, {'device_code': 'GATE-1'}, **headers)
+                self.assertIn(manifest.status_code, (401, 403))
+                upload = self.client.post(
+                    '/api/lockbox/barrier/entries/',
+                    {'device_code': 'GATE-1', 'entries': []},
+                    content_type='application/json', **headers
+                )
+                self.assertIn(upload.status_code, (401, 403))
+        self.assertFalse(BarrierEntry.objects.exists())
+
+    @override_settings(DEVICE_INGEST_KEY='')
+    def test_unconfigured_key_denies_devices(self):
+        response = self.client.get(self.MANIFEST_URL, {'device_code': 'GATE-1'})
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_full_manifest_lists_admissible_bookings(self):
+        self.book(self.now - timedelta(hours=1), self.now + timedelta(hours=1), 'cancelled')
+        self.book(self.now + timedelta(hours=10), self.now + timedelta(hours=11))
+
+        response = self.get_manifest(hours=6)
+
+        self.assertEqual(response.status_code, 200)
+        manifest = response.json()
+        self.assertTrue(manifest['full'])
+        self.assertEqual(manifest['facility_id'], self.facility.id)
+        self.assertEqual(self.booking_ids(manifest), [self.current.id, self.later.id])
+        self.assertEqual(manifest['removed'], [])
+
+    def test_delta_returns_changes_since_version(self):
+        since = self.get_manifest(hours=6).json()['version']
+        self.backdate_bookings()
+        added = self.book(self.now + timedelta(hours=4), self.now + timedelta(hours=5))
+        self.later.status = 'cancelled'
+        self.later.save()
+
+        manifest = self.get_manifest(hours=6, since=since).json()
+
+        self.assertFalse(manifest['full'])
+        self.assertEqual(self.booking_ids(manifest), [added.id])
+        self.assertEqual(manifest['removed'], [self.later.id])
+
+    def test_delta_includes_bookings_entering_the_window(self):
+        entering = self.book(self.now + timedelta(minutes=30), self.now + timedelta(hours=2))
+        self.backdate_bookings(minutes=50)
+        # Synced 40 minutes ago with a one-hour window ending before `entering`
+        since = services._to_version(self.now - timedelta(minutes=40))
+
+        manifest = self.get_manifest(hours=1, since=since).json()
+
+        self.assertFalse(manifest['full'])
+        self.assertEqual(self.booking_ids(manifest), [entering.id])
+
+    def test_deleted_booking_forces_full_sync(self):
+        since = self.get_manifest(hours=6).json()['version']
+        self.backdate_bookings()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.later.delete()
+
+        manifest = self.get_manifest(hours=6, since=since).json()
+
+        self.assertTrue(manifest['full'])
+        self.assertEqual(self.booking_ids(manifest), [self.current.id])
+
+    def test_upload_entries(self):
+        response = self.client.post(
+            '/api/lockbox/barrier/entries/',
+            {
+                'device_code': 'GATE-1',
+                'entries': [{
+                    'booking_id': self.current.id,
+                    'scanned_at': self.now.isoformat(),
+                    'granted': True,
+                }],
+            },
+            content_type='application/json', HTTP_X_DEVICE_KEY=DEVICE_KEY
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(BarrierEntry.objects.count(), 1)
+
+
+class SignedTokenTests(TestCase):
+    """PH1 tokens are checked at the barrier without a booking lookup."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('driver', password='x')
+        self.facility = Facility.objects.create(
+            name='Token Mall', type='mall', address='Pune', onboarding_type='enterprise'
+        )
+        floor = Floor.objects.create(facility=self.facility, label='L0')
+        self.spot = ParkingSpot.objects.create(floor=floor, code='S-001', x=0, y=0)
+        Device.objects.create(
+            device_code='GATE-1', device_type='barrier', bound_facility=self.facility
+        )
+        self.now = timezone.now()
+        self.booking = self.book(self.now - timedelta(hours=1), self.now + timedelta(hours=1))
+
+    def book(self, start, end):
+        return Booking.objects.create(
+            user=self.user, spot=self.spot, start_time=start, end_time=end,
+            status='reserved', access_code=f'C{Booking.objects.count():07d}'
+        )
+
+    def token_for(self, booking, facility_id=None):
+        return tokens.sign_booking_token(
+            booking.id, facility_id or self.facility.id, booking.start_time, booking.end_time
+        )
+
+    def scan(self, token):
+        return services.validate_barrier_access(token, 'GATE-1')
+
+    def test_valid_token_needs_no_queries_on_a_warm_cache(self):
+        token = self.token_for(self.booking)
+        self.assertTrue(self.scan(token)['valid'])
+
+        with self.assertNumQueries(0):
+            result = self.scan(token)
+
+        self.assertTrue(result['valid'])
+        self.assertEqual(result['booking_id'], self.booking.id)
+
+    def test_tampered_token_is_refused(self):
+        token = self.token_for(self.booking)
+        prefix, payload, signature = token.split('.')
+        forged_payload = tokens.sign_booking_token(
+            self.booking.id, self.facility.id, self.now, self.now + timedelta(days=30)
+        ).split('.')[1]
+        flipped = ('A' if signature[0] != 'A' else 'B') + signature[1:]
+
+        for forged in (f'{prefix}.{payload}.{flipped}', f'{prefix}.{forged_payload}.{signature}'):
+            with self.subTest(token=forged):
+                self.assertEqual(
+                    self.scan(forged), {'valid': False, 'error': 'Invalid token signature'}
+                )
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_token(f'{prefix}.{payload}')
+
+    def test_token_for_another_facility_is_refused(self):
+        result = self.scan(self.token_for(self.booking, facility_id=self.facility.id + 1))
+        self.assertFalse(result['valid'])
+
+    def test_expired_window_is_refused(self):
+        expired = self.book(self.now - timedelta(hours=3), self.now - timedelta(hours=2))
+        upcoming = self.book(self.now + timedelta(hours=2), self.now + timedelta(hours=3))
+
+        for booking in (expired, upcoming):
+            with self.subTest(booking=booking.id):
+                result = self.scan(self.token_for(booking))
+                self.assertEqual(result['error'], 'Booking not active (Check time)')
+
+    def test_revoked_booking_is_refused_from_the_cache(self):
+        token = self.token_for(self.booking)
+        self.assertTrue(self.scan(token)['valid'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.status = 'cancelled'
+            self.booking.save()
+        self.assertFalse(self.scan(token)['valid'])
+
+        with self.assertNumQueries(0):
+            result = self.scan(token)
+        self.assertEqual(result, {'valid': False, 'error': 'Booking is not confirmed or was cancelled'})
+        self.assertIn(self.booking.id, cache.get(services.REVOKED_CACHE_KEY))
@@ -0,0 +1,129 @@
+"""
+Signed QR access tokens for LOCKBOX app.
+
+A token embeds booking id, facility id and the booking window, and is
+authenticated with a truncated HMAC-SHA256, so a barrier can check it
+in memory without looking the booking up:
+
+    PH1.<base64url(payload)>.<base64url(signature)>
+"""
+import base64
+import hashlib
+import hmac
+import struct
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+
+TOKEN_PREFIX = 'PH1'
+PAYLOAD_FORMAT = '>QQII'  # booking id, facility id, start, end (epoch seconds)
+SIGNATURE_BYTES = 16
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed or its signature does not match."""
+
+
+def _key():
+    secret = getattr(settings, 'LOCKBOX_TOKEN_KEY', None) or settings.SECRET_KEY
+    return hmac.new(secret.encode(), b'parkhero.lockbox.qr-token', hashlib.sha256).digest()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload):
+    return hmac.new(_key(), payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def is_token(value):
+    """Whether a scanned QR string uses the signed token format."""
+    return value.startswith(TOKEN_PREFIX + '.')
+
+
+def sign_booking_token(booking_id, facility_id, start_time, end_time):
+    """
+    Build a signed token for a booking. Deterministic for a given
+    booking window, so rendered QR images can be cached.
+    
+    Returns:
+        Token string
+    """
+    payload = struct.pack(
+        PAYLOAD_FORMAT,
+        booking_id,
+        facility_id,
+        int(start_time.timestamp()),
+        int(end_time.timestamp())
+    )
+    return f"{TOKEN_PREFIX}.{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def token_digest(token):
+    """
+    Short digest of a token, shipped in barrier manifests so a barrier
+    can recognise genuine tokens without holding the signing key.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def decode_token_claims(token):
+    """
+    Unpack a token's claims WITHOUT checking the signature.
+    Only for offline matching against a manifest digest.
+    
+    Raises:
+        InvalidToken: If the token is malformed
+    """
+    try:
+        prefix, payload_text, _ = token.split('.')
+        booking_id, facility_id, start, end = struct.unpack(
+            PAYLOAD_FORMAT, _b64decode(payload_text)
+        )
+    except (ValueError, TypeError, struct.error):
+        raise InvalidToken("Malformed token")
+    if prefix != TOKEN_PREFIX:
+        raise InvalidToken("Malformed token")
+    return {
+        'booking_id': booking_id,
+        'facility_id': facility_id,
+        'start_time': datetime.fromtimestamp(start, tz=dt_timezone.utc),
+        'end_time': datetime.fromtimestamp(end, tz=dt_timezone.utc),
+    }
+
+
+def verify_token(token):
+    """
+    Verify a token's signature and unpack its claims.
+    
+    Returns:
+        Dictionary with booking_id, facility_id, start_time, end_time
+        
+    Raises:
+        InvalidToken: If the token is malformed or tampered with
+    """
+    try:
+        prefix, payload_text, signature_text = token.split('.')
+        payload = _b64decode(payload_text)
+        signature = _b64decode(signature_text)
+    except (ValueError, TypeError):
+        raise InvalidToken("Malformed token")
+    
+    if prefix != TOKEN_PREFIX or not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidToken("Invalid token signature")
+    
+    try:
+        booking_id, facility_id, start, end = struct.unpack(PAYLOAD_FORMAT, payload)
+    except struct.error:
+        raise InvalidToken("Malformed token")
+    
+    return {
+        'booking_id': booking_id,
+        'facility_id': facility_id,
+        'start_time': datetime.fromtimestamp(start, tz=dt_timezone.utc),
+        'end_time': datetime.fromtimestamp(end, tz=dt_timezone.utc),
+    }
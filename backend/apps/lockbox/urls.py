@@ -4,5 +4,8 @@ from . import views
 urlpatterns = [
     path('validate/', views.validate_access, name='validate-access'),
     path('qr/<int:booking_id>/', views.get_qr_code, name='get-qr-code'),
+    path('qr/<int:booking_id>/image.<str:fmt>', views.get_qr_image, name='get-qr-image'),
     path('barrier/validate/', views.validate_barrier, name='validate-barrier'),
+    path('barrier/manifest/', views.barrier_manifest, name='barrier-manifest'),
+    path('barrier/entries/', views.upload_barrier_entries, name='barrier-entries'),
 ]
@@ -1,9 +1,16 @@
+import math
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from common import utils
+from common.permissions import IsDeviceOrAdmin
 from apps.orbit.models import Booking
+from .serializers import BarrierEntryBatchSerializer
 from . import services
 
 
@@ -39,7 +46,9 @@ def get_qr_code(request, booking_id):
     Get QR code for a specific booking.
     User must own the booking.
     """
-    booking = get_object_or_404(Booking, id=booking_id)
+    booking = get_object_or_404(
+        Booking.objects.select_related('spot__floor'), id=booking_id
+    )
     
     # Check if user owns the booking or is admin
     if booking.user != request.user and not request.user.is_staff:
@@ -52,6 +61,48 @@ def get_qr_code(request, booking_id):
     return Response(result)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_qr_image(request, booking_id, fmt):
+    """
+    Raw QR image (PNG or SVG) for a booking.
+    Rendered once per payload; the ETag lets clients revalidate without
+    downloading the image again.
+    """
+    if fmt not in utils.QR_CONTENT_TYPES:
+        return Response(
+            {'error': f"Unsupported format, use one of: {', '.join(utils.QR_CONTENT_TYPES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    booking = get_object_or_404(
+        Booking.objects.select_related('spot__floor'), id=booking_id
+    )
+    
+    if booking.user != request.user and not request.user.is_staff:
+        return Response(
+            {'error': 'Not authorized to view this booking'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    token = services.get_booking_token(booking)
+    etag = f'"{utils.QRImageCache.digest(token)[:32]}-{fmt}"'
+    
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        image, _ = utils.get_qr_image(token, fmt)
+        response = HttpResponse(image, content_type=utils.QR_CONTENT_TYPES[fmt])
+    
+    # The token only changes if the booking window does, so the image can be
+    # reused until the booking ends.
+    max_age = max(int((booking.end_time - timezone.now()).total_seconds()), 0)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def validate_barrier(request):
@@ -71,3 +122,67 @@ def validate_barrier(request):
     
     status_code = status.HTTP_200_OK if result.get('valid') else status.HTTP_400_BAD_REQUEST
     return Response(result, status=status_code)
+
+
+@api_view(['GET'])
+@permission_classes([IsDeviceOrAdmin])
+def barrier_manifest(request):
+    """
+    Manifest of bookings a barrier may admit offline.
+    Device endpoint - requires the X-Device-Key header.
+    
+    Query params:
+    - device_code: Barrier device code (required)
+    - hours: Look-ahead window (default 6, max 48)
+    - since: Previous manifest version for a delta update
+    """
+    device_code = request.query_params.get('device_code')
+    if not device_code:
+        return Response(
+            {'error': 'device_code is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        hours = float(request.query_params.get('hours', services.MANIFEST_DEFAULT_HOURS))
+        since = request.query_params.get('since')
+        since = int(since) if since else None
+    except ValueError:
+        hours = None
+    if hours is None or not math.isfinite(hours):
+        return Response(
+            {'error': 'hours and since must be numeric'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    hours = min(max(hours, 0), services.MANIFEST_MAX_HOURS)
+    
+    manifest = services.get_barrier_manifest(device_code, hours=hours, since=since)
+    if manifest is None:
+        return Response(
+            {'error': 'Invalid barrier device'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(manifest)
+
+
+@api_view(['POST'])
+@permission_classes([IsDeviceOrAdmin])
+def upload_barrier_entries(request):
+    """
+    Upload a batch of scans recorded offline by a barrier.
+    Device endpoint - requires the X-Device-Key header.
+    Body: {"device_code": "...", "entries": [{"booking_id", "scanned_at", "granted"}]}
+    """
+    serializer = BarrierEntryBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    stored = services.record_barrier_entries(
+        serializer.validated_data['device_code'],
+        serializer.validated_data['entries']
+    )
+    if stored is None:
+        return Response(
+            {'error': 'Invalid barrier device'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response({'stored': stored}, status=status.HTTP_201_CREATED)
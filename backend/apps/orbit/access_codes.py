@@ -0,0 +1,159 @@
+"""
+Lookup-free access code generation for ORBIT app.
+
+Codes are a keyed permutation of a monotonically increasing sequence:
+each sequence number is encrypted with a small Feistel network (keyed by
+SECRET_KEY) over the code space and spelled in the code alphabet. Distinct
+sequence numbers always give distinct codes, and without the key the next
+code cannot be predicted from previous ones.
+
+Sequence numbers are reserved from the database in blocks, so generating a
+code normally needs no database round trip at all.
+"""
+import hashlib
+import string
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from .models import AccessCodeSequence
+
+ALPHABET = string.ascii_uppercase + string.digits
+FEISTEL_ROUNDS = 8
+BLOCK_SIZE = 1000
+
+
+def encode(value, length):
+    """Spell an integer in the code alphabet, fixed width."""
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+class CodePermutation:
+    """
+    Keyed pseudorandom permutation of [0, len(ALPHABET) ** length).
+    Balanced Feistel network on the next even bit width, with cycle
+    walking to stay inside the code space.
+    """
+
+    def __init__(self, key, length):
+        self.length = length
+        self.domain = len(ALPHABET) ** length
+        bits = (self.domain - 1).bit_length()
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = [
+            hashlib.blake2b(key + bytes([index]), digest_size=32).digest()
+            for index in range(FEISTEL_ROUNDS)
+        ]
+
+    def _round(self, index, value):
+        digest = hashlib.blake2b(
+            value.to_bytes(8, 'big'), key=self.round_keys[index], digest_size=8
+        ).digest()
+        return int.from_bytes(digest, 'big') & self.half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for index in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ self._round(index, right)
+        return (left << self.half_bits) | right
+
+    def permute(self, value):
+        if not 0 <= value < self.domain:
+            raise ValueError("Access code space exhausted")
+        value = self._encrypt(value)
+        while value >= self.domain:
+            value = self._encrypt(value)
+        return value
+
+    def code(self, value):
+        return encode(self.permute(value), self.length)
+
+
+def reserve_sequence_block(size, name='access_code'):
+    """
+    Reserve `size` sequence numbers with a single locked row update.
+    
+    Returns:
+        First reserved sequence number
+    """
+    with transaction.atomic():
+        sequence, _ = AccessCodeSequence.objects.select_for_update().get_or_create(name=name)
+        start = sequence.next_value
+        sequence.next_value = start + size
+        sequence.save(update_fields=['next_value'])
+    return start
+
+
+class AccessCodeGenerator:
+    """
+    Hands out codes from a per-thread block of reserved sequence numbers.
+    
+    A block reserved inside a transaction is only trusted once that
+    transaction commits. Until then it stays in use only while its commit
+    callback is still queued on the connection; once the transaction (or
+    savepoint) rolls back and drops the callback, the block is discarded
+    so another process cannot be handed the same numbers.
+    """
+
+    def __init__(self, length=6, block_size=BLOCK_SIZE, key=None):
+        key = key if key is not None else settings.SECRET_KEY.encode()
+        self.permutation = CodePermutation(
+            hashlib.blake2b(key, person=b'parkhero-codes').digest(), length
+        )
+        self.block_size = block_size
+        self._local = threading.local()
+
+    def _state(self):
+        state = self._local
+        if not hasattr(state, 'next'):
+            state.next = state.end = 0
+            state.pending = None
+        return state
+
+    def _reserve(self, state):
+        state.next = reserve_sequence_block(self.block_size)
+        state.end = state.next + self.block_size
+        if connection.in_atomic_block:
+            def confirm():
+                if state.pending is confirm:
+                    state.pending = None
+
+            state.pending = confirm
+            transaction.on_commit(confirm)
+        else:
+            state.pending = None
+
+    @staticmethod
+    def _awaiting_commit(callback):
+        """Whether callback is still queued to run when the transaction commits."""
+        return connection.in_atomic_block and any(
+            entry[1] is callback for entry in connection.run_on_commit
+        )
+
+    def next_code(self):
+        state = self._state()
+        if state.pending is not None and not self._awaiting_commit(state.pending):
+            # Reserving transaction or savepoint rolled back
+            state.next = state.end = 0
+            state.pending = None
+        if state.next >= state.end:
+            self._reserve(state)
+        value = state.next
+        state.next += 1
+        return self.permutation.code(value)
+
+
+_generators = {}
+_generators_lock = threading.Lock()
+
+
+def get_generator(length=6):
+    """Process-wide generator for a code length."""
+    with _generators_lock:
+        if length not in _generators:
+            _generators[length] = AccessCodeGenerator(length)
+        return _generators[length]
@@ -35,6 +35,23 @@ class BookingAdmin(admin.ModelAdmin):
     
     actions = ['cancel_bookings', 'complete_bookings']
     
+    def save_model(self, request, obj, form, change):
+        """Keep slot bitmaps in sync with edited time windows and status."""
+        from . import services, slots
+        original = type(obj).objects.select_related('spot__floor').get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        days = set(slots.window_masks(obj.start_time, obj.end_time))
+        if original is not None:
+            original_days = set(slots.window_masks(original.start_time, original.end_time))
+            if original.spot_id != obj.spot_id:
+                # Rebuilt after saving so the moved booking no longer counts there
+                services.rebuild_spot_slots(original.spot_id, original_days)
+                services.invalidate_availability_timeline(original.spot.floor.facility_id)
+            else:
+                days |= original_days
+        services.rebuild_spot_slots(obj.spot_id, days)
+        services.invalidate_availability_timeline(obj.spot.floor.facility_id)
+    
     def cancel_bookings(self, request, queryset):
         """Cancel selected bookings."""
         from . import services
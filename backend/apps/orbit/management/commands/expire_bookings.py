@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.orbit import services
+
+
+class Command(BaseCommand):
+    help = "Complete bookings whose end_time has passed and release their spots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=services.EXPIRY_BATCH_SIZE,
+            help="Bookings completed per transaction",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep running, sweeping every --interval seconds",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help="Seconds between sweeps when --loop is set",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = services.expire_bookings(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Expired {result['bookings_expired']} booking(s), released "
+                f"{result['spots_released']} spot(s) in {result['batches']} "
+                f"batch(es), {result['duration_ms']} ms"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.orbit import services
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-spot time-slot bitmaps from reserved/active bookings."
+
+    def handle(self, *args, **options):
+        rows = services.rebuild_slot_index()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} slot bitmap row(s)"))
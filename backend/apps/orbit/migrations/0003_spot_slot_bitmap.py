@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.orbit import slots
+
+
+def backfill_bitmaps(apps, schema_editor):
+    Booking = apps.get_model('orbit', 'Booking')
+    SpotSlotBitmap = apps.get_model('orbit', 'SpotSlotBitmap')
+
+    masks = {}
+    bookings = Booking.objects.filter(
+        status__in=['reserved', 'active']
+    ).values_list('spot_id', 'start_time', 'end_time')
+    for spot_id, start_time, end_time in bookings.iterator():
+        for day, mask in slots.window_masks(start_time, end_time).items():
+            masks[(spot_id, day)] = masks.get((spot_id, day), 0) | mask
+
+    SpotSlotBitmap.objects.bulk_create(
+        [
+            SpotSlotBitmap(spot_id=spot_id, date=day, slots=slots.encode(mask))
+            for (spot_id, day), mask in masks.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atlas', '0009_spot_counters'),
+        ('orbit', '0002_booking_host_user_booking_rejection_reason_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpotSlotBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('slots', models.BinaryField(help_text='96 fifteen-minute slots packed into 12 bytes', max_length=12)),
+                ('spot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_bitmaps', to='atlas.parkingspot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'spot'], name='orbit_spots_date_11bc7d_idx')],
+                'unique_together': {('spot', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_bitmaps, migrations.RunPython.noop),
+    ]
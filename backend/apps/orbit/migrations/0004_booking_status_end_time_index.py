@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atlas', '0009_spot_counters'),
+        ('orbit', '0003_spot_slot_bitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'end_time'], name='orbit_booki_status_667b30_idx'),
+        ),
+    ]
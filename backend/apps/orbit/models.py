@@ -61,6 +61,7 @@ class Booking(TimeStampedModel):
             models.Index(fields=['spot', 'start_time', 'end_time']),
             models.Index(fields=['user', 'status']),
             models.Index(fields=['access_code']),
+            models.Index(fields=['status', 'end_time']),
         ]
     
     def __str__(self):
@@ -75,3 +76,41 @@ class Booking(TimeStampedModel):
             self.status in ['reserved', 'active'] and
             self.start_time <= now <= self.end_time
         )
+
+
+class SpotSlotBitmap(models.Model):
+    """
+    Booked fifteen-minute slots of a spot for one UTC day.
+    Maintained by the orbit booking lifecycle services; see orbit.slots.
+    """
+    spot = models.ForeignKey(
+        ParkingSpot,
+        on_delete=models.CASCADE,
+        related_name='slot_bitmaps'
+    )
+    date = models.DateField()
+    slots = models.BinaryField(
+        max_length=12,
+        help_text="96 fifteen-minute slots packed into 12 bytes"
+    )
+    
+    class Meta:
+        unique_together = ['spot', 'date']
+        indexes = [
+            models.Index(fields=['date', 'spot']),
+        ]
+    
+    def __str__(self):
+        return f"{self.spot.code} - {self.date}"
+
+
+class AccessCodeSequence(models.Model):
+    """
+    Monotonic sequence feeding access code generation.
+    Reserved in blocks; see orbit.access_codes.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
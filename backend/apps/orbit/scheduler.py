@@ -0,0 +1,71 @@
+"""
+In-process periodic runner for ORBIT background jobs.
+
+Enabled by setting BOOKING_EXPIRY_INTERVAL (seconds) in settings; the
+expire_bookings management command covers cron-style deployments.
+"""
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class BookingExpiryRunner(threading.Thread):
+    """Daemon thread that runs the booking expiry sweeper on an interval."""
+
+    def __init__(self, interval, batch_size=None):
+        super().__init__(name='booking-expiry-runner', daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+
+    def run(self):
+        from . import services
+
+        while not self._stopped.wait(self.interval):
+            close_old_connections()
+            try:
+                kwargs = {'batch_size': self.batch_size} if self.batch_size else {}
+                result = services.expire_bookings(**kwargs)
+                if result['bookings_expired']:
+                    logger.info(
+                        "Expired %(bookings_expired)d booking(s), released "
+                        "%(spots_released)d spot(s) in %(duration_ms).1f ms",
+                        result
+                    )
+            except Exception:
+                logger.exception("Booking expiry sweep failed")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_expiry_runner():
+    """
+    Start the expiry runner once per process if BOOKING_EXPIRY_INTERVAL
+    is configured.
+    
+    Returns:
+        The running BookingExpiryRunner, or None when disabled
+    """
+    global _runner
+
+    interval = getattr(settings, 'BOOKING_EXPIRY_INTERVAL', None)
+    if not interval:
+        return None
+
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = BookingExpiryRunner(
+                interval,
+                batch_size=getattr(settings, 'BOOKING_EXPIRY_BATCH_SIZE', None)
+            )
+            _runner.start()
+    return _runner
@@ -45,6 +45,14 @@ class BookingCreateSerializer(serializers.Serializer):
         return value
 
 
+class SpotCandidatesQuerySerializer(serializers.Serializer):
+    """Query parameters for listing candidate spots for a time window."""
+    facility_id = serializers.IntegerField()
+    duration_hours = serializers.FloatField(min_value=0.5, max_value=24, default=1.0)
+    start_time = serializers.DateTimeField(required=False, allow_null=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+
 class BookingListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for booking list."""
     facility_name = serializers.CharField(source='spot.floor.facility.name', read_only=True)
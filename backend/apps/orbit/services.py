@@ -2,19 +2,46 @@
 Booking engine services for ORBIT app.
 Handles spot finding, booking creation, and conflict prevention.
 """
-import random
-import string
+import time
 from datetime import datetime, timedelta
-from django.db import transaction
-from django.db.models import Q
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from apps.atlas.models import ParkingSpot
-from .models import Booking
+from apps.atlas import services as atlas_services
+from .models import Booking, SpotSlotBitmap
+from . import access_codes, slots
+
+
+# Candidate spots fetched (and locked, where supported) per allocation round
+ALLOCATION_BATCH_SIZE = 5
+
+# Bounded retries when concurrent requests win every candidate of a round
+MAX_ALLOCATION_ROUNDS = 3
+
+# Bounded retries when an access code collides on insert
+MAX_ACCESS_CODE_ATTEMPTS = 5
+
+# Bookings completed per transaction by the expiry sweeper
+EXPIRY_BATCH_SIZE = 500
+
+# Safety net for cached timelines; booking mutations invalidate them first
+AVAILABILITY_CACHE_TIMEOUT = 300
+
+
+class NoAvailableSpots(ValueError):
+    """No spot in the facility is free for the requested window."""
 
 
 def generate_access_code(length=6):
     """
-    Generate a unique random access code.
+    Generate a unique, unguessable access code without a database lookup.
+    
+    Codes are a keyed permutation of a reserved sequence number, so they
+    never repeat; legacy random codes are caught by the unique constraint
+    and retried in _insert_booking.
     
     Args:
         length: Length of the code (default 6)
@@ -22,15 +49,14 @@ def generate_access_code(length=6):
     Returns:
         Unique access code string
     """
-    while True:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-        if not Booking.objects.filter(access_code=code).exists():
-            return code
+    return access_codes.get_generator(length).next_code()
 
 
 def validate_booking_window(spot_id, start_time, end_time, exclude_booking_id=None):
     """
     Check if a spot is available during the requested time window.
+    The slot bitmaps answer most checks; only a bitmap hit (which may be
+    a partial-slot false positive) falls back to the exact overlap query.
     
     Args:
         spot_id: ID of the parking spot
@@ -41,6 +67,15 @@ def validate_booking_window(spot_id, start_time, end_time, exclude_booking_id=No
     Returns:
         Boolean indicating if the window is available
     """
+    masks = slots.window_masks(start_time, end_time)
+    bitmaps = SpotSlotBitmap.objects.filter(
+        spot_id=spot_id,
+        date__in=list(masks)
+    ).values_list('date', 'slots')
+    
+    if not any(slots.decode(value) & masks[day] for day, value in bitmaps):
+        return True
+    
     # Check for overlapping bookings
     overlapping = Booking.objects.filter(
         spot_id=spot_id,
@@ -55,10 +90,193 @@ def validate_booking_window(spot_id, start_time, end_time, exclude_booking_id=No
     return not overlapping.exists()
 
 
+def get_busy_spot_ids(facility_id, start_time, end_time):
+    """
+    Spots of a facility with a reserved/active booking overlapping the
+    window. One scan of the facility's slot bitmaps rules out every spot
+    whose bits miss the window; only the few bitmap hits (which may be
+    partial-slot false positives) are confirmed with the exact overlap
+    query.
+    
+    Args:
+        facility_id: ID of the facility
+        start_time: Window start time
+        end_time: Window end time
+        
+    Returns:
+        Set of ParkingSpot IDs
+    """
+    return get_busy_spot_ids_for_facilities([facility_id], start_time, end_time)
+
+
+def get_busy_spot_ids_for_facilities(facility_ids, start_time, end_time):
+    """
+    Like get_busy_spot_ids, across several facilities in the same two
+    queries.
+    
+    Args:
+        facility_ids: IDs of the facilities
+        start_time: Window start time
+        end_time: Window end time
+        
+    Returns:
+        Set of ParkingSpot IDs
+    """
+    masks = slots.window_masks(start_time, end_time)
+    maybe_busy = {
+        spot_id
+        for spot_id, day, value in SpotSlotBitmap.objects.filter(
+            spot__floor__facility_id__in=list(facility_ids),
+            date__in=list(masks)
+        ).values_list('spot_id', 'date', 'slots')
+        if slots.decode(value) & masks[day]
+    }
+    if not maybe_busy:
+        return set()
+    
+    return set(Booking.objects.filter(
+        spot_id__in=maybe_busy,
+        status__in=['reserved', 'active'],
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    ).values_list('spot_id', flat=True))
+
+
+def mark_booking_slots(booking):
+    """
+    Set the slots covered by a booking in its spot's day bitmaps.
+    
+    Args:
+        booking: Booking instance
+    """
+    for day, mask in slots.window_masks(booking.start_time, booking.end_time).items():
+        bitmap, created = SpotSlotBitmap.objects.select_for_update().get_or_create(
+            spot_id=booking.spot_id,
+            date=day,
+            defaults={'slots': slots.encode(mask)}
+        )
+        if not created:
+            bitmap.slots = slots.encode(slots.decode(bitmap.slots) | mask)
+            bitmap.save(update_fields=['slots'])
+
+
+def rebuild_spot_slots(spot_id, days):
+    """
+    Recompute a spot's day bitmaps from its reserved/active bookings.
+    Used when a booking stops holding its slots, since other bookings
+    may share a partially covered slot.
+    
+    Args:
+        spot_id: ID of the parking spot
+        days: Iterable of dates to rebuild
+    """
+    masks = dict.fromkeys(days, 0)
+    if not masks:
+        return
+    
+    range_start = slots.day_start(min(masks))
+    range_end = slots.day_start(max(masks)) + timedelta(days=1)
+    bookings = Booking.objects.filter(
+        spot_id=spot_id,
+        status__in=['reserved', 'active'],
+        start_time__lt=range_end,
+        end_time__gt=range_start
+    ).values_list('start_time', 'end_time')
+    
+    for start_time, end_time in bookings:
+        for day, mask in slots.window_masks(start_time, end_time).items():
+            if day in masks:
+                masks[day] |= mask
+    
+    SpotSlotBitmap.objects.filter(
+        spot_id=spot_id,
+        date__in=[day for day, mask in masks.items() if not mask]
+    ).delete()
+    for day, mask in masks.items():
+        if mask:
+            SpotSlotBitmap.objects.update_or_create(
+                spot_id=spot_id,
+                date=day,
+                defaults={'slots': slots.encode(mask)}
+            )
+
+
+@transaction.atomic
+def rebuild_slot_index():
+    """
+    Rebuild every spot's slot bitmaps from reserved/active bookings.
+    
+    Returns:
+        Number of bitmap rows written
+    """
+    masks = {}
+    bookings = Booking.objects.filter(
+        status__in=['reserved', 'active']
+    ).values_list('spot_id', 'start_time', 'end_time')
+    
+    for spot_id, start_time, end_time in bookings.iterator():
+        for day, mask in slots.window_masks(start_time, end_time).items():
+            masks[(spot_id, day)] = masks.get((spot_id, day), 0) | mask
+    
+    SpotSlotBitmap.objects.all().delete()
+    SpotSlotBitmap.objects.bulk_create(
+        [
+            SpotSlotBitmap(spot_id=spot_id, date=day, slots=slots.encode(mask))
+            for (spot_id, day), mask in masks.items()
+        ],
+        batch_size=1000
+    )
+    return len(masks)
+
+
+def release_booking_slots(booking):
+    """
+    Clear a booking's slots from its spot's day bitmaps.
+    
+    Args:
+        booking: Booking instance
+    """
+    rebuild_spot_slots(
+        booking.spot_id,
+        slots.window_masks(booking.start_time, booking.end_time)
+    )
+
+
+def find_available_spots(facility_id, start_time, end_time, limit=None):
+    """
+    Find spots free for the requested time window. Overlapping bookings
+    are found through the slot bitmaps (see get_busy_spot_ids), and
+    candidates are ordered by distance from entry. Evaluating the result
+    takes up to three queries: the bitmap scan, an exact overlap check on
+    the spots it flags, and the candidate query itself.
+    
+    Args:
+        facility_id: ID of the facility
+        start_time: Booking start time
+        end_time: Booking end time
+        limit: Optional maximum number of candidates
+        
+    Returns:
+        QuerySet of ParkingSpot instances, closest to entry first
+    """
+    candidates = ParkingSpot.objects.filter(
+        floor__facility_id=facility_id,
+        status='available'
+    ).exclude(
+        id__in=get_busy_spot_ids(facility_id, start_time, end_time)
+    ).select_related('floor', 'floor__facility').order_by('distance_from_entry', 'id')
+    
+    if limit is not None:
+        candidates = candidates[:limit]
+    
+    return candidates
+
+
 def find_best_available_spot(facility_id, start_time, end_time):
     """
     Find the best available spot for booking.
-    Prioritizes spots by distance from entry.
+    Prioritizes spots by distance from entry. Same query cost as
+    find_available_spots (up to three queries).
     
     Args:
         facility_id: ID of the facility
@@ -68,18 +286,43 @@ def find_best_available_spot(facility_id, start_time, end_time):
     Returns:
         ParkingSpot instance or None if no spots available
     """
-    # Get all available spots in the facility
-    available_spots = ParkingSpot.objects.filter(
-        floor__facility_id=facility_id,
-        status='available'
-    ).select_related('floor').order_by('distance_from_entry')
+    return find_available_spots(facility_id, start_time, end_time).first()
+
+
+def find_best_available_spots(facility_ids, start_time, end_time):
+    """
+    Best available spot of each facility, as find_best_available_spot
+    would pick it, in a fixed number of queries however many facilities
+    are asked for: the bitmap scan and overlap check are shared, and a
+    window function keeps the closest free spot per facility.
     
-    # Check each spot for time conflicts
-    for spot in available_spots:
-        if validate_booking_window(spot.id, start_time, end_time):
-            return spot
+    Args:
+        facility_ids: IDs of the facilities
+        start_time: Booking start time
+        end_time: Booking end time
+        
+    Returns:
+        Dictionary of facility ID -> ParkingSpot; facilities without a
+        free spot are left out
+    """
+    facility_ids = list(facility_ids)
+    if not facility_ids:
+        return {}
     
-    return None
+    spots = ParkingSpot.objects.filter(
+        floor__facility_id__in=facility_ids,
+        status='available'
+    ).exclude(
+        id__in=get_busy_spot_ids_for_facilities(facility_ids, start_time, end_time)
+    ).annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=F('floor__facility_id'),
+            order_by=[F('distance_from_entry').asc(), F('id').asc()]
+        )
+    ).filter(rank=1).select_related('floor', 'floor__facility')
+    
+    return {spot.floor.facility_id: spot for spot in spots}
 
 
 @transaction.atomic
@@ -107,16 +350,7 @@ def create_booking(user, facility_id, duration_hours, start_time=None):
     end_time = start_time + timedelta(hours=duration_hours)
     
     # Get facility to check onboarding type
-    facility = Facility.objects.get(id=facility_id)
-    
-    # Find best available spot
-    spot = find_best_available_spot(facility_id, start_time, end_time)
-    
-    if not spot:
-        raise ValueError("No available spots for the requested time window")
-    
-    # Generate access code
-    access_code = generate_access_code()
+    facility = Facility.objects.select_related('owner').get(id=facility_id)
     
     # Determine initial status based on facility type
     # P2P facilities require host approval
@@ -127,22 +361,53 @@ def create_booking(user, facility_id, duration_hours, start_time=None):
         initial_status = 'reserved'
         host_user = None
     
-    # Create booking
-    booking = Booking.objects.create(
-        user=user,
-        spot=spot,
-        start_time=start_time,
-        end_time=end_time,
-        access_code=access_code,
-        status=initial_status,
-        host_user=host_user
-    )
-    
-    # Update spot status (reserve spot even if pending approval)
-    spot.status = 'reserved'
-    spot.save(update_fields=['status', 'updated_at'])
-    
-    return booking
+    for _ in range(MAX_ALLOCATION_ROUNDS):
+        candidates = find_available_spots(
+            facility_id, start_time, end_time, limit=ALLOCATION_BATCH_SIZE
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            # Skip candidates another transaction is already allocating
+            candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+        candidates = list(candidates)
+        
+        if not candidates:
+            break
+        
+        for spot in candidates:
+            # Reserve spot even if pending approval; losing the race
+            # means another request took it, so move to the next one
+            if not atlas_services.transition_spot_status(spot, 'available', 'reserved'):
+                continue
+            
+            booking = _insert_booking(
+                user=user,
+                spot=spot,
+                start_time=start_time,
+                end_time=end_time,
+                status=initial_status,
+                host_user=host_user
+            )
+            if booking.status == 'reserved':
+                mark_booking_slots(booking)
+            invalidate_availability_timeline(facility_id)
+            return booking
+    
+    raise NoAvailableSpots("No available spots for the requested time window")
+
+
+def _insert_booking(**fields):
+    """
+    Insert a booking, retrying with a fresh access code on collision.
+    The spot allocation is kept; only the insert is retried.
+    """
+    for _ in range(MAX_ACCESS_CODE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return Booking.objects.create(access_code=generate_access_code(), **fields)
+        except IntegrityError:
+            continue
+    
+    raise IntegrityError("Could not allocate a unique access code")
 
 
 @transaction.atomic
@@ -156,11 +421,13 @@ def release_spot(booking_id):
     Returns:
         Updated Booking instance
     """
-    booking = Booking.objects.select_related('spot').get(id=booking_id)
+    booking = Booking.objects.select_related('spot', 'spot__floor').get(id=booking_id)
     
     # Update booking status
     booking.status = 'completed'
     booking.save(update_fields=['status', 'updated_at'])
+    release_booking_slots(booking)
+    invalidate_availability_timeline(booking.spot.floor.facility_id)
     
     # Update spot status to available
     booking.spot.status = 'available'
@@ -180,7 +447,7 @@ def cancel_booking(booking_id):
     Returns:
         Updated Booking instance
     """
-    booking = Booking.objects.select_related('spot').get(id=booking_id)
+    booking = Booking.objects.select_related('spot', 'spot__floor').get(id=booking_id)
     
     if booking.status not in ['reserved', 'active']:
         raise ValueError("Cannot cancel a completed or already cancelled booking")
@@ -188,6 +455,8 @@ def cancel_booking(booking_id):
     # Update booking status
     booking.status = 'cancelled'
     booking.save(update_fields=['status', 'updated_at'])
+    release_booking_slots(booking)
+    invalidate_availability_timeline(booking.spot.floor.facility_id)
     
     # Update spot status to available
     booking.spot.status = 'available'
@@ -220,9 +489,17 @@ def approve_booking(booking_id, approver_user):
     if booking.status != 'pending_approval':
         raise ValueError(f"Cannot approve booking with status: {booking.status}")
     
+    # Another booking may have taken the window while this one waited
+    if not validate_booking_window(
+        booking.spot_id, booking.start_time, booking.end_time, exclude_booking_id=booking.id
+    ):
+        raise ValueError("The spot is no longer free for this booking's time window")
+    
     # Update booking status to reserved
     booking.status = 'reserved'
     booking.save(update_fields=['status', 'updated_at'])
+    mark_booking_slots(booking)
+    invalidate_availability_timeline(booking.spot.floor.facility_id)
     
     return booking
 
@@ -256,6 +533,7 @@ def reject_booking(booking_id, approver_user, reason=None):
     booking.status = 'rejected'
     booking.rejection_reason = reason or "No reason provided"
     booking.save(update_fields=['status', 'rejection_reason', 'updated_at'])
+    invalidate_availability_timeline(booking.spot.floor.facility_id)
     
     # Release the spot
     booking.spot.status = 'available'
@@ -264,6 +542,178 @@ def reject_booking(booking_id, approver_user, reason=None):
     return booking
 
 
+def _availability_version(facility_id):
+    """Current cache version of a facility's availability timelines."""
+    key = f'orbit:availability-version:{facility_id}'
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, timeout=None)
+    return version
+
+
+def invalidate_availability_timeline(facility_id):
+    """
+    Drop cached availability timelines of a facility once the current
+    transaction commits.
+    
+    Args:
+        facility_id: ID of the facility
+    """
+    def bump():
+        key = f'orbit:availability-version:{facility_id}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+    
+    transaction.on_commit(bump)
+
+
+def get_availability_timeline(facility_id, day):
+    """
+    Free capacity of a facility per time slot for one UTC day.
+    
+    Computed with a sweep over the sorted start/end events of the
+    facility's bookings (one query), and cached until the next booking
+    mutation on the facility.
+    
+    Args:
+        facility_id: ID of the facility
+        day: date to compute
+        
+    Returns:
+        Dictionary with capacity and per-slot free counts
+    """
+    from apps.atlas.models import Facility
+    
+    cache_key = (
+        f'orbit:availability:{facility_id}:{day.isoformat()}:'
+        f'{_availability_version(facility_id)}'
+    )
+    timeline = cache.get(cache_key)
+    if timeline is not None:
+        return timeline
+    
+    facility = Facility.objects.get(id=facility_id)
+    # Blocked spots and walk-in occupancy are not bookable
+    capacity = facility.total_spots - facility.blocked_count - facility.occupied_count
+    
+    day_begin = slots.day_start(day)
+    day_end = day_begin + timedelta(days=1)
+    bookings = Booking.objects.filter(
+        spot__floor__facility_id=facility_id,
+        status__in=['pending_approval', 'reserved', 'active'],
+        start_time__lt=day_end,
+        end_time__gt=day_begin
+    ).values_list('start_time', 'end_time')
+    
+    # Ends sort before starts at the same instant: windows are half-open
+    events = sorted(
+        [(start, 1) for start, _ in bookings] +
+        [(end, -1) for _, end in bookings]
+    )
+    
+    slot_length = timedelta(minutes=slots.SLOT_MINUTES)
+    timeline_slots = []
+    in_use = 0
+    index = 0
+    for slot in range(slots.SLOTS_PER_DAY):
+        slot_start = day_begin + slot * slot_length
+        slot_end = slot_start + slot_length
+        
+        while index < len(events) and events[index][0] <= slot_start:
+            in_use += events[index][1]
+            index += 1
+        
+        peak = in_use
+        while index < len(events) and events[index][0] < slot_end:
+            in_use += events[index][1]
+            peak = max(peak, in_use)
+            index += 1
+        
+        timeline_slots.append({
+            'start': slot_start,
+            'end': slot_end,
+            'available': max(capacity - peak, 0)
+        })
+    
+    timeline = {
+        'facility_id': facility_id,
+        'date': day,
+        'slot_minutes': slots.SLOT_MINUTES,
+        'capacity': capacity,
+        'slots': timeline_slots
+    }
+    cache.set(cache_key, timeline, timeout=AVAILABILITY_CACHE_TIMEOUT)
+    return timeline
+
+
+def expire_bookings(now=None, batch_size=EXPIRY_BATCH_SIZE):
+    """
+    Complete reserved/active bookings whose end_time has passed and
+    release their spots, in chunked transactions.
+    
+    Uses the (status, end_time) index to find expired bookings. Slot
+    bitmaps are left as-is: stale bits only cover past windows and the
+    exact overlap check ignores completed bookings.
+    
+    Args:
+        now: Cut-off time (defaults to now)
+        batch_size: Bookings per transaction
+        
+    Returns:
+        Dictionary with rows touched, batches and run duration
+    """
+    now = now or timezone.now()
+    started = time.monotonic()
+    result = {'bookings_expired': 0, 'spots_released': 0, 'batches': 0}
+    
+    while True:
+        with transaction.atomic():
+            expired = list(
+                Booking.objects.filter(
+                    status__in=['reserved', 'active'],
+                    end_time__lte=now
+                ).order_by('end_time').values_list(
+                    'id', 'spot_id', 'spot__floor__facility_id'
+                )[:batch_size]
+            )
+            if not expired:
+                break
+            
+            booking_ids = [booking_id for booking_id, _, _ in expired]
+            spot_ids = {spot_id for _, spot_id, _ in expired}
+            
+            result['bookings_expired'] += Booking.objects.filter(
+                id__in=booking_ids,
+                status__in=['reserved', 'active']
+            ).update(status='completed', updated_at=timezone.now())
+            
+            # Keep spots still held by another booking reserved
+            still_held = Booking.objects.filter(
+                spot=OuterRef('pk'),
+                status__in=['pending_approval', 'reserved', 'active']
+            )
+            releasable = ParkingSpot.objects.filter(
+                id__in=spot_ids,
+                status='reserved'
+            ).filter(~Exists(still_held))
+            result['spots_released'] += atlas_services.bulk_update_spots(
+                releasable, status='available'
+            )
+            
+            for facility_id in {facility_id for _, _, facility_id in expired}:
+                invalidate_availability_timeline(facility_id)
+            result['batches'] += 1
+        
+        if len(expired) < batch_size:
+            break
+    
+    result['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
 def get_user_bookings(user, active_only=False):
     """
     Get bookings for a user.
@@ -0,0 +1,58 @@
+"""
+Per-spot, per-day time-slot bitmaps for ORBIT app.
+
+A day is split into 96 fifteen-minute slots packed into a 12-byte value.
+Bits are set conservatively (any slot a booking touches is marked), so a
+window whose bits do not intersect a spot's bitmap is guaranteed free.
+Days are UTC calendar days.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+
+def encode(mask):
+    """Pack an integer slot mask into bytes for storage."""
+    return mask.to_bytes(BITMAP_BYTES, 'big')
+
+
+def decode(value):
+    """Unpack a stored bitmap into an integer slot mask."""
+    return int.from_bytes(bytes(value), 'big') if value else 0
+
+
+def day_start(day):
+    """UTC midnight for a calendar day."""
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def window_masks(start_time, end_time):
+    """
+    Slot masks covered by a time window, one per UTC day.
+    
+    Args:
+        start_time: Window start (aware datetime)
+        end_time: Window end (aware datetime)
+        
+    Returns:
+        Dictionary of date -> integer slot mask
+    """
+    start_time = start_time.astimezone(dt_timezone.utc)
+    end_time = end_time.astimezone(dt_timezone.utc)
+    masks = {}
+    
+    day = start_time.date()
+    while day_start(day) < end_time:
+        midnight = day_start(day)
+        window_start = max(start_time, midnight) - midnight
+        window_end = min(end_time, midnight + timedelta(days=1)) - midnight
+        
+        first = int(window_start.total_seconds() // (SLOT_MINUTES * 60))
+        last = -int(-window_end.total_seconds() // (SLOT_MINUTES * 60))
+        if last > first:
+            masks[day] = ((1 << (last - first)) - 1) << first
+        day += timedelta(days=1)
+    
+    return masks
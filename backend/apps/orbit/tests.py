@@ -1,3 +1,283 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.utils import timezone
+from apps.atlas.models import Facility, Floor, ParkingSpot
+from apps.orbit.models import AccessCodeSequence, Booking, SpotSlotBitmap
+from apps.orbit import access_codes, services, slots
 
-# Create your tests here.
+
+class Rollback(Exception):
+    pass
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Stress create_booking from many threads against a small facility."""
+
+    THREADS = 8
+    BOOKINGS_PER_THREAD = 6
+    SPOTS = 30
+
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            name='Stress Mall', type='mall', address='Pune',
+            onboarding_type='enterprise'
+        )
+        floor = Floor.objects.create(facility=self.facility, label='B1')
+        for i in range(self.SPOTS):
+            ParkingSpot.objects.create(
+                floor=floor, code=f'S-{i:03d}', x=i, y=0, distance_from_entry=i
+            )
+        self.users = [
+            User.objects.create_user(f'driver{i}', password='x')
+            for i in range(self.THREADS)
+        ]
+
+    def test_no_double_allocation_under_concurrency(self):
+        created, misses, errors = [], [], []
+        start_barrier = threading.Barrier(self.THREADS)
+
+        def worker(user):
+            start_barrier.wait()
+            try:
+                for _ in range(self.BOOKINGS_PER_THREAD):
+                    try:
+                        booking = services.create_booking(user, self.facility.id, 2)
+                        created.append(booking.spot_id)
+                    except ValueError:
+                        misses.append(user.id)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in self.users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(errors, [])
+        # Every spot is handed out at most once, and all spots are used
+        # before anyone is turned away.
+        self.assertEqual(len(created), len(set(created)))
+        self.assertEqual(len(created), self.SPOTS)
+        self.assertEqual(
+            len(misses), self.THREADS * self.BOOKINGS_PER_THREAD - self.SPOTS
+        )
+        self.assertEqual(
+            Booking.objects.values('spot').distinct().count(),
+            Booking.objects.count()
+        )
+
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.reserved_count, self.SPOTS)
+        self.assertEqual(self.facility.available_count, 0)
+
+        print(
+            f"\n{len(created)} bookings from {self.THREADS} threads in "
+            f"{elapsed:.2f}s ({len(created) / elapsed:.1f} bookings/s)"
+        )
+
+
+class AccessCodeGeneratorTests(TestCase):
+    """Codes come from reserved sequence blocks and never repeat."""
+
+    KEY = b'test-key'
+
+    def generator(self, block_size):
+        return access_codes.AccessCodeGenerator(block_size=block_size, key=self.KEY)
+
+    def test_codes_unique_across_generators(self):
+        # Different block sizes interleave the reserved ranges
+        generators = [self.generator(7), self.generator(10), self.generator(3)]
+        codes = [generator.next_code() for _ in range(40) for generator in generators]
+
+        self.assertEqual(len(codes), len(set(codes)))
+        self.assertTrue(all(len(code) == 6 for code in codes))
+        # Six blocks of 7, four of 10 and fourteen of 3
+        self.assertEqual(AccessCodeSequence.objects.get().next_value, 42 + 40 + 42)
+
+    def test_block_from_rolled_back_transaction_is_discarded(self):
+        generator = self.generator(10)
+        with self.assertRaises(Rollback), transaction.atomic():
+            generator.next_code()
+            raise Rollback
+
+        # The reservation rolled back, so the next process reserves block 0
+        with transaction.atomic():
+            codes = [generator.next_code() for _ in range(5)]
+        other_generator = self.generator(10)
+        other = [other_generator.next_code() for _ in range(5)]
+
+        self.assertEqual(len(set(codes) | set(other)), 10)
+        self.assertEqual(AccessCodeSequence.objects.get().next_value, 20)
+
+    def test_block_is_reused_within_its_transaction(self):
+        generator = self.generator(10)
+        with transaction.atomic():
+            codes = [generator.next_code() for _ in range(5)]
+
+        self.assertEqual(len(set(codes)), 5)
+        self.assertEqual(AccessCodeSequence.objects.get().next_value, 10)
+
+    def test_next_booking_after_rollback_reserves_a_new_block(self):
+        facility = Facility.objects.create(
+            name='Code Mall', type='mall', address='Pune', onboarding_type='enterprise'
+        )
+        floor = Floor.objects.create(facility=facility, label='B1')
+        for i in range(2):
+            ParkingSpot.objects.create(floor=floor, code=f'S-{i:03d}', x=i, y=0)
+        user = User.objects.create_user('driver', password='x')
+
+        with mock.patch.dict(access_codes._generators, clear=True):
+            with self.assertRaises(Rollback), transaction.atomic():
+                services.create_booking(user, facility.id, 1)
+                raise Rollback
+            self.assertFalse(AccessCodeSequence.objects.exists())
+
+            booking = services.create_booking(user, facility.id, 1)
+
+        self.assertEqual(AccessCodeSequence.objects.get().next_value, access_codes.BLOCK_SIZE)
+        self.assertEqual(Booking.objects.get().access_code, booking.access_code)
+
+
+class SlotBitmapSyncTests(TestCase):
+    """Every booking lifecycle path keeps SpotSlotBitmap in sync."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='x')
+        self.user = User.objects.create_user('driver', password='x')
+        self.facility = self.create_facility('enterprise')
+        self.midnight = slots.day_start(timezone.now().date() + timedelta(days=2))
+
+    def create_facility(self, onboarding_type, spots=2):
+        facility = Facility.objects.create(
+            name=f'{onboarding_type} lot', type='mall', address='Pune',
+            onboarding_type=onboarding_type, owner=self.owner
+        )
+        floor = Floor.objects.create(facility=facility, label='B1')
+        for i in range(spots):
+            ParkingSpot.objects.create(
+                floor=floor, code=f'S-{i:03d}', x=i, y=0, distance_from_entry=i
+            )
+        return facility
+
+    def at(self, hours, minutes=0):
+        return self.midnight + timedelta(hours=hours, minutes=minutes)
+
+    def book(self, start, hours, facility=None):
+        return services.create_booking(
+            self.user, (facility or self.facility).id, hours, start_time=start
+        )
+
+    def bitmaps(self):
+        return {
+            (spot_id, day): slots.decode(value)
+            for spot_id, day, value in SpotSlotBitmap.objects.values_list('spot_id', 'date', 'slots')
+        }
+
+    def assertBitmapsInSync(self):
+        expected = {}
+        bookings = Booking.objects.filter(status__in=['reserved', 'active'])
+        for spot_id, start_time, end_time in bookings.values_list('spot_id', 'start_time', 'end_time'):
+            for day, mask in slots.window_masks(start_time, end_time).items():
+                expected[(spot_id, day)] = expected.get((spot_id, day), 0) | mask
+        self.assertEqual(self.bitmaps(), expected)
+
+    def test_booking_across_midnight_marks_both_days(self):
+        booking = self.book(self.at(23, 30), 1)
+
+        self.assertEqual(self.bitmaps(), {
+            (booking.spot_id, self.midnight.date()): 0b11 << 94,
+            (booking.spot_id, self.midnight.date() + timedelta(days=1)): 0b11,
+        })
+
+    def test_partial_slots_are_marked(self):
+        booking = self.book(self.at(10, 5), 0.25)
+
+        # 10:05-10:20 touches the 10:00 and 10:15 slots
+        self.assertEqual(self.bitmaps(), {(booking.spot_id, self.midnight.date()): 0b11 << 40})
+
+    def test_cancel_and_complete_clear_only_their_slots(self):
+        first = self.book(self.at(10), 1)
+        second = self.book(self.at(10), 1)
+        spot = ParkingSpot.objects.get(id=first.spot_id)
+        # A later booking on the same spot, sharing the 11:00 slot
+        spot.status = 'available'
+        spot.save()
+        later = self.book(self.at(11, 10), 1)
+        self.assertEqual(later.spot_id, first.spot_id)
+        self.assertBitmapsInSync()
+
+        services.cancel_booking(first.id)
+        self.assertBitmapsInSync()
+        self.assertEqual(
+            self.bitmaps()[(first.spot_id, self.midnight.date())], 0b11111 << 44
+        )
+
+        services.release_spot(second.id)
+        services.release_spot(later.id)
+        self.assertBitmapsInSync()
+        self.assertEqual(self.bitmaps(), {})
+
+    def test_approve_and_reject(self):
+        p2p = self.create_facility('p2p')
+        approved = self.book(self.at(9), 2, facility=p2p)
+        rejected = self.book(self.at(9), 2, facility=p2p)
+        self.assertEqual(self.bitmaps(), {})
+
+        services.approve_booking(approved.id, self.owner)
+        self.assertBitmapsInSync()
+        self.assertIn((approved.spot_id, self.midnight.date()), self.bitmaps())
+
+        services.reject_booking(rejected.id, self.owner)
+        self.assertBitmapsInSync()
+
+    def test_admin_save_moves_slots(self):
+        booking = self.book(self.at(10), 1)
+        other_spot = ParkingSpot.objects.filter(floor__facility=self.facility).exclude(
+            id=booking.spot_id
+        ).get()
+        model_admin = admin.site._registry[Booking]
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_superuser('admin', password='x')
+
+        booking.start_time = self.at(23)
+        booking.end_time = self.at(25)
+        model_admin.save_model(request, booking, None, True)
+        self.assertBitmapsInSync()
+
+        booking.spot = other_spot
+        model_admin.save_model(request, booking, None, True)
+        self.assertBitmapsInSync()
+        self.assertEqual({spot_id for spot_id, _ in self.bitmaps()}, {other_spot.id})
+
+    def test_abutting_bookings_at_a_partial_slot_are_allowed(self):
+        booking = self.book(self.at(10), 1 / 3)  # 10:00-10:20
+
+        # The 10:15 slot bit is set, but the exact check clears the window
+        self.assertTrue(services.validate_booking_window(
+            booking.spot_id, self.at(10, 20), self.at(10, 40)
+        ))
+        self.assertEqual(
+            services.get_busy_spot_ids(self.facility.id, self.at(10, 20), self.at(10, 40)), set()
+        )
+        self.assertEqual(
+            services.get_busy_spot_ids(self.facility.id, self.at(10, 15), self.at(10, 40)),
+            {booking.spot_id}
+        )
+
+        spot = ParkingSpot.objects.get(id=booking.spot_id)
+        spot.status = 'available'
+        spot.save()
+        abutting = self.book(self.at(10, 20), 1 / 3)
+        self.assertEqual(abutting.spot_id, booking.spot_id)
+        self.assertBitmapsInSync()
@@ -2,10 +2,14 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.utils import timezone
+from datetime import timedelta
 from common.permissions import IsOwnerOrAdmin
+from apps.atlas.serializers import ParkingSpotSerializer
 from .models import Booking
 from .serializers import (
-    BookingSerializer, BookingCreateSerializer, BookingListSerializer
+    BookingSerializer, BookingCreateSerializer, BookingListSerializer,
+    SpotCandidatesQuerySerializer
 )
 from . import services
 
@@ -101,6 +105,32 @@ class BookingViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(updated_booking)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def candidates(self, request):
+        """
+        List the top-N spots that would be assigned for a time window.
+        
+        Query params: facility_id, duration_hours, start_time, limit
+        """
+        params = SpotCandidatesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        
+        start_time = params.validated_data.get('start_time') or timezone.now()
+        end_time = start_time + timedelta(hours=params.validated_data['duration_hours'])
+        
+        spots = services.find_available_spots(
+            params.validated_data['facility_id'],
+            start_time,
+            end_time,
+            limit=params.validated_data['limit']
+        )
+        serializer = ParkingSpotSerializer(spots, many=True)
+        return Response({
+            'start_time': start_time,
+            'end_time': end_time,
+            'candidates': serializer.data
+        })
+    
     @action(detail=False, methods=['get'])
     def my_bookings(self, request):
         """Get current user's bookings."""
@@ -0,0 +1,173 @@
+"""
+Barrier simulator for offline gate validation.
+
+Acts like a QR boom barrier bound to a facility: syncs the booking
+manifest from the backend, validates scanned tokens locally (digest +
+time window, no network), polls for delta updates and uploads its entry
+log in batches. Reports per-scan latency.
+
+Usage:
+    python barrier_simulator.py --device BARRIER-36-ENTRY \\
+        --username demo --password demo123 --bookings 5 --scans 10000
+"""
+
+import argparse
+import base64
+import hashlib
+import statistics
+import struct
+import time
+from datetime import datetime, timezone
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+TOKEN_PREFIX = "PH1"
+PAYLOAD_FORMAT = ">QQII"
+
+
+class OfflineBarrier:
+    """Local manifest store and validator, as firmware would run it."""
+
+    def __init__(self, base_url, device_code, hours=6):
+        self.base_url = base_url
+        self.device_code = device_code
+        self.hours = hours
+        self.version = None
+        self.facility_id = None
+        self.bookings = {}
+        self.entry_log = []
+
+    def sync(self):
+        """Fetch a full manifest, or a delta once a version is known."""
+        params = {'device_code': self.device_code, 'hours': self.hours}
+        if self.version is not None:
+            params['since'] = self.version
+
+        started = time.perf_counter()
+        response = requests.get(f"{self.base_url}/api/lockbox/barrier/manifest/", params=params)
+        response.raise_for_status()
+        manifest = response.json()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if manifest['full']:
+            self.bookings = {}
+        for booking_id, start, end, digest in manifest['bookings']:
+            self.bookings[booking_id] = (start, end, digest)
+        for booking_id in manifest['removed']:
+            self.bookings.pop(booking_id, None)
+
+        self.version = manifest['version']
+        self.facility_id = manifest['facility_id']
+        kind = "full" if manifest['full'] else "delta"
+        print(f"🔄 {kind} sync: {len(manifest['bookings'])} upserts, "
+              f"{len(manifest['removed'])} removals, {len(self.bookings)} valid "
+              f"(v{self.version}, {elapsed_ms:.1f} ms, {len(response.content)} bytes)")
+
+    def validate(self, token):
+        """Validate a scanned token against the local manifest only."""
+        granted, booking_id = False, None
+        try:
+            prefix, payload_text, _ = token.split('.')
+            payload = base64.urlsafe_b64decode(payload_text + '=' * (-len(payload_text) % 4))
+            booking_id, facility_id, _, _ = struct.unpack(PAYLOAD_FORMAT, payload)
+            entry = self.bookings.get(booking_id)
+            if prefix == TOKEN_PREFIX and entry and facility_id == self.facility_id:
+                start, end, digest = entry
+                now = time.time()
+                granted = (
+                    start <= now <= end and
+                    hashlib.sha256(token.encode()).hexdigest()[:16] == digest
+                )
+        except (ValueError, struct.error):
+            pass
+
+        self.entry_log.append({
+            'booking_id': booking_id,
+            'scanned_at': datetime.now(timezone.utc).isoformat(),
+            'granted': granted,
+        })
+        return granted
+
+    def upload_entries(self, batch_size=1000):
+        """Upload the entry log in batches."""
+        uploaded = 0
+        while self.entry_log:
+            batch, self.entry_log = self.entry_log[:batch_size], self.entry_log[batch_size:]
+            response = requests.post(
+                f"{self.base_url}/api/lockbox/barrier/entries/",
+                json={'device_code': self.device_code, 'entries': batch}
+            )
+            response.raise_for_status()
+            uploaded += response.json()['stored']
+        print(f"📤 Uploaded {uploaded} entry log record(s)")
+
+
+def login(base_url, username, password):
+    response = requests.post(
+        f"{base_url}/api/auth/login/",
+        json={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return {'Authorization': f"Token {response.json()['token']}"}
+
+
+def book_and_fetch_tokens(base_url, headers, facility_id, count):
+    """Create bookings at the barrier's facility and fetch their QR tokens."""
+    tokens = []
+    for _ in range(count):
+        response = requests.post(
+            f"{base_url}/api/mobile/bookings/",
+            headers=headers,
+            json={"facility_id": facility_id, "duration_hours": 1.0}
+        )
+        if response.status_code != 201:
+            print(f"⚠️  Booking failed: {response.text}")
+            break
+        booking_id = response.json()['id']
+        qr = requests.get(f"{base_url}/api/lockbox/qr/{booking_id}/", headers=headers)
+        qr.raise_for_status()
+        tokens.append(qr.json()['payload'])
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate an offline QR barrier")
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--device', required=True, help="Barrier device code")
+    parser.add_argument('--username', default='demo')
+    parser.add_argument('--password', default='demo123')
+    parser.add_argument('--bookings', type=int, default=5)
+    parser.add_argument('--scans', type=int, default=10000)
+    args = parser.parse_args()
+
+    barrier = OfflineBarrier(args.base_url, args.device)
+    barrier.sync()
+
+    headers = login(args.base_url, args.username, args.password)
+    tokens = book_and_fetch_tokens(args.base_url, headers, barrier.facility_id, args.bookings)
+    print(f"🎫 Created {len(tokens)} booking(s) at facility {barrier.facility_id}")
+
+    barrier.sync()  # delta picks up the new bookings
+
+    forged = tokens[0][:-4] + 'AAAA' if tokens else 'PH1.invalid.token'
+    samples = tokens + [forged]
+    latencies = []
+    granted = 0
+    for i in range(args.scans):
+        token = samples[i % len(samples)]
+        started = time.perf_counter()
+        granted += barrier.validate(token)
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+
+    latencies.sort()
+    print(f"\n📊 {args.scans} local scans, {granted} granted")
+    print(f"   mean {statistics.mean(latencies):.1f} µs, "
+          f"p50 {latencies[len(latencies) // 2]:.1f} µs, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} µs")
+
+    barrier.upload_entries()
+
+
+if __name__ == '__main__':
+    main()
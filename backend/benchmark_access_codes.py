@@ -0,0 +1,112 @@
+"""
+Benchmark access code generation with a large bookings table.
+
+Compares the legacy approach (random code + EXISTS lookup per attempt)
+with the lookup-free keyed permutation generator, on a throwaway
+in-memory database pre-filled with existing bookings.
+
+Usage:
+    uv run python benchmark_access_codes.py [--existing 1000000] [--codes 50000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+# Setup Django environment against an in-memory database
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parkhero.settings')
+
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES['default']['NAME'] = ':memory:'
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from apps.atlas.models import Facility, Floor, ParkingSpot  # noqa: E402
+from apps.orbit.models import Booking  # noqa: E402
+from apps.orbit.access_codes import AccessCodeGenerator  # noqa: E402
+
+
+def seed_bookings(count):
+    """Insert `count` bookings with random legacy codes via raw SQL."""
+    user = User.objects.create_user('bench')
+    facility = Facility.objects.create(name='Bench', type='lot', address='-')
+    floor = Floor.objects.create(facility=facility, label='G')
+    spot = ParkingSpot.objects.create(floor=floor, code='B-1', x=0, y=0)
+
+    alphabet = string.ascii_uppercase + string.digits
+    now = timezone.now()
+    codes = set()
+    while len(codes) < count:
+        codes.add(''.join(random.choices(alphabet, k=6)))
+
+    rows = (
+        (user.id, spot.id, now, now + timedelta(hours=1), 'completed', code, now, now)
+        for code in codes
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {Booking._meta.db_table} "
+            "(user_id, spot_id, start_time, end_time, status, access_code, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+
+
+def legacy_generate(length=6):
+    """Pre-optimization generator: random code + lookup per attempt."""
+    while True:
+        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+        if not Booking.objects.filter(access_code=code).exists():
+            return code
+
+
+def measure(label, generate, count):
+    started = time.perf_counter()
+    codes = [generate() for _ in range(count)]
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {count / elapsed:>12,.0f} codes/s  ({elapsed:.2f}s)")
+    return codes
+
+
+def count_collisions(codes, chunk=900):
+    """Codes that already exist in the table (retried on insert)."""
+    return sum(
+        Booking.objects.filter(access_code__in=codes[i:i + chunk]).count()
+        for i in range(0, len(codes), chunk)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--existing', type=int, default=1_000_000)
+    parser.add_argument('--codes', type=int, default=50_000)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    print(f"⏳ Seeding {args.existing:,} existing bookings...")
+    seed_bookings(args.existing)
+    print(f"✅ {Booking.objects.count():,} bookings in table\n")
+
+    print(f"📊 Generating {args.codes:,} codes")
+    measure("legacy (random + EXISTS)", legacy_generate, args.codes)
+    generator = AccessCodeGenerator()
+    codes = measure("keyed permutation", generator.next_code, args.codes)
+
+    assert len(set(codes)) == len(codes), "duplicate codes generated"
+    print(f"\n  keyed permutation: 0 duplicates, "
+          f"{count_collisions(codes)} collision(s) with existing legacy codes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Publish/subscribe broker for realtime pushes.
+
+Publishers are ordinary (sync) Django code running in any thread;
+subscribers are asyncio consumers (SSE responses, websockets). Payloads are
+pre-encoded strings, so one publish is serialized once however many
+subscribers receive it.
+
+The backend is pluggable through settings.REALTIME_BROKER. The default
+InProcessBroker only reaches subscribers in the same process; a
+cross-process backend (e.g. Redis pub/sub) would subclass it, send
+publishes to the shared bus and call fanout() for messages it receives.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Sent in place of dropped messages when a subscriber falls behind;
+# clients should re-fetch a snapshot when they see it.
+RESYNC_PAYLOAD = '{"type":"resync"}'
+
+
+class Subscription:
+    """A consumer's bounded inbox for one or more topics."""
+    
+    def __init__(self, broker, topics, loop, maxsize):
+        self.broker = broker
+        self.topics = tuple(topics)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+    
+    def offer(self, payload):
+        """Enqueue a payload; called on the subscriber's event loop."""
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_PAYLOAD)
+    
+    async def get(self):
+        return await self.queue.get()
+    
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan out published payloads to subscribers in this process."""
+    
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._topics = defaultdict(set)
+        self._lock = threading.Lock()
+    
+    def subscribe(self, topics):
+        """
+        Subscribe the running event loop to topics.
+        
+        Args:
+            topics: Iterable of topic names
+            
+        Returns:
+            Subscription; close() it when the consumer goes away
+        """
+        subscription = Subscription(
+            self, topics, asyncio.get_running_loop(), self.queue_size
+        )
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics[topic].add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+    
+    def has_subscribers(self, topic=None):
+        """Whether topic (or, without a topic, any topic) has local subscribers."""
+        if topic is None:
+            return bool(self._topics)
+        return topic in self._topics
+    
+    def publish(self, topic, payload):
+        self.fanout(topic, payload)
+    
+    def fanout(self, topic, payload):
+        """
+        Deliver payload to local subscribers of topic.
+        One loop callback per event loop, not per subscriber.
+        """
+        with self._lock:
+            subscribers = tuple(self._topics.get(topic, ()))
+        if not subscribers:
+            return
+        
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, targets in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, targets, payload)
+            except RuntimeError:
+                # Loop already closed; its subscribers are gone
+                for subscription in targets:
+                    self.unsubscribe(subscription)
+
+
+def _deliver(subscriptions, payload):
+    for subscription in subscriptions:
+        subscription.offer(payload)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Process-wide broker configured by settings.REALTIME_BROKER."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = import_string(
+                    getattr(settings, 'REALTIME_BROKER', 'common.broker.InProcessBroker')
+                )
+                _broker = backend(
+                    queue_size=getattr(settings, 'REALTIME_QUEUE_SIZE', 100)
+                )
+    return _broker
@@ -0,0 +1,64 @@
+"""
+Conditional GET (ETag / Last-Modified) for DRF views.
+
+Wrap a view method with @conditional_get(validator). The validator is a
+cheap function (typically one aggregate query over updated_at / version
+columns) returning (version_token, last_modified) or None. If the
+request's If-None-Match / If-Modified-Since still match, a 304 is
+returned before the view's queryset and serializer ever run.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _etag(request, token):
+    # The representation also depends on the query string (filters, pages,
+    # since=) and the negotiated renderer (JSON, columnar, msgpack).
+    material = f'{token}|{request.get_full_path()}|{request.accepted_media_type}'
+    return '"%s"' % hashlib.sha1(material.encode()).hexdigest()[:24]
+
+
+def conditional_get(validator):
+    """
+    Decorate a viewset method with ETag/Last-Modified handling.
+    
+    Args:
+        validator: Callable (view, request, *args, **kwargs) returning
+            (version_token, last_modified datetime or None), or None to
+            skip conditional handling (e.g. object not found)
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            validators = validator(self, request, *args, **kwargs)
+            if validators is None:
+                return method(self, request, *args, **kwargs)
+            
+            token, last_modified = validators
+            etag = _etag(request, token)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            
+            conditional = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if conditional is not None and conditional.status_code != status.HTTP_304_NOT_MODIFIED:
+                return conditional  # 412 for failed If-Match preconditions
+            if conditional is not None:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            if not response.has_header('Cache-Control'):
+                response['Cache-Control'] = 'no-cache'
+            patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapper
+    return decorator
@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -26,3 +29,19 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         
         # Check if object has a user field and if it matches the request user
         return hasattr(obj, 'user') and obj.user == request.user
+
+
+class IsDeviceOrAdmin(permissions.BasePermission):
+    """
+    Allow admins, and device traffic (sensors, gateways) identified by the
+    shared X-Device-Key header. Fails closed: without a configured
+    DEVICE_INGEST_KEY only admins are allowed.
+    """
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        
+        expected = getattr(settings, 'DEVICE_INGEST_KEY', '')
+        if not expected:
+            return False
+        return hmac.compare_digest(request.headers.get('X-Device-Key', ''), expected)
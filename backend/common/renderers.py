@@ -0,0 +1,42 @@
+"""
+Extra DRF renderers for compact payloads.
+
+ColumnarJSONRenderer is plain JSON selected with ?format=columnar; views
+that support it check request.accepted_renderer.format and switch to a
+columnar representation. MessagePackRenderer (Accept: application/x-msgpack
+or ?format=msgpack) is only available when the optional msgpack package
+is installed.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    format = 'columnar'
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True, default=str)
+
+
+# Formats whose views should emit the columnar representation
+COLUMNAR_FORMATS = ('columnar', 'msgpack')
+
+COLUMNAR_RENDERER_CLASSES = [ColumnarJSONRenderer]
+if msgpack is not None:
+    COLUMNAR_RENDERER_CLASSES.append(MessagePackRenderer)
+
+COMPACT_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + COLUMNAR_RENDERER_CLASSES
@@ -0,0 +1,138 @@
+"""
+Shared response cache for read-heavy DRF views.
+
+Wrap a view method with @cached_response(scopes). Entries are keyed by
+the request (host, path and query string, negotiated media type) and the
+current version of every scope the response depends on, e.g.
+'facility:12'. Writers never delete entries: invalidate_scopes() bumps
+the scope versions, so all dependent keys change at once and old entries
+simply age out. Version keys and entries live in the cache named by
+settings.RESPONSE_CACHE_ALIAS, so pointing that alias at a shared backend
+(Redis, Memcached) shares hits and invalidations across processes.
+
+Cached entries keep the ETag/Last-Modified set by @conditional_get, so
+revalidations are answered from the cache as well. Stack the decorator
+outside conditional_get.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+FACILITY_LIST_SCOPE = 'facilities'
+
+# Headers replayed from a cached entry
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def facility_scope(facility_id):
+    return f'facility:{facility_id}'
+
+
+def floor_scope(floor_id):
+    return f'floor:{floor_id}'
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(scope):
+    return f'response-cache:v:{scope}'
+
+
+def _initial_version():
+    # Never reuse a version after a version key was evicted
+    return time.time_ns()
+
+
+def get_scope_versions(scopes):
+    """Current version of each scope, creating missing ones."""
+    cache = _cache()
+    keys = {_version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, _initial_version(), None)
+        versions[key] = cache.get(key)
+    return [versions[_version_key(scope)] for scope in scopes]
+
+
+def invalidate_scopes(*scopes):
+    """
+    Bump scope versions so every cached response depending on them
+    misses. Call after commit, or a concurrent reader could cache the
+    uncommitted state under the new version.
+    """
+    cache = _cache()
+    for scope in set(scopes):
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), _initial_version(), None)
+
+
+def _response_key(request, scopes, versions):
+    material = '|'.join([
+        request.get_host(),
+        request.get_full_path(),
+        request.accepted_media_type or '',
+        *(f'{scope}={version}' for scope, version in zip(scopes, versions)),
+    ])
+    return 'response-cache:r:' + hashlib.sha1(material.encode()).hexdigest()
+
+
+def cached_response(scopes):
+    """
+    Decorate a viewset method with a versioned response cache.
+
+    Args:
+        scopes: Callable (view, request, *args, **kwargs) returning the list
+            of scopes the response depends on, or None to bypass the cache
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            response_scopes = scopes(self, request, *args, **kwargs)
+            if response_scopes is None:
+                return method(self, request, *args, **kwargs)
+
+            cache = _cache()
+            versions = get_scope_versions(response_scopes)
+            key = _response_key(request, response_scopes, versions)
+
+            entry = cache.get(key)
+            if entry is not None:
+                data, headers = entry
+                conditional = get_conditional_response(
+                    request,
+                    etag=headers.get('ETag'),
+                    last_modified=parse_http_date_safe(headers.get('Last-Modified', ''))
+                )
+                if conditional is not None and conditional.status_code != status.HTTP_304_NOT_MODIFIED:
+                    return conditional  # 412 for failed If-Match preconditions
+                if conditional is not None:
+                    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                else:
+                    response = Response(data)
+                for header, value in headers.items():
+                    response[header] = value
+                response['X-Cache'] = 'hit'
+                return response
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                headers = {
+                    header: response[header]
+                    for header in CACHED_HEADERS if response.has_header(header)
+                }
+                cache.set(key, (response.data, headers), settings.RESPONSE_CACHE_TIMEOUT)
+                response['X-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
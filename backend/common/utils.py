@@ -1,20 +1,28 @@
 import qrcode
+import qrcode.image.svg
 from io import BytesIO
 from base64 import b64encode
+from collections import OrderedDict
 from datetime import datetime
+from pathlib import Path
+import hashlib
 import math
+import os
+import tempfile
+import threading
+import time
 
+from django.conf import settings
 
-def generate_qr_code(data):
-    """
-    Generate a QR code from the given data and return as base64 string.
-    
-    Args:
-        data: String data to encode in QR code
-        
-    Returns:
-        Base64 encoded PNG image string
-    """
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def _render_qr(data, fmt):
+    """Render a QR code for data as PNG or SVG bytes."""
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -24,12 +32,192 @@ def generate_qr_code(data):
     qr.add_data(data)
     qr.make(fit=True)
     
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
+    if fmt == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        buffer = BytesIO()
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        buffer = BytesIO()
+        img.save(buffer, format='PNG')
+    
+    return buffer.getvalue()
+
+
+class QRImageCache:
+    """
+    Rendered QR images keyed by payload hash.
+    
+    A bounded in-process LRU sits in front of an optional on-disk store,
+    so each payload is rendered once and survives process restarts.
+    The disk store is pruned at most every prune_interval seconds, on
+    write: files unused for max_age seconds are removed, then the least
+    recently used ones beyond max_files.
+    """
+    
+    def __init__(self, max_entries=1024, directory=None, max_files=None,
+                 max_age=None, prune_interval=3600):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.max_files = max_files
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_prune = None
+    
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data.encode()).hexdigest()
+    
+    def get(self, data, fmt='png'):
+        """
+        Rendered image for data, rendering and storing it on a miss.
+        
+        Args:
+            data: String data encoded in the QR code
+            fmt: 'png' or 'svg'
+            
+        Returns:
+            (image_bytes, digest) tuple
+        """
+        if fmt not in QR_CONTENT_TYPES:
+            raise ValueError(f"Unsupported QR format: {fmt}")
+        
+        digest = self.digest(data)
+        key = (digest, fmt)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                return image, digest
+        
+        image = self._read(digest, fmt)
+        if image is None:
+            image = _render_qr(data, fmt)
+            self._write(digest, fmt, image)
+        
+        with self._lock:
+            self._entries[key] = image
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return image, digest
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def _path(self, digest, fmt):
+        return self.directory / digest[:2] / f"{digest}.{fmt}"
+    
+    def _read(self, digest, fmt):
+        if self.directory is None:
+            return None
+        path = self._path(digest, fmt)
+        try:
+            image = path.read_bytes()
+            # mtime doubles as the last-use time for pruning
+            os.utime(path)
+            return image
+        except OSError:
+            return None
     
-    return b64encode(buffer.getvalue()).decode()
+    def _write(self, digest, fmt, image):
+        if self.directory is None:
+            return
+        path = self._path(digest, fmt)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(image)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+        
+        with self._lock:
+            due = (
+                self._last_prune is None or
+                time.monotonic() - self._last_prune >= self.prune_interval
+            )
+            if due:
+                self._last_prune = time.monotonic()
+        if due:
+            self.prune()
+    
+    def prune(self):
+        """
+        Remove disk entries older than max_age, then the least recently
+        used ones beyond max_files.
+        
+        Returns:
+            Number of files removed
+        """
+        if self.directory is None or (self.max_files is None and self.max_age is None):
+            return 0
+        
+        files = []
+        for path in self.directory.glob('*/*.*'):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        files.sort()
+        
+        expired = 0
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            while expired < len(files) and files[expired][0] < cutoff:
+                expired += 1
+        excess = len(files) - expired - self.max_files if self.max_files is not None else 0
+        
+        removed = 0
+        for _, path in files[:expired + max(excess, 0)]:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+qr_image_cache = QRImageCache(
+    max_entries=getattr(settings, 'QR_CACHE_SIZE', 1024),
+    directory=getattr(settings, 'QR_CACHE_DIR', None),
+    max_files=getattr(settings, 'QR_CACHE_MAX_FILES', None),
+    max_age=getattr(settings, 'QR_CACHE_MAX_AGE', None),
+)
+
+
+def get_qr_image(data, fmt='png'):
+    """
+    Cached QR image for the given data.
+    
+    Args:
+        data: String data to encode in QR code
+        fmt: 'png' or 'svg'
+        
+    Returns:
+        (image_bytes, digest) tuple; the digest identifies the payload
+    """
+    return qr_image_cache.get(data, fmt)
+
+
+def generate_qr_code(data):
+    """
+    Generate a QR code from the given data and return as base64 string.
+    Rendering is cached per payload, see QRImageCache.
+    
+    Args:
+        data: String data to encode in QR code
+        
+    Returns:
+        Base64 encoded PNG image string
+    """
+    image, _ = get_qr_image(data, 'png')
+    return b64encode(image).decode()
 
 
 def calculate_distance(x1, y1, x2, y2):
@@ -13,4 +13,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parkhero.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from apps.frontier_api.streams import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Django for HTTP; spot status websockets at /ws/spots/."""
+    if scope['type'] == 'websocket':
+        if scope['path'].rstrip('/') == '/ws/spots':
+            await websocket_application(scope, receive, send)
+        else:
+            await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await django_application(scope, receive, send)
+
+# Periodic booking expiry (no-op unless BOOKING_EXPIRY_INTERVAL is set)
+from apps.orbit.scheduler import start_expiry_runner  # noqa: E402
+
+start_expiry_runner()
+
+# Bulk heartbeat writes (no-op unless HEARTBEAT_FLUSH_INTERVAL is set)
+from apps.atlas.heartbeats import start_heartbeat_flusher  # noqa: E402
+
+start_heartbeat_flusher()
@@ -91,6 +91,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN and wait for it, so concurrent
+            # bookings queue up instead of failing with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # File-backed test database so threaded tests share real locking
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -140,6 +150,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered QR images, cached per payload (in-process LRU + on disk)
+QR_CACHE_SIZE = 1024
+QR_CACHE_DIR = MEDIA_ROOT / 'qr_cache'
+# Disk store bounds: files unused for QR_CACHE_MAX_AGE seconds are pruned,
+# then the least recently used beyond QR_CACHE_MAX_FILES
+QR_CACHE_MAX_FILES = 20000
+QR_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
 # CORS settings for frontend integration
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -166,3 +184,39 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
+
+# Booking expiry sweeper: seconds between in-process sweeps run by the
+# web server (None disables; use `manage.py expire_bookings` from cron).
+# Every worker that loads wsgi/asgi starts its own sweeper, so enable it in
+# the deployment settings of a single worker only.
+BOOKING_EXPIRY_INTERVAL = None
+BOOKING_EXPIRY_BATCH_SIZE = 500
+
+# Cached mobile read responses (facility list/detail, floor maps), invalidated
+# through per-facility/per-floor version keys. Point RESPONSE_CACHE_ALIAS at a
+# shared CACHES entry (Redis, Memcached) to share entries across processes;
+# the timeout only bounds how long unused entries linger.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Realtime spot deltas (SSE/websocket). The in-process broker only reaches
+# subscribers in the same ASGI process; swap in a shared backend to scale out.
+REALTIME_BROKER = 'common.broker.InProcessBroker'
+REALTIME_QUEUE_SIZE = 100
+
+# Shared key sensors/gateways send as X-Device-Key; while empty, device
+# endpoints (sensor events, heartbeats) only accept admin users
+DEVICE_INGEST_KEY = ''
+
+# Device heartbeats are buffered in memory and written to Device.last_seen_at
+# in bulk as soon as HEARTBEAT_BUFFER_MAX devices are pending or the oldest
+# has waited HEARTBEAT_MAX_DELAY seconds. Setting HEARTBEAT_FLUSH_INTERVAL
+# also starts a per-process flusher thread (off by default, like the expiry
+# sweeper).
+HEARTBEAT_FLUSH_INTERVAL = None
+HEARTBEAT_BUFFER_MAX = 10000
+HEARTBEAT_MAX_DELAY = 30
+
+# A sensor that has not been heard from in this many seconds is stale and
+# stops counting towards spot and facility confidence.
+SENSOR_FRESHNESS_SECONDS = 300
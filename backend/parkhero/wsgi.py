@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parkhero.settings')
 
 application = get_wsgi_application()
+
+# Periodic booking expiry (no-op unless BOOKING_EXPIRY_INTERVAL is set)
+from apps.orbit.scheduler import start_expiry_runner  # noqa: E402
+
+start_expiry_runner()
+
+# Bulk heartbeat writes (no-op unless HEARTBEAT_FLUSH_INTERVAL is set)
+from apps.atlas.heartbeats import start_heartbeat_flusher  # noqa: E402
+
+start_heartbeat_flusher()
@@ -20,6 +20,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parkhero.settings')
 django.setup()
 
 from apps.atlas.models import Facility, Floor, ParkingSpot, Device
+from apps.atlas import services as atlas_services
 from django.contrib.auth.models import User
 
 
@@ -122,29 +123,32 @@ def create_government_parking_lots():
         two_wheeler_count = int(row['No. of 2 wheeler parking']) if pd.notna(row['No. of 2 wheeler parking']) else 0
         four_wheeler_count = int(row['No. of 4 wheeler parking']) if pd.notna(row['No. of 4 wheeler parking']) else 0
         
+        spots = []
+        
         # Create 2-wheeler spots
         for i in range(min(two_wheeler_count, 50)):  # Limit for demo
-            ParkingSpot.objects.create(
-                floor=floor,
+            spots.append(ParkingSpot(
                 code=f"2W-{i+1:03d}",
                 x=random.uniform(10, 90),
                 y=random.uniform(10, 90),
                 status=random.choice(['available', 'available', 'available', 'occupied']),
                 verified=True,
                 distance_from_entry=random.randint(5, 100)
-            )
+            ))
         
         # Create 4-wheeler spots
         for i in range(min(four_wheeler_count, 50)):  # Limit for demo
-            ParkingSpot.objects.create(
-                floor=floor,
+            spots.append(ParkingSpot(
                 code=f"4W-{i+1:03d}",
                 x=random.uniform(10, 90),
                 y=random.uniform(10, 90),
                 status=random.choice(['available', 'available', 'occupied']),
                 verified=True,
                 distance_from_entry=random.randint(5, 100)
-            )
+            ))
+        
+        # Bulk import keeps floor/facility counters in sync
+        atlas_services.bulk_create_spots(floor, spots)
         
         facilities.append(facility)
         print(f"  ✓ {facility.name} - {two_wheeler_count} 2W + {four_wheeler_count} 4W spots")
@@ -0,0 +1,25 @@
+import os
+
+# Backend the gateway forwards status changes to
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+EVENTS_PATH = "/api/atlas/devices/events/"
+HEARTBEATS_PATH = "/api/atlas/devices/heartbeats/"
+DEVICE_INGEST_KEY = os.getenv("DEVICE_INGEST_KEY", "")
+
+# Listeners
+HOST = os.getenv("GATEWAY_HOST", "0.0.0.0")
+UDP_PORT = int(os.getenv("GATEWAY_UDP_PORT", "9500"))
+TCP_PORT = int(os.getenv("GATEWAY_TCP_PORT", "9501"))
+
+# Forwarding: flush changed spots every FLUSH_INTERVAL seconds,
+# at most MAX_BATCH events per request (backend limit is 5000)
+FLUSH_INTERVAL = float(os.getenv("GATEWAY_FLUSH_INTERVAL", "1.0"))
+MAX_BATCH = int(os.getenv("GATEWAY_MAX_BATCH", "5000"))
+REQUEST_TIMEOUT = float(os.getenv("GATEWAY_REQUEST_TIMEOUT", "10"))
+
+# Seconds between batched heartbeats for every sensor heard from, so the
+# backend sees sensors whose status did not change as alive (0 disables)
+HEARTBEAT_INTERVAL = float(os.getenv("GATEWAY_HEARTBEAT_INTERVAL", "30"))
+
+# Seconds between stats log lines (0 disables)
+STATS_INTERVAL = float(os.getenv("GATEWAY_STATS_INTERVAL", "10"))
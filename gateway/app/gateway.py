@@ -0,0 +1,234 @@
+"""
+Sensor gateway: UDP/TCP listeners feeding the spot state table, a
+forwarder that posts batched status changes to the backend, and a
+heartbeat forwarder that reports every sensor heard from in batches.
+
+Wire format (UDP datagram or TCP line), one JSON object per line:
+    {"device_code": "SN-101", "status": "occupied", "ts": 1760000000.25}
+status may also be the numeric code (0 available, 1 occupied); ts is the
+sensor's epoch timestamp and defaults to the time of receipt. Readings
+whose ts is not finite or more than MAX_CLOCK_SKEW seconds away from the
+time of receipt are malformed.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from .state import STATUS_CODES, STATUS_NAMES, SpotStateTable
+
+logger = logging.getLogger(__name__)
+
+# Furthest a sensor timestamp may be from the time of receipt, in seconds
+MAX_CLOCK_SKEW = 86400
+
+
+@dataclass
+class GatewayStats:
+    received: int = 0
+    malformed: int = 0
+    changes: int = 0
+    forwarded: int = 0
+    batches: int = 0
+    heartbeats: int = 0
+    failures: int = 0
+    lag_total: float = 0.0
+    lag_max: float = 0.0
+
+    def snapshot(self):
+        return dict(self.__dict__)
+
+
+class Gateway:
+    def __init__(self, backend_url, events_path, heartbeats_path=None, ingest_key="",
+                 max_batch=5000, request_timeout=10.0):
+        self.table = SpotStateTable()
+        self.stats = GatewayStats()
+        self.url = backend_url.rstrip("/") + events_path
+        self.heartbeats_url = heartbeats_path and backend_url.rstrip("/") + heartbeats_path
+        self.ingest_key = ingest_key
+        self.max_batch = max_batch
+        self.request_timeout = request_timeout
+        self._flush_lock = asyncio.Lock()
+        self._heartbeat_lock = asyncio.Lock()
+
+    # Ingest
+
+    def handle_line(self, line):
+        """Parse one message and apply it to the state table."""
+        self.stats.received += 1
+        try:
+            message = json.loads(line)
+            device_code = message["device_code"]
+            status = message["status"]
+            status_code = STATUS_CODES[status] if isinstance(status, str) else int(status)
+            if status_code not in STATUS_NAMES:
+                raise ValueError(status)
+            received_at = time.time()
+            observed_at = float(message.get("ts") or received_at)
+            if not math.isfinite(observed_at) or abs(observed_at - received_at) > MAX_CLOCK_SKEW:
+                raise ValueError(observed_at)
+        except (ValueError, KeyError, TypeError):
+            self.stats.malformed += 1
+            return
+        if self.table.observe(device_code, status_code, observed_at):
+            self.stats.changes += 1
+
+    def handle_datagram(self, data):
+        for line in data.splitlines():
+            if line.strip():
+                self.handle_line(line)
+
+    async def handle_stream(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    self.handle_line(line)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # Forwarding
+
+    def _post(self, events):
+        self._post_json(self.url, {
+            "events": [
+                {
+                    "device_code": device_code,
+                    "status": status,
+                    "observed_at": datetime.fromtimestamp(observed_at, timezone.utc).isoformat(),
+                }
+                for _, device_code, status, observed_at in events
+            ]
+        })
+
+    def _post_heartbeats(self, devices):
+        self._post_json(self.heartbeats_url, {
+            "device_codes": [device_code for _, device_code in devices]
+        })
+
+    def _post_json(self, url, payload):
+        body = json.dumps(payload).encode()
+        request = urllib.request.Request(url, data=body, method="POST")
+        request.add_header("Content-Type", "application/json")
+        if self.ingest_key:
+            request.add_header("X-Device-Key", self.ingest_key)
+        with urllib.request.urlopen(request, timeout=self.request_timeout) as response:
+            response.read()
+
+    async def flush(self):
+        """Forward all pending changes in batches of at most max_batch."""
+        async with self._flush_lock:
+            while self.table.dirty:
+                events = self.table.drain(self.max_batch)
+                try:
+                    await asyncio.to_thread(self._post, events)
+                except (urllib.error.URLError, OSError) as exc:
+                    self.table.requeue(slot for slot, *_ in events)
+                    self.stats.failures += 1
+                    logger.warning("Forward of %d events failed: %s", len(events), exc)
+                    return
+                except Exception:
+                    self.table.requeue(slot for slot, *_ in events)
+                    raise
+
+                now = time.time()
+                lags = [now - observed_at for *_, observed_at in events]
+                self.stats.batches += 1
+                self.stats.forwarded += len(events)
+                self.stats.lag_total += sum(lags)
+                self.stats.lag_max = max(self.stats.lag_max, max(lags))
+
+    async def flush_heartbeats(self):
+        """Report every sensor heard from since the last call, in batches."""
+        async with self._heartbeat_lock:
+            while self.table.alive:
+                devices = self.table.drain_seen(self.max_batch)
+                try:
+                    await asyncio.to_thread(self._post_heartbeats, devices)
+                except (urllib.error.URLError, OSError) as exc:
+                    self.table.requeue_seen(slot for slot, _ in devices)
+                    self.stats.failures += 1
+                    logger.warning("Forward of %d heartbeats failed: %s", len(devices), exc)
+                    return
+                except Exception:
+                    self.table.requeue_seen(slot for slot, _ in devices)
+                    raise
+                self.stats.heartbeats += len(devices)
+
+    async def forward_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Forward failed")
+
+    async def heartbeat_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_heartbeats()
+            except Exception:
+                logger.exception("Heartbeat forward failed")
+
+    async def log_stats_forever(self, interval):
+        previous = self.stats.snapshot()
+        while True:
+            await asyncio.sleep(interval)
+            current = self.stats.snapshot()
+            forwarded = current["forwarded"] - previous["forwarded"]
+            lag_total = current["lag_total"] - previous["lag_total"]
+            logger.info(
+                "%d sensors | %.0f msg/s | %.0f changes/s | %.0f fwd/s | %.0f heartbeats/s | mean lag %.0f ms | "
+                "%d malformed | %d failed batches",
+                len(self.table),
+                (current["received"] - previous["received"]) / interval,
+                (current["changes"] - previous["changes"]) / interval,
+                forwarded / interval,
+                (current["heartbeats"] - previous["heartbeats"]) / interval,
+                lag_total / forwarded * 1000 if forwarded else 0.0,
+                current["malformed"],
+                current["failures"],
+            )
+            previous = current
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def datagram_received(self, data, addr):
+        self.gateway.handle_datagram(data)
+
+
+async def serve(gateway, host, udp_port, tcp_port, flush_interval, stats_interval=0,
+                heartbeat_interval=0):
+    """Run the listeners and forwarder until cancelled."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _DatagramProtocol(gateway), local_addr=(host, udp_port)
+    )
+    server = await asyncio.start_server(gateway.handle_stream, host, tcp_port)
+    logger.info("Listening on udp://%s:%d and tcp://%s:%d, forwarding to %s",
+                host, udp_port, host, tcp_port, gateway.url)
+
+    tasks = [asyncio.create_task(gateway.forward_forever(flush_interval))]
+    if heartbeat_interval and gateway.heartbeats_url:
+        tasks.append(asyncio.create_task(gateway.heartbeat_forever(heartbeat_interval)))
+    if stats_interval:
+        tasks.append(asyncio.create_task(gateway.log_stats_forever(stats_interval)))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        transport.close()
+        await gateway.flush()
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import logging
+
+from . import config
+from .gateway import Gateway, serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ParkHero sensor gateway")
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--udp-port", type=int, default=config.UDP_PORT)
+    parser.add_argument("--tcp-port", type=int, default=config.TCP_PORT)
+    parser.add_argument("--backend-url", default=config.BACKEND_URL)
+    parser.add_argument("--flush-interval", type=float, default=config.FLUSH_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    gateway = Gateway(
+        args.backend_url,
+        config.EVENTS_PATH,
+        heartbeats_path=config.HEARTBEATS_PATH,
+        ingest_key=config.DEVICE_INGEST_KEY,
+        max_batch=config.MAX_BATCH,
+        request_timeout=config.REQUEST_TIMEOUT,
+    )
+    try:
+        asyncio.run(serve(
+            gateway, args.host, args.udp_port, args.tcp_port,
+            args.flush_interval, config.STATS_INTERVAL, config.HEARTBEAT_INTERVAL,
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+In-memory spot state table.
+
+One slot per sensor, backed by flat arrays instead of per-device objects,
+so hundreds of thousands of sensors fit in a few MB and a heartbeat is a
+dict lookup plus two array writes.
+"""
+from array import array
+
+STATUS_CODES = {"available": 0, "occupied": 1}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNKNOWN = 255
+
+
+class SpotStateTable:
+    def __init__(self):
+        self.slots = {}                 # device_code -> slot index
+        self.device_codes = []          # slot index -> device_code
+        self.status = array("B")        # current status code per slot
+        self.observed_at = array("d")   # epoch seconds of the last observation
+        self.pending = bytearray()      # 1 if the slot has an unforwarded change
+        self.dirty = []                 # slot indexes with pending changes
+        self.seen = bytearray()         # 1 if heard from since the last heartbeat forward
+        self.alive = []                 # slot indexes with seen set
+
+    def __len__(self):
+        return len(self.device_codes)
+
+    def _slot(self, device_code):
+        slot = self.slots.get(device_code)
+        if slot is None:
+            slot = len(self.device_codes)
+            self.slots[device_code] = slot
+            self.device_codes.append(device_code)
+            self.status.append(UNKNOWN)
+            self.observed_at.append(0.0)
+            self.pending.append(0)
+            self.seen.append(0)
+        return slot
+
+    def observe(self, device_code, status_code, observed_at):
+        """
+        Record a sensor reading.
+
+        Returns True if it changed the spot's status; heartbeats and
+        out-of-order readings only refresh (or are ignored by) the table.
+        """
+        slot = self._slot(device_code)
+        if not self.seen[slot]:
+            self.seen[slot] = 1
+            self.alive.append(slot)
+        if observed_at < self.observed_at[slot]:
+            return False
+        self.observed_at[slot] = observed_at
+        if self.status[slot] == status_code:
+            return False
+
+        self.status[slot] = status_code
+        if not self.pending[slot]:
+            self.pending[slot] = 1
+            self.dirty.append(slot)
+        return True
+
+    def drain(self, limit):
+        """
+        Take up to limit pending changes as backend events.
+
+        Returns a list of (slot, device_code, status_name, observed_at);
+        each slot contributes only its latest state, however many times it
+        flipped since the last drain.
+        """
+        taken, self.dirty = self.dirty[:limit], self.dirty[limit:]
+        events = []
+        for slot in taken:
+            self.pending[slot] = 0
+            events.append((
+                slot,
+                self.device_codes[slot],
+                STATUS_NAMES[self.status[slot]],
+                self.observed_at[slot],
+            ))
+        return events
+
+    def requeue(self, slots):
+        """Mark slots pending again after a failed forward."""
+        for slot in slots:
+            if not self.pending[slot]:
+                self.pending[slot] = 1
+                self.dirty.append(slot)
+
+    def drain_seen(self, limit):
+        """
+        Take up to limit sensors heard from since the last heartbeat
+        forward. Returns a list of (slot, device_code).
+        """
+        taken, self.alive = self.alive[:limit], self.alive[limit:]
+        for slot in taken:
+            self.seen[slot] = 0
+        return [(slot, self.device_codes[slot]) for slot in taken]
+
+    def requeue_seen(self, slots):
+        """Mark slots seen again after a failed heartbeat forward."""
+        for slot in slots:
+            if not self.seen[slot]:
+                self.seen[slot] = 1
+                self.alive.append(slot)
@@ -0,0 +1,170 @@
+"""
+Load generator for the sensor gateway.
+
+Simulates N sensors reporting at M Hz over UDP or TCP. Each reading flips
+the spot's status with probability --change-prob, otherwise it is a
+heartbeat. With --mock-backend the script also stands in for the Django
+events endpoint, so end-to-end lag (sensor timestamp -> batch received by
+the backend) can be measured without a database:
+
+    python -m app.main --backend-url http://127.0.0.1:9600 &
+    python loadgen.py --devices 5000 --hz 2 --duration 30 --mock-backend 9600
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class BackendSink:
+    """Minimal stand-in for the device events and heartbeats endpoints."""
+
+    def __init__(self, port):
+        self.lags = []
+        self.events = 0
+        self.batches = 0
+        self.heartbeats = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                received_at = time.time()
+                if self.path.rstrip("/").endswith("heartbeats"):
+                    device_codes = json.loads(body)["device_codes"]
+                    with sink._lock:
+                        sink.heartbeats += len(device_codes)
+                    self.reply({"buffered": len(device_codes)})
+                    return
+                events = json.loads(body)["events"]
+                lags = [
+                    received_at - datetime_to_epoch(event["observed_at"])
+                    for event in events
+                ]
+                with sink._lock:
+                    sink.batches += 1
+                    sink.events += len(events)
+                    sink.lags.extend(lags)
+                self.reply({"received": len(events)})
+
+            def reply(self, data):
+                payload = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def datetime_to_epoch(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+async def open_sender(transport, host, port):
+    loop = asyncio.get_running_loop()
+    if transport == "udp":
+        udp, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(host, port)
+        )
+        return udp.sendto, udp.close
+
+    _, writer = await asyncio.open_connection(host, port)
+
+    def close():
+        writer.close()
+
+    return writer.write, close
+
+
+async def generate(args):
+    send, close = await open_sender(args.transport, args.host, args.port)
+    statuses = [random.choice(("available", "occupied")) for _ in range(args.devices)]
+    codes = [f"{args.prefix}{args.start + i}" for i in range(args.devices)]
+    tick = 1.0 / args.hz
+    sent = changes = 0
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    while time.perf_counter() < deadline:
+        tick_started = time.perf_counter()
+        now = time.time()
+        lines = []
+        for i in range(args.devices):
+            if random.random() < args.change_prob:
+                statuses[i] = "occupied" if statuses[i] == "available" else "available"
+                changes += 1
+            lines.append(json.dumps(
+                {"device_code": codes[i], "status": statuses[i], "ts": now}
+            ).encode())
+            if len(lines) == args.per_datagram:
+                send(b"\n".join(lines) + b"\n")
+                sent += len(lines)
+                lines = []
+        if lines:
+            send(b"\n".join(lines) + b"\n")
+            sent += len(lines)
+        await asyncio.sleep(max(0.0, tick - (time.perf_counter() - tick_started)))
+
+    elapsed = time.perf_counter() - started
+    close()
+    return sent, changes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor gateway load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9500, help="gateway UDP (or TCP) port")
+    parser.add_argument("--transport", choices=("udp", "tcp"), default="udp")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--hz", type=float, default=1.0, help="readings per device per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--change-prob", type=float, default=0.05)
+    parser.add_argument("--per-datagram", type=int, default=20, help="readings packed per send")
+    parser.add_argument("--prefix", default="SN-")
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--mock-backend", type=int, metavar="PORT",
+                        help="serve a stand-in events endpoint on PORT and report lag")
+    parser.add_argument("--drain", type=float, default=3.0,
+                        help="seconds to wait for the last batches after sending")
+    args = parser.parse_args()
+
+    sink = BackendSink(args.mock_backend) if args.mock_backend else None
+    sent, changes, elapsed = asyncio.run(generate(args))
+
+    print(f"Sent {sent} readings in {elapsed:.1f}s ({sent / elapsed:,.0f} msg/s, "
+          f"target {args.devices * args.hz:,.0f} msg/s), {changes} status changes")
+
+    if sink:
+        time.sleep(args.drain)
+        sink.close()
+        if sink.lags:
+            lags = sorted(sink.lags)
+            # A device's first reading is also a change as far as the gateway knows
+            print(f"Backend received {sink.events} events in {sink.batches} batches "
+                  f"(from {args.devices} initial states + {changes} changes, before coalescing)")
+            print(f"End-to-end lag: mean {statistics.mean(lags) * 1000:.0f} ms, "
+                  f"p50 {lags[len(lags) // 2] * 1000:.0f} ms, "
+                  f"p99 {lags[int(len(lags) * 0.99)] * 1000:.0f} ms, "
+                  f"max {lags[-1] * 1000:.0f} ms")
+            print(f"Backend received {sink.heartbeats} device heartbeats")
+        else:
+            print("Backend received no events; is the gateway pointed at the mock backend?")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+import unittest
+import urllib.error
+from unittest import mock
+
+from app.gateway import MAX_CLOCK_SKEW, Gateway
+
+
+class HandleLineTests(unittest.TestCase):
+    def setUp(self):
+        self.gateway = Gateway("http://backend", "/events/")
+
+    def handle(self, message):
+        line = message if isinstance(message, (str, bytes)) else json.dumps(message)
+        self.gateway.handle_line(line)
+
+    def test_valid_readings_update_the_table(self):
+        now = time.time()
+        self.handle({"device_code": "SN-1", "status": "occupied", "ts": now})
+        self.handle({"device_code": "SN-2", "status": 0})
+
+        self.assertEqual(self.gateway.stats.received, 2)
+        self.assertEqual(self.gateway.stats.malformed, 0)
+        self.assertEqual(self.gateway.stats.changes, 2)
+        self.assertEqual(self.gateway.table.observed_at[0], now)
+
+    def test_malformed_readings_are_counted_and_dropped(self):
+        now = time.time()
+        for line in (
+            "not json",
+            "[]",
+            {"status": "occupied"},
+            {"device_code": "SN-1"},
+            {"device_code": "SN-1", "status": "parked"},
+            {"device_code": "SN-1", "status": 7},
+            {"device_code": "SN-1", "status": "occupied", "ts": "soon"},
+            {"device_code": "SN-1", "status": "occupied", "ts": 1e20},
+            {"device_code": "SN-1", "status": "occupied", "ts": now - MAX_CLOCK_SKEW - 60},
+            '{"device_code": "SN-1", "status": "occupied", "ts": Infinity}',
+            '{"device_code": "SN-1", "status": "occupied", "ts": NaN}',
+        ):
+            with self.subTest(line=line):
+                self.handle(line)
+
+        self.assertEqual(self.gateway.stats.malformed, 11)
+        self.assertEqual(len(self.gateway.table), 0)
+
+
+class FlushTests(unittest.TestCase):
+    def setUp(self):
+        self.gateway = Gateway("http://backend", "/events/", "/heartbeats/")
+        self.gateway.handle_line(json.dumps({"device_code": "SN-1", "status": "occupied"}))
+
+    def test_failed_forward_requeues_events(self):
+        for error in (urllib.error.URLError("down"), ValueError("bug")):
+            with self.subTest(error=error):
+                with mock.patch.object(Gateway, "_post", side_effect=error):
+                    try:
+                        asyncio.run(self.gateway.flush())
+                    except ValueError:
+                        pass
+                self.assertEqual(len(self.gateway.table.dirty), 1)
+
+    def test_forward_loop_survives_unexpected_errors(self):
+        async def run():
+            task = asyncio.create_task(self.gateway.forward_forever(0.01))
+            await asyncio.sleep(0.05)
+            alive = not task.done()
+            task.cancel()
+            return alive
+
+        with mock.patch.object(Gateway, "_post", side_effect=ValueError("bug")):
+            with self.assertLogs("app.gateway", "ERROR"):
+                self.assertTrue(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    unittest.main()
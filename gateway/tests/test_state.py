@@ -0,0 +1,74 @@
+import unittest
+
+from app.state import STATUS_CODES, SpotStateTable
+
+AVAILABLE = STATUS_CODES["available"]
+OCCUPIED = STATUS_CODES["occupied"]
+
+
+class SpotStateTableTests(unittest.TestCase):
+    def setUp(self):
+        self.table = SpotStateTable()
+
+    def test_first_reading_is_a_change(self):
+        self.assertTrue(self.table.observe("SN-1", OCCUPIED, 10.0))
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.table.drain(10), [(0, "SN-1", "occupied", 10.0)])
+
+    def test_heartbeat_refreshes_without_a_change(self):
+        self.table.observe("SN-1", OCCUPIED, 10.0)
+        self.table.drain(10)
+
+        self.assertFalse(self.table.observe("SN-1", OCCUPIED, 20.0))
+        self.assertEqual(self.table.observed_at[0], 20.0)
+        self.assertEqual(self.table.drain(10), [])
+
+    def test_out_of_order_reading_is_ignored(self):
+        self.table.observe("SN-1", OCCUPIED, 20.0)
+
+        self.assertFalse(self.table.observe("SN-1", AVAILABLE, 10.0))
+        self.assertEqual(self.table.drain(10), [(0, "SN-1", "occupied", 20.0)])
+
+    def test_drain_forwards_latest_state_once(self):
+        self.table.observe("SN-1", OCCUPIED, 10.0)
+        self.table.observe("SN-1", AVAILABLE, 11.0)
+        self.table.observe("SN-1", OCCUPIED, 12.0)
+
+        self.assertEqual(self.table.drain(10), [(0, "SN-1", "occupied", 12.0)])
+        self.assertEqual(self.table.drain(10), [])
+
+    def test_drain_respects_limit(self):
+        for i in range(5):
+            self.table.observe(f"SN-{i}", OCCUPIED, 10.0)
+
+        self.assertEqual([slot for slot, *_ in self.table.drain(3)], [0, 1, 2])
+        self.assertEqual([slot for slot, *_ in self.table.drain(3)], [3, 4])
+
+    def test_requeue_after_failed_forward(self):
+        self.table.observe("SN-1", OCCUPIED, 10.0)
+        self.table.observe("SN-2", OCCUPIED, 10.0)
+        events = self.table.drain(10)
+
+        self.table.observe("SN-2", AVAILABLE, 11.0)
+        self.table.requeue(slot for slot, *_ in events)
+
+        self.assertEqual(self.table.drain(10), [
+            (1, "SN-2", "available", 11.0),
+            (0, "SN-1", "occupied", 10.0),
+        ])
+
+    def test_seen_sensors_are_drained_for_heartbeats(self):
+        self.table.observe("SN-1", OCCUPIED, 10.0)
+        self.table.observe("SN-1", OCCUPIED, 11.0)
+        self.table.observe("SN-2", OCCUPIED, 10.0)
+
+        devices = self.table.drain_seen(10)
+        self.assertEqual(devices, [(0, "SN-1"), (1, "SN-2")])
+        self.assertEqual(self.table.drain_seen(10), [])
+
+        self.table.requeue_seen(slot for slot, _ in devices)
+        self.assertEqual(self.table.drain_seen(10), devices)
+
+
+if __name__ == "__main__":
+    unittest.main()